@@ -25,6 +25,10 @@ setup(
         'tqdm>=4.7.1',
         'PyYAML>=3.11',
     ],
+    extras_require={
+        'analytics': ['numpy>=1.15'],
+        'export': ['pyarrow>=0.15'],
+    },
     keywords="languages, dialects, linguistics",
     classifiers=[
         'Development Status :: 3 - Alpha',
@@ -1,39 +1,111 @@
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
 
 from .models import (Family, Language, AlternativeName, UsedIn, Dialect,
                      LexicalSimilarity, Macroarea, Characteristic,
                      ScriptUsage, Script)
 
 
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that reads the row count of unfiltered changelists from the
+    PostgreSQL planner statistics instead of running COUNT(*)
+
+    Filtered querysets, small tables and other databases still get an exact
+    count.
+    """
+    # Below this many rows COUNT(*) is cheap and exact
+    ESTIMATE_THRESHOLD = 10000
+
+    @cached_property
+    def count(self):
+        estimate = self.estimated_count()
+        if estimate is not None and estimate >= self.ESTIMATE_THRESHOLD:
+            return estimate
+        return super().count
+
+    def estimated_count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is None or query.where or query.distinct or query.low_mark or query.high_mark is not None:
+            return None
+
+        connection = connections[self.object_list.db]
+        if connection.vendor != 'postgresql':
+            return None
+
+        # Resolved through the search path like the queries themselves, not
+        # by name, which tables of other schemas may share
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT reltuples FROM pg_class WHERE oid = %s::regclass",
+                           [connection.ops.quote_name(self.object_list.model._meta.db_table)])
+            row = cursor.fetchone()
+
+        # reltuples is -1 (or 0) until the table has been analyzed
+        if row is None or row[0] <= 0:
+            return None
+        return int(row[0])
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
 class FamilyAdmin(admin.ModelAdmin):
-    pass
+    list_display = ['name', 'glottolog_id']
+    search_fields = ['^name', '=glottolog_id']
 
 
-class LanguageAdmin(admin.ModelAdmin):
-    pass
+class LanguageAdmin(LargeTableAdmin):
+    list_display = ['name', 'iso639_1', 'iso639_3', 'glottolog_id', 'family']
+    list_select_related = ['family']
+    search_fields = ['=iso639_1', '=iso639_3', '=glottolog_id', '^name']
+    raw_id_fields = ['family', 'iso_family', 'macrolanguage']
 
 
-class AlternativeNameAdmin(admin.ModelAdmin):
+class AlternativeNameAdmin(LargeTableAdmin):
     ordering = ['name']
-    list_display = ['name', 'language', 'preferred']
-    list_filter = ['preferred', 'language']
-    search_fields = ['name']
+    list_display = ['name', 'language', 'in_language', 'preferred']
+    # Filtering by language renders every language, use search instead
+    list_filter = ['preferred', 'type']
+    list_select_related = ['language', 'in_language']
+    search_fields = ['^name', '=language__iso639_3']
+    raw_id_fields = ['language', 'in_language']
+
+    def get_queryset(self, request):
+        # AlternativeName has no 'link' type, and without the default
+        # manager's exclude() the paginator can estimate the count
+        qs = AlternativeName.all_objects.all()
+        ordering = self.get_ordering(request)
+        if ordering:
+            qs = qs.order_by(*ordering)
+        return qs
 
 
 class MacroareaAdmin(admin.ModelAdmin):
     pass
 
 
-class UsedInAdmin(admin.ModelAdmin):
-    pass
+class UsedInAdmin(LargeTableAdmin):
+    list_display = ['language', 'country', 'population', 'development_status']
+    list_select_related = ['language', 'country']
+    search_fields = ['=country_code', '^language__name']
+    raw_id_fields = ['country', 'language', 'known_as', 'scripts']
 
 
-class DialectAdmin(admin.ModelAdmin):
-    pass
+class DialectAdmin(LargeTableAdmin):
+    list_display = ['name', 'used_in']
+    list_select_related = ['used_in__language', 'used_in__country']
+    search_fields = ['^name']
+    raw_id_fields = ['used_in', 'group']
 
 
-class LexicalSimilarityAdmin(admin.ModelAdmin):
-    pass
+class LexicalSimilarityAdmin(LargeTableAdmin):
+    list_display = ['language_1', 'language_2', 'percent_low', 'percent_high']
+    list_select_related = ['language_1', 'language_2']
+    raw_id_fields = ['language_1', 'language_2']
 
 
 class ScriptUsageAdmin(admin.ModelAdmin):
@@ -1,4 +1,4 @@
-from django.apps import AppConfig
+from django.apps import AppConfig, apps
 from django.db.models.signals import post_save, pre_delete
 
 
@@ -37,6 +37,29 @@ def delete_symmetric_lexical_similarity(sender, instance, **kwargs):
             pass
 
 
+def update_alternative_name_language_codes(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+
+    # Keep AlternativeName.in_language_code (and so the slugs) in sync with
+    # the language, but only when its code actually changed
+    if not created and (not hasattr(instance, '_saved_iso639_3') or
+                        instance._saved_iso639_3 != instance.iso639_3):
+        apps.get_model('world_languages', 'AlternativeName').all_objects.filter(
+            in_language=instance).refresh_language_codes()
+    instance._saved_iso639_3 = instance.iso639_3
+
+
+def update_used_in_country_codes(sender, instance, created, raw, **kwargs):
+    if raw or created:
+        return
+
+    # Keep UsedIn.country_code in sync with the country
+    apps.get_model('world_languages', 'UsedIn').objects.filter(
+        country=instance).exclude(country_code=instance.code).update(
+        country_code=instance.code)
+
+
 class WorldLanguagesConfig(AppConfig):
     name = 'world_languages'
 
@@ -49,3 +72,11 @@ class WorldLanguagesConfig(AppConfig):
             delete_symmetric_lexical_similarity,
             sender=self.get_model('LexicalSimilarity'),
             dispatch_uid='delete_symmetric_lexical_similarity')
+        post_save.connect(
+            update_alternative_name_language_codes,
+            sender=self.get_model('Language'),
+            dispatch_uid='update_alternative_name_language_codes')
+        post_save.connect(
+            update_used_in_country_codes,
+            sender=apps.get_model('cities', 'Country'),
+            dispatch_uid='update_used_in_country_codes')
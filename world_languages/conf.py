@@ -55,6 +55,10 @@ class HookException(Exception):
 # Hook functions that a plugin class may define
 plugin_hooks = [
     'language_pre',       'language_post',
+    'languagefamily_pre', 'languagefamily_post',
+    'macrolanguage_pre',  'macrolanguage_post',
+    # Called with whole chunks of rows, see Command.call_batch_hook()
+    'language_pre_batch', 'language_post_batch',
 ]
 
 
@@ -87,6 +91,22 @@ def create_settings():
         pass
     res.locales = set([e.lower() for e in locales])
 
+    # Seconds HTTP caches may serve API responses without revalidating
+    res.api_cache_max_age = LANGUAGE_SETTINGS.get('API_CACHE_MAX_AGE', 60 * 60)
+    res.api_page_size = LANGUAGE_SETTINGS.get('API_PAGE_SIZE', 100)
+
+    # Number of rows the import passes to batch hooks at a time
+    res.batch_size = LANGUAGE_SETTINGS.get('BATCH_SIZE', 500)
+
+    # Stream the largest tables into PostgreSQL with COPY
+    res.copy_loader = LANGUAGE_SETTINGS.get('COPY_LOADER', True)
+
+    # Shadow imports aren't swapped in if a table loses more of its rows
+    res.shadow_min_row_ratio = LANGUAGE_SETTINGS.get('SHADOW_MIN_ROW_RATIO', 0.9)
+
+    # Threads downloading the files of later import stages ahead of time
+    res.download_workers = LANGUAGE_SETTINGS.get('DOWNLOAD_WORKERS', 4)
+
     return res
 
 
@@ -98,7 +118,10 @@ def create_plugins():
             module = import_module(module_path)
             class_ = getattr(module, classname)
             obj = class_()
-            [settings.plugins[hook].append(obj) for hook in plugin_hooks if hasattr(obj, hook)]
+            # Resolve the bound methods once, rather than on every call
+            for hook in plugin_hooks:
+                if hasattr(obj, hook):
+                    settings.plugins[hook].append(getattr(obj, hook))
 
 settings = create_settings()
 create_plugins()
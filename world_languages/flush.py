@@ -0,0 +1,139 @@
+from django.apps import apps
+from django.db import connection
+
+
+# Models that are never flushed: macroareas come from a migration, and the
+# import history is kept
+KEPT_MODELS = ('Macroarea', 'ImportRun')
+
+# Data type -> the models it flushes (None for all but KEPT_MODELS), along
+# with every model of the app that can't exist without them (see
+# flush_models())
+FLUSH_GROUPS = {
+    'alternative_name': ['AlternativeName'],
+    'characteristic': ['Characteristic', 'FlatCharacteristic'],
+    'development_note': ['DevelopmentNote'],
+    'dialect': ['DialectGroup', 'Dialect', 'DialectNote'],
+    'lexical_similarity': ['LexicalSimilarity'],
+    'script': ['Script'],
+    'language': None,
+}
+
+
+def related_fields(model):
+    """
+    The foreign keys (including multi-table inheritance parent links) of
+    ``model``
+    """
+    return [f for f in model._meta.concrete_fields if f.is_relation and f.related_model]
+
+
+def flush_models(data_type):
+    """
+    The models to flush for ``data_type``, models that reference other
+    models to flush first
+    """
+    app_models = list(apps.get_app_config('world_languages').get_models(include_auto_created=True))
+    names = FLUSH_GROUPS[data_type]
+    if names is None:
+        flushed = set(model for model in app_models
+                      if not model._meta.auto_created and model._meta.object_name not in KEPT_MODELS)
+    else:
+        flushed = set(apps.get_model('world_languages', name) for name in names)
+
+    # Models with a required foreign key to a flushed model (subclasses, M2M
+    # through tables, etc.) are flushed with it
+    changed = True
+    while changed:
+        changed = False
+        for model in app_models:
+            if model not in flushed and any(
+                    f.related_model in flushed and not f.null for f in related_fields(model)):
+                flushed.add(model)
+                changed = True
+
+    ordered = []
+    visiting = set()
+
+    def visit(model):
+        if model in ordered or model in visiting:
+            return
+        visiting.add(model)
+        for other in flushed:
+            if other is not model and any(f.related_model is model for f in related_fields(other)):
+                visit(other)
+        ordered.append(model)
+
+    for model in sorted(flushed, key=lambda model: model._meta.db_table):
+        visit(model)
+    return ordered
+
+
+def referenced_elsewhere(models):
+    """
+    Whether rows of models other than ``models`` (eg: of other apps)
+    reference rows of ``models``
+    """
+    for model in models:
+        for rel in model._meta.related_objects:
+            if rel.related_model not in models and rel.related_model._base_manager.filter(
+                    **{'{}__isnull'.format(rel.field.name): False}).exists():
+                return True
+    return False
+
+
+def referenced_by_other_tables(cursor, tables):
+    """
+    Whether foreign keys of tables other than ``tables`` reference any of
+    ``tables``, which PostgreSQL then refuses to truncate (without
+    ``CASCADE``, which would empty the other tables)
+    """
+    qn = connection.ops.quote_name
+    cursor.execute("""
+        SELECT 1 FROM pg_constraint
+        WHERE contype = 'f' AND confrelid = ANY(%s::regclass[]) AND NOT conrelid = ANY(%s::regclass[])
+        LIMIT 1
+    """, [[qn(table) for table in tables]] * 2)
+    return cursor.fetchone() is not None
+
+
+def flush_tables(models):
+    """
+    Empty the tables of ``models``, which reference each other in order
+
+    If rows of any other model reference them, every model is emptied with
+    ``delete()``, which applies the ``on_delete`` of those references and
+    sends the delete signals. Otherwise PostgreSQL truncates the tables with
+    a single ``TRUNCATE`` (unless other tables could reference them), and
+    the tables of other databases get one ``DELETE`` each, after the
+    nullable foreign keys between them are cleared. Neither sends signals.
+    """
+    if referenced_elsewhere(models):
+        for model in models:
+            model._base_manager.all().delete()
+        return
+
+    qn = connection.ops.quote_name
+    tables = [model._meta.db_table for model in models]
+
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql' and not referenced_by_other_tables(cursor, tables):
+            # TRUNCATE refuses tables with deferred foreign key checks still
+            # pending from earlier writes in the transaction. Django's foreign
+            # keys are deferred again for the rest of the import.
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+            cursor.execute('TRUNCATE {}'.format(', '.join(qn(table) for table in tables)))
+            cursor.execute('SET CONSTRAINTS ALL DEFERRED')
+            return
+
+        # Rows referencing rows of the same table (parents, macrolanguages)
+        # would otherwise block their deletion where constraints are checked
+        # immediately
+        for model in models:
+            columns = [f.column for f in related_fields(model) if f.null and f.related_model in models]
+            if columns:
+                cursor.execute('UPDATE {} SET {}'.format(
+                    qn(model._meta.db_table), ', '.join('{} = NULL'.format(qn(column)) for column in columns)))
+
+        for table in tables:
+            cursor.execute('DELETE FROM {}'.format(qn(table)))
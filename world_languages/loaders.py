@@ -0,0 +1,142 @@
+import io
+
+from django.db import connections, router
+
+from .conf import settings
+from .utils import chunked
+
+
+def copy_supported(using):
+    """
+    Whether rows written to the ``using`` database can be streamed with COPY
+    """
+    return settings.copy_loader and connections[using].vendor == 'postgresql'
+
+
+def load_rows(model, fields, rows, conflict_fields, update_fields=(), using=None, batch_size=1000):
+    """
+    Insert ``rows`` (sequences of values of ``fields``) into the table of
+    ``model``
+
+    Rows that conflict with an existing row on ``conflict_fields`` (which
+    must be covered by a unique constraint) only have their
+    ``update_fields`` updated, or are skipped if there are none. ``fields``
+    are attribute names, eg: ``language_id``.
+
+    On PostgreSQL the rows are streamed with ``COPY ... FROM STDIN`` into a
+    temporary staging table, then merged into the table with a single
+    ``INSERT ... ON CONFLICT``. Other databases use ``bulk_create()``, and
+    an ``UPDATE`` for each existing row whose ``update_fields`` changed.
+    """
+    rows = list(rows)
+    if not rows:
+        return
+    if using is None:
+        using = router.db_for_write(model)
+
+    if copy_supported(using):
+        copy_rows(model, fields, rows, conflict_fields, update_fields, using)
+    else:
+        bulk_rows(model, fields, rows, conflict_fields, update_fields, using, batch_size)
+
+
+def copy_field(value):
+    """
+    ``value`` as a CSV field for COPY, where NULL is an unquoted empty field,
+    so every other value (including empty strings) is quoted
+    """
+    if value is None:
+        return ''
+    return '"{}"'.format(str(value).replace('"', '""'))
+
+
+def copy_rows(model, fields, rows, conflict_fields, update_fields, using):
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    opts = model._meta
+
+    model_fields = [opts.get_field(f) for f in fields]
+    columns = ', '.join(qn(f.column) for f in model_fields)
+    conflict_columns = ', '.join(qn(opts.get_field(f).column) for f in conflict_fields)
+    table = qn(opts.db_table)
+    staging = qn('{}_staging'.format(opts.db_table))
+
+    buf = io.StringIO()
+    for row in rows:
+        buf.write(','.join(
+            copy_field(None if value is None else field.get_db_prep_save(value, connection))
+            for field, value in zip(model_fields, row)))
+        buf.write('\n')
+    buf.seek(0)
+
+    if update_fields:
+        conflict_action = 'DO UPDATE SET {}'.format(', '.join(
+            '{0} = EXCLUDED.{0}'.format(qn(opts.get_field(f).column)) for f in update_fields))
+    else:
+        conflict_action = 'DO NOTHING'
+
+    with connection.cursor() as cursor:
+        # Only the loaded columns, so the staging table doesn't draw values
+        # from the table's id sequence
+        cursor.execute('DROP TABLE IF EXISTS {}'.format(staging))
+        cursor.execute('CREATE TEMPORARY TABLE {} AS SELECT {} FROM {} WITH NO DATA'.format(
+            staging, columns, table))
+
+        copy_sql = 'COPY {} ({}) FROM STDIN WITH (FORMAT csv)'.format(staging, columns)
+        raw = cursor.cursor
+        if hasattr(raw, 'copy_expert'):
+            # psycopg2
+            raw.copy_expert(copy_sql, buf)
+        else:
+            # psycopg 3
+            with raw.copy(copy_sql) as copy:
+                copy.write(buf.getvalue())
+
+        # DISTINCT ON, because ON CONFLICT can't touch the same row twice
+        cursor.execute(
+            'INSERT INTO {table} ({columns}) '
+            'SELECT DISTINCT ON ({conflict}) {columns} FROM {staging} '
+            'ON CONFLICT ({conflict}) {action}'.format(
+                table=table, columns=columns, staging=staging,
+                conflict=conflict_columns, action=conflict_action))
+        cursor.execute('DROP TABLE {}'.format(staging))
+
+
+def bulk_rows(model, fields, rows, conflict_fields, update_fields, using, batch_size):
+    # The base manager, so querysets that normalize their bulk writes don't
+    # normalize the rows a second time
+    manager = model._base_manager.db_manager(using)
+    objs = [model(**dict(zip(fields, row))) for row in rows]
+
+    def key(obj):
+        return tuple(getattr(obj, f) for f in conflict_fields)
+
+    # Rows that already exist are skipped (bulk_create() can only ignore
+    # conflicts from Django 2.2), as are all but the first of the rows with
+    # the same key
+    existing = {}
+    lookup = '{}__in'.format(conflict_fields[0])
+    for batch in chunked(objs, batch_size):
+        values = set(getattr(obj, conflict_fields[0]) for obj in batch)
+        existing.update((key(obj), obj) for obj in manager.filter(**{lookup: values}))
+
+    seen = set()
+    new = []
+    changed = {}
+    for obj in objs:
+        if key(obj) in seen:
+            continue
+        seen.add(key(obj))
+
+        old = existing.get(key(obj))
+        if old is None:
+            new.append(obj)
+        elif update_fields and any(getattr(old, f) != getattr(obj, f) for f in update_fields):
+            for f in update_fields:
+                setattr(old, f, getattr(obj, f))
+            changed[old.pk] = old
+    # bulk_update() is Django 2.2 as well
+    for obj in changed.values():
+        manager.filter(pk=obj.pk).update(**dict((f, getattr(obj, f)) for f in update_fields))
+
+    manager.bulk_create(new, batch_size=batch_size)
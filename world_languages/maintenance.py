@@ -0,0 +1,112 @@
+import time
+
+from django.apps import apps
+from django.db import connection
+
+MAINTENANCE_STEPS = ['analyze', 'vacuum', 'reindex', 'prewarm']
+
+
+def app_tables():
+    """
+    The tables of every model of the app, including the M2M through tables
+    """
+    return sorted(set(
+        model._meta.db_table
+        for model in apps.get_app_config('world_languages').get_models(include_auto_created=True)))
+
+
+def run_statements(statements):
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+def table_statements(template, tables=None):
+    qn = connection.ops.quote_name
+    return [template.format(qn(table)) for table in tables or app_tables()]
+
+
+def analyze():
+    """
+    Refresh the planner statistics, which are stale after an import
+    """
+    if connection.vendor == 'postgresql':
+        run_statements(table_statements('ANALYZE {}'))
+    elif connection.vendor == 'sqlite':
+        run_statements(table_statements('ANALYZE {}') + ['PRAGMA optimize'])
+    else:
+        return False
+
+
+def vacuum():
+    """
+    Reclaim the space of the rows the import updated or deleted
+    """
+    if connection.vendor == 'postgresql':
+        run_statements(table_statements('VACUUM {}'))
+    elif connection.vendor == 'sqlite':
+        # SQLite can only vacuum the whole database
+        run_statements(['VACUUM'])
+    else:
+        return False
+
+
+def reindex():
+    """
+    Rebuild the indexes, without blocking writes where the database can
+    """
+    if connection.vendor == 'postgresql':
+        if connection.pg_version >= 120000:
+            run_statements(table_statements('REINDEX TABLE CONCURRENTLY {}'))
+        else:
+            run_statements(table_statements('REINDEX TABLE {}'))
+    elif connection.vendor == 'sqlite':
+        run_statements(table_statements('REINDEX {}'))
+    else:
+        return False
+
+
+def prewarm():
+    """
+    Build the lookup structures the app derives from the data
+
+    The in-process ones only help this process, but building them reads the
+    same pages the first requests of every other process will, and fills the
+    shared cache.
+    """
+    from .negotiation import get_language_matcher
+    from .models import ScriptUsage
+    from .resolvers import get_language_resolver
+    from .typology import get_typology_index
+
+    get_typology_index()
+    get_language_resolver()
+    get_language_matcher()
+    ScriptUsage.objects.in_use_cached()
+
+
+STEP_FUNCTIONS = {
+    'analyze': analyze,
+    'vacuum': vacuum,
+    'reindex': reindex,
+    'prewarm': prewarm,
+}
+
+
+def run_maintenance(steps):
+    """
+    Run each of ``steps`` (see ``MAINTENANCE_STEPS``) in order, outside of
+    any transaction
+
+    Returns ``(step, seconds)`` tuples, with None for the steps the database
+    doesn't support.
+    """
+    timings = []
+    for step in steps:
+        started = time.time()
+        result = STEP_FUNCTIONS[step]()
+        if result is False:
+            timings.append((step, None))
+        else:
+            timings.append((step, time.time() - started))
+    return timings
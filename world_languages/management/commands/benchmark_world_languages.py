@@ -0,0 +1,194 @@
+import os
+import random
+import re
+import subprocess
+import sys
+import time
+import unicodedata
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.encoding import force_text
+
+from ...models import (AlternativeName, Language, _slugify, dash_und_rgx,
+                       eager_slugify, ending_chars_rgx, multi_dash_rgx,
+                       slugify_rgx, starting_chars_rgx, to_und_rgx,
+                       und_dash_rgx)
+from ...resolvers import LANGUAGE_TAG_FIELDS, LanguageResolver
+
+
+BENCHMARKS = ['slugify', 'resolve', 'import']
+
+# Run in a fresh interpreter, since this process has imported everything
+# already. Prints the seconds and number of modules of django.setup() and
+# then of importing the module
+IMPORT_SCRIPT = '''
+import sys
+import time
+
+import django
+
+modules = len(sys.modules)
+started = time.perf_counter()
+django.setup()
+print(time.perf_counter() - started, len(sys.modules) - modules)
+
+modules = len(sys.modules)
+started = time.perf_counter()
+import {module}
+print(time.perf_counter() - started, len(sys.modules) - modules)
+'''
+
+
+def original_slugify(value):
+    """
+    The original slugify(), before it was optimized, which it must still
+    match character for character
+    """
+    value = force_text(value)
+    value = unicodedata.normalize('NFKC', value.strip().lower())
+    value = re.sub(slugify_rgx, '-', value)
+    value = re.sub(to_und_rgx, '_', value)
+    value = re.sub(multi_dash_rgx, '-', value)
+    value = re.sub(dash_und_rgx, '-', value)
+    value = re.sub(und_dash_rgx, '_', value)
+    value = re.sub(starting_chars_rgx, '', value)
+    value = re.sub(ending_chars_rgx, '', value)
+    return value
+
+
+def timed(function, values, repeat):
+    """
+    The best time of ``repeat`` runs of ``function`` over ``values``, in
+    seconds
+    """
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for value in values:
+            function(value)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+class Command(BaseCommand):
+    help = "Time the app's hot paths against the data in the database"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'benchmarks',
+            nargs='*',
+            help="Benchmarks to run (all of them by default): {}".format(', '.join(BENCHMARKS)))
+        parser.add_argument(
+            '--repeat',
+            default=5,
+            type=int,
+            help="Number of runs of each benchmark, of which the best is reported")
+        parser.add_argument(
+            '--tags',
+            default=1000000,
+            type=int,
+            help="Number of language tags to resolve")
+        parser.add_argument(
+            '--seed',
+            default=639,
+            type=int,
+            help="Seed of the random tag sample, so runs are comparable")
+
+    def handle(self, *args, **options):
+        self.options = options
+        unknown = [b for b in options['benchmarks'] if b not in BENCHMARKS]
+        if unknown:
+            raise CommandError("Unknown benchmarks: {}. Available benchmarks are: {}".format(
+                ', '.join(unknown), ', '.join(BENCHMARKS)))
+
+        for benchmark in options['benchmarks'] or BENCHMARKS:
+            getattr(self, 'benchmark_{}'.format(benchmark))(options['repeat'])
+
+    def report(self, label, count, seconds):
+        self.stdout.write("{:<32} {:>10,} in {:8.3f}s  {:>12,.0f}/s".format(
+            label, count, seconds, count / seconds if seconds else float('inf')))
+
+    def benchmark_slugify(self, repeat):
+        """
+        Every alternative name (and the key the importer builds from it),
+        slugified by the original implementation, and by the new one with and
+        without its cache
+        """
+        values = []
+        for name, code in AlternativeName.all_objects.values_list('name', 'in_language_code').iterator():
+            values.append(name)
+            values.append('{}_({})'.format(name, code))
+        values.extend(Language.objects.values_list('name', flat=True).iterator())
+        if not values:
+            raise CommandError("There are no names to slugify, import the languages first")
+
+        mismatches = [value for value in values if eager_slugify(value) != original_slugify(value)]
+        if mismatches:
+            raise CommandError("slugify() doesn't match the original for {} names, eg: {!r}".format(
+                len(mismatches), mismatches[0]))
+
+        def uncached(value):
+            return _slugify.__wrapped__(force_text(value))
+
+        self.report('slugify: original', len(values), timed(original_slugify, values, repeat))
+        self.report('slugify: uncached', len(values), timed(uncached, values, repeat))
+        self.report('slugify: cached', len(values), timed(eager_slugify, values, repeat))
+
+    def benchmark_resolve(self, repeat):
+        """
+        A random sample of every code and name of every language (some with a
+        region subtag, some in upper case), with 1 in 20 tags unknown,
+        resolved to language ids
+        """
+        vocabulary = []
+        for row in Language.objects.values_list(*LANGUAGE_TAG_FIELDS).iterator():
+            vocabulary.extend(value for value in row if value)
+        vocabulary.extend(AlternativeName.all_objects.values_list('name', flat=True).iterator())
+        if not vocabulary:
+            raise CommandError("There are no languages to resolve, import the languages first")
+
+        rnd = random.Random(self.options['seed'])
+        variants = [
+            lambda tag: tag,
+            lambda tag: tag.upper(),
+            lambda tag: '{}-US'.format(tag),
+            lambda tag: '{}_BR'.format(tag),
+        ]
+        tags = []
+        for _ in range(self.options['tags']):
+            if rnd.random() < 0.05:
+                tags.append('unknown-{}'.format(rnd.randint(0, 10000)))
+            else:
+                tags.append(rnd.choice(variants)(rnd.choice(vocabulary)))
+
+        started = time.perf_counter()
+        resolver = LanguageResolver.build()
+        self.report('resolve: build', len(resolver.index), time.perf_counter() - started)
+
+        # Every tag, and the distinct tags only once (as resolve_languages()
+        # does)
+        self.report('resolve: lookup', len(tags), timed(resolver.lookup, tags, repeat))
+        self.report('resolve: resolve_ids', len(tags), timed(resolver.resolve_ids, [tags], repeat))
+
+    def benchmark_import(self, repeat):
+        """
+        Loading the world_languages command, which every manage.py invocation
+        that lists or looks up commands does, after setting up Django
+        (counted in modules imported)
+        """
+        script = IMPORT_SCRIPT.format(module='{}.world_languages'.format(__package__))
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        best = None
+        for _ in range(repeat):
+            process = subprocess.run([sys.executable, '-c', script], env=env,
+                                     stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+            if process.returncode:
+                raise CommandError("Importing the command failed:\n{}".format(process.stderr))
+            timings = [line.split() for line in process.stdout.splitlines()]
+            timings = [(float(seconds), int(modules)) for seconds, modules in timings]
+            best = timings if best is None else [min(run) for run in zip(best, timings)]
+
+        (setup, setup_modules), (command, command_modules) = best
+        self.report('import: django.setup', setup_modules, setup)
+        self.report('import: command', command_modules, command)
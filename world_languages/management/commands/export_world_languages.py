@@ -0,0 +1,211 @@
+import csv
+import json
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+
+from ...managers import DEVELOPMENT_NOTE_SUBCLASSES
+from ...models import (AlternativeName, DevelopmentNote, FlatCharacteristic,
+                       Language, UsedIn)
+
+
+# Exported field -> Language values() lookup
+LANGUAGE_FIELDS = [
+    ('id', 'id'),
+    ('name', 'name'),
+    ('name_gl', 'name_gl'),
+    ('slug', 'slug'),
+    ('iso639_1', 'iso639_1'),
+    ('iso639_2t', 'iso639_2t'),
+    ('iso639_2b', 'iso639_2b'),
+    ('iso639_3', 'iso639_3'),
+    ('iso639_5', 'iso639_5'),
+    ('glottolog_id', 'glottolog_id'),
+    ('type', 'iso639_2_type'),
+    ('scope', 'iso639_2_scope'),
+    ('development_status', 'development_status'),
+    ('population', 'population'),
+    ('family', 'family__slug'),
+    ('macrolanguage', 'macrolanguage__iso639_3'),
+    ('macroarea', 'macroarea__name'),
+    ('notes', 'notes'),
+]
+
+# Lists of related rows, exported as nested JSON
+RELATED_FIELDS = ['alternative_names', 'used_in', 'development_notes', 'characteristics']
+
+FLAT_CHARACTERISTIC_FIELDS = [
+    'kind', 'notes', 'word_type', 'related_word_type', 'position', 'modifier',
+    'number', 'sound_type', 'order', 'pattern',
+]
+
+FORMATS = ['jsonl', 'csv', 'parquet']
+
+
+def to_json(obj):
+    return json.dumps(obj, cls=DjangoJSONEncoder, ensure_ascii=False)
+
+
+class JsonLinesWriter(object):
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, records):
+        self.stream.write(''.join(to_json(record) + '\n' for record in records))
+
+    def close(self):
+        pass
+
+
+class CsvWriter(object):
+    """
+    One row per language, with the related rows as JSON columns
+    """
+    def __init__(self, stream):
+        self.writer = csv.writer(stream, lineterminator='\n')
+        self.writer.writerow([name for name, lookup in LANGUAGE_FIELDS] + RELATED_FIELDS)
+
+    def write(self, records):
+        self.writer.writerows(
+            [record[name] for name, lookup in LANGUAGE_FIELDS] +
+            [to_json(record[name]) for name in RELATED_FIELDS]
+            for record in records)
+
+    def close(self):
+        pass
+
+
+class ParquetWriter(object):
+    """
+    One row group per chunk, with the related rows as JSON columns
+    """
+    def __init__(self, path):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise CommandError(
+                "Exporting to Parquet requires pyarrow. Install it with:"
+                "\n"
+                "\n"
+                "    pip install django-world-languages[export]")
+
+        self.pyarrow = pyarrow
+        integers = ('development_status', 'population')
+        self.schema = pyarrow.schema(
+            [(name, pyarrow.int64() if name in integers else pyarrow.string())
+             for name, lookup in LANGUAGE_FIELDS] +
+            [(name, pyarrow.string()) for name in RELATED_FIELDS])
+        self.writer = pyarrow.parquet.ParquetWriter(path, self.schema)
+
+    def write(self, records):
+        columns = {name: [] for name in self.schema.names}
+        for record in records:
+            for name, lookup in LANGUAGE_FIELDS:
+                value = record[name]
+                columns[name].append(str(value) if name == 'id' else value)
+            for name in RELATED_FIELDS:
+                columns[name].append(to_json(record[name]))
+        self.writer.write_table(self.pyarrow.Table.from_pydict(columns, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+class Command(BaseCommand):
+    help = "Export every language, with its related rows, as JSON lines, CSV or Parquet"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--format',
+            choices=FORMATS,
+            default='jsonl',
+            help="Output format: {}".format(', '.join(FORMATS)))
+        parser.add_argument(
+            '--output',
+            default='-',
+            help="File to write to, '-' (the default) for stdout")
+        parser.add_argument(
+            '--chunk-size',
+            default=500,
+            type=int,
+            help="Number of languages to fetch (and hold in memory) at a time")
+
+    def handle(self, *args, **options):
+        output = options['output']
+        format_ = options['format']
+
+        if format_ == 'parquet':
+            if output == '-':
+                raise CommandError("Parquet can't be written to stdout, pass --output")
+            writer = ParquetWriter(output)
+            self.export(writer, options['chunk_size'])
+        elif output == '-':
+            writer = self.get_text_writer(format_, self.stdout)
+            self.export(writer, options['chunk_size'])
+        else:
+            with open(output, 'w', encoding='utf-8', newline='') as stream:
+                writer = self.get_text_writer(format_, stream)
+                self.export(writer, options['chunk_size'])
+
+    def get_text_writer(self, format_, stream):
+        if format_ == 'csv':
+            return CsvWriter(stream)
+        return JsonLinesWriter(stream)
+
+    def export(self, writer, chunk_size):
+        """
+        Write the languages a chunk at a time, paging through them by primary
+        key, so only a chunk is held in memory whatever the database driver
+        """
+        languages = Language.objects.order_by('pk').values(*(lookup for name, lookup in LANGUAGE_FIELDS))
+
+        last_pk = None
+        while True:
+            page = languages if last_pk is None else languages.filter(pk__gt=last_pk)
+            chunk = list(page[:chunk_size])
+            if not chunk:
+                break
+            writer.write(self.build_records(chunk))
+            last_pk = chunk[-1]['id']
+        writer.close()
+
+    def build_records(self, languages):
+        """
+        Attach the related rows of a chunk of languages, with one query per
+        kind of related row
+        """
+        ids = [language['id'] for language in languages]
+        related = {name: defaultdict(list) for name in RELATED_FIELDS}
+
+        for row in AlternativeName.all_objects.filter(language_id__in=ids).order_by('pk').values(
+                'language_id', 'name', 'type', 'in_language_code', 'preferred', 'colloquial'):
+            related['alternative_names'][row.pop('language_id')].append(row)
+
+        for row in UsedIn.objects.filter(language_id__in=ids).order_by('pk').values(
+                'language_id', 'country_code', 'population', 'development_status', 'as_of'):
+            related['used_in'][row.pop('language_id')].append(row)
+
+        for row in DevelopmentNote.objects.filter(language_id__in=ids).order_by('pk').values(
+                'language_id', 'ordinal', 'note', *DEVELOPMENT_NOTE_SUBCLASSES):
+            # Multi-table inheritance, so the subclass is the one with a row
+            subclasses = [subclass for subclass in DEVELOPMENT_NOTE_SUBCLASSES if row.pop(subclass) is not None]
+            row['kind'] = subclasses[0] if subclasses else 'developmentnote'
+            related['development_notes'][row.pop('language_id')].append(row)
+
+        # The flattened rows, rather than the polymorphic Characteristic
+        # querysets and their query per subclass
+        for row in FlatCharacteristic.objects.filter(language_id__in=ids).order_by('pk').values(
+                'language_id', *FLAT_CHARACTERISTIC_FIELDS):
+            language_id = row.pop('language_id')
+            related['characteristics'][language_id].append(
+                {field: value for field, value in row.items() if value is not None})
+
+        records = []
+        for language in languages:
+            record = {name: language[lookup] for name, lookup in LANGUAGE_FIELDS}
+            for name in RELATED_FIELDS:
+                record[name] = related[name].get(language['id'], [])
+            records.append(record)
+        return records
@@ -1,36 +1,36 @@
 import collections
-import inspect
+import hashlib
 import io
+import json
 import logging
 import os
 import re
 import string
 import time
+import uuid
 import zipfile
 from datetime import datetime, timedelta
 from pprint import pprint
 from urllib.parse import urlparse
 
 import regex
-import yaml
 from optparse import make_option
-from pyquery import PyQuery as pq
-from tqdm import tqdm
 
 import django
-from django.core.management.base import BaseCommand
-from django.db import transaction, IntegrityError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction, IntegrityError
 from django.db.models import Q
 from django.db.utils import IntegrityError
 from django.forms.models import model_to_dict
+from django.utils.timezone import now
 
-from cities.models import Country, AlternativeName as AlternativeCountryName
+from cities.models import Country
 
 from ...conf import *
 from ...models import (OKAY_LITERACY_TAG_NAMES, OKAY_TAG_NAMES,
                        cv_rgx, glid_rgx, iso639_1_rgx, iso639_3_rgx,
                        syllable_pattern_rgx, svo_rgx,
-                       slugify,
+                       eager_slugify as slugify,
                        Macroarea, Family, Language, AlternativeName,
                        LexicalSimilarity,
                        UsedIn,
@@ -38,13 +38,24 @@ from ...models import (OKAY_LITERACY_TAG_NAMES, OKAY_TAG_NAMES,
                        Characteristic, AbsoluteWordTypeOrder,
                        RelativeWordTypeOrder, SpeechSoundCount,
                        SubjectVerbObjectOrder, SyllablePattern,
+                       FlatCharacteristic,
                        Script, ScriptStyle, ScriptUsage, ScriptUsageStyle,
                        AlternativeScriptName,
                        DevelopmentNote, DevelopmentNoteTag,
                        DevelopmentNoteBible, DevelopmentNoteLiteracy,
                        DevelopmentNoteLiteracyTag,
-                       DevelopmentNoteLiteracyPercent)
-from ...utils import urlopen_with_progress
+                       DevelopmentNoteLiteracyPercent,
+                       ImportRun)
+from ...flush import FLUSH_GROUPS, flush_models, flush_tables
+from ...loaders import load_rows
+from ...maintenance import MAINTENANCE_STEPS, run_maintenance
+from ...resolvers import CountryResolver
+from ...shadow import ShadowSchema
+from ...signals import languages_imported
+from ...stages import Prefetcher, Stage, order_stages
+from ...typology import TypologyIndex
+from ...utils import chunked, lazy_compile, urlopen_with_progress
+from ...version import bump_data_version, data_version
 
 # TODO: Remove backwards compatibility once django-cities requires Django 1.7
 # or 1.8 LTS.
@@ -52,6 +63,73 @@ _transact = (transaction.commit_on_success if django.VERSION < (1, 6) else
              transaction.atomic)
 
 
+# Models whose row counts are recorded for each import run
+COUNTED_MODELS = [
+    Macroarea, Family, Language, AlternativeName, LexicalSimilarity, UsedIn,
+    Dialect, DialectNote, Characteristic, FlatCharacteristic, Script,
+    ScriptUsage, DevelopmentNote,
+]
+
+WIKIPEDIA_URL = 'https://en.wikipedia.org/wiki/{}'
+ISO639_1_URL = WIKIPEDIA_URL.format('List_of_ISO_639-1_codes')
+ISO639_2_URL = WIKIPEDIA_URL.format('List_of_ISO_639-2_codes')
+ISO639_5_URL = WIKIPEDIA_URL.format('List_of_ISO_639-5_codes')
+MACROLANGUAGES_URL = WIKIPEDIA_URL.format('ISO_639_macrolanguage')
+LANGUAGE_FAMILIES_URL = WIKIPEDIA_URL.format('List_of_language_families')
+ALTERNATIVE_NAMES_URL = WIKIPEDIA_URL.format('ISO_639:{}')
+
+
+def file_urls(filekey):
+    """
+    The URL get_data() downloads ``filekey`` from first
+    """
+    files = settings.files[filekey]
+    if 'filename' not in files:
+        return []
+    return [files['urls'][0].format(filename=files['filename'])]
+
+
+# The stages of --import=language, which can also be imported on their own.
+# Their downloads are all started at once, and the stages run one at a time
+# in this order (see order_stages())
+IMPORT_STAGES = collections.OrderedDict([
+    ('undetermined_and_english', Stage(
+        'create_undetermined_and_english_languages', (),
+        lambda: [])),
+    ('glottolog', Stage(
+        'import_glottolog', ('undetermined_and_english',),
+        lambda: file_urls('glottolog') + file_urls('language'))),
+    ('iso639_5', Stage(
+        'import_iso_language_families_from_wikipedia', ('glottolog',),
+        lambda: [ISO639_5_URL, ISO639_1_URL])),
+    ('iso639_2', Stage(
+        'import_iso639_2_language_types_and_scopes_from_wikipedia', ('iso639_5',),
+        lambda: [ISO639_2_URL, MACROLANGUAGES_URL])),
+    ('iso639_1', Stage(
+        'import_languages_from_wikipedia', ('glottolog',),
+        lambda: [ISO639_1_URL])),
+    ('alternative_names', Stage(
+        'import_alternative_language_names', ('glottolog', 'iso639_1'),
+        lambda: [ALTERNATIVE_NAMES_URL.format(letter) for letter in string.ascii_lowercase])),
+    ('additional_languages', Stage(
+        'import_additional_languages', ('glottolog',),
+        lambda: file_urls('language'))),
+])
+
+
+# pyquery (with lxml), yaml and tqdm take a while to import, and most
+# invocations of manage.py only load this module to list its options
+
+def pq(*args, **kwargs):
+    from pyquery import PyQuery
+    return PyQuery(*args, **kwargs)
+
+
+def tqdm(*args, **kwargs):
+    from tqdm import tqdm
+    return tqdm(*args, **kwargs)
+
+
 def log(str):
     pass
 # log = print
@@ -76,23 +154,6 @@ def plog(obj):
 # yaml.add_constructor(_mapping_tag, dict_constructor)
 
 
-if Country.objects.count() < 200:
-    raise Exception("You must import continents and countries before importing "
-                    "languages. To do this run:"
-                    "\n"
-                    "\n"
-                    "    python manage.py cities --import=country"
-                    "\n"
-                    "\n"
-                    "or:"
-                    "\n"
-                    "\n"
-                    "    python manage.py cities --import=all"
-                    "\n"
-                    "\n"
-                    "Refer to the django-cities package documentation for more "
-                    "specific information:\n\ndjango-cities.rtfd.org")
-
 MINOR_USAGE_PHRASES = ['experimental', 'limited usage', 'limited use', 'minor',
                        'never widely used', 'small-scale use',
                        'small collection']
@@ -253,13 +314,13 @@ NUMBERS.update(UNITS)
 NUMBERS.update(TENS)
 NUMBERS.update(SCALES)
 
-aka_rgx = re.compile('^a\.?k\.?a\.?\s*')
-alt_name_rgx = re.compile(r'\s*\(\w+\)\s*$', re.UNICODE)
-as_of_rgx = re.compile(r'.*\((?P<year1>\d{4})|.*(?P<year2>\d{4})\)')
-country_rgx = re.compile(r"^(?P<name>(?:[-\w',]+\s+)*[-\w',]+)\s+\[(?P<code>[A-Z]{2})\]$", re.UNICODE)
-country_name_rgx = re.compile(r"(?P<name>(?:[-\w',]+\s+)*[-\w',]+)(?!\()", re.UNICODE)
-country_name_and_code_rgx = re.compile(r"^(?P<name>(?:[-\w',]+\s+)*[-\w',]+)\s*(?:\[(?P<code>[A-Z]{2})\])?", re.UNICODE)
-cv_num_repl_rgx = regex.compile(r'''
+aka_rgx = lazy_compile(re, '^a\.?k\.?a\.?\s*')
+alt_name_rgx = lazy_compile(re, r'\s*\(\w+\)\s*$', re.UNICODE)
+as_of_rgx = lazy_compile(re, r'.*\((?P<year1>\d{4})|.*(?P<year2>\d{4})\)')
+country_rgx = lazy_compile(re, r"^(?P<name>(?:[-\w',]+\s+)*[-\w',]+)\s+\[(?P<code>[A-Z]{2})\]$", re.UNICODE)
+country_name_rgx = lazy_compile(re, r"(?P<name>(?:[-\w',]+\s+)*[-\w',]+)(?!\()", re.UNICODE)
+country_name_and_code_rgx = lazy_compile(re, r"^(?P<name>(?:[-\w',]+\s+)*[-\w',]+)\s*(?:\[(?P<code>[A-Z]{2})\])?", re.UNICODE)
+cv_num_repl_rgx = lazy_compile(regex, r'''
     (?(DEFINE)
         (?P<units>{units})
         (?P<tens>{tens})
@@ -299,7 +360,7 @@ cv_num_repl_rgx = regex.compile(r'''
     tens='|'.join(TENS.keys()),
     scales='|'.join(SCALES.keys()),
     ), regex.VERBOSE)
-cv_num_rgx = regex.compile(r'''
+cv_num_rgx = lazy_compile(regex, r'''
     (?(DEFINE)
         (?P<units>{units})
         (?P<tens>{tens})
@@ -334,21 +395,22 @@ cv_num_rgx = regex.compile(r'''
     tens='|'.join(TENS.keys()),
     scales='|'.join(SCALES.keys()),
     ), regex.VERBOSE)
-dev_status_rgx = re.compile(r'^(?P<status>[^.]+)(?:\.\s*(?P<notes>.+))?\.?$')
-dialect_notes_split_rgx = re.compile(r'\.\s*(?!:$)')
-dialect_split_rgx = re.compile(r'(?:[^,(]|\([^)]*\))+')
-family_name_rgx = re.compile(r'^(?P<glottolog_name>.*)\s+\[(?P<glottolog_id>[a-z]{4}\d{4}|[a-z]\d{2}[a-z]\d{4})\]\s*$')
-find_country_rgx = regex.compile(r".*\s+in\s+(?:the\s+)?(?P<name>(?:\p{Lu}\p{Ll}+[-\s]+)*\p{Lu}\p{Ll}+).*")
-full_dialect_rgx = re.compile(r'^(?P<dialect>[^()]+)(?:\s+\((?P<akas>.+)\))?\.?')
-language_name_rgx = re.compile(r'^(?P<mother_language>(?:\w+\s+)*\w+),\s*(?P<language_prefix>\w+(?:\s+\w+)*)\s*(?:\[(?P<code>[a-z]{3})\])?$')
-lex_sim_rgx = re.compile(r'(?P<name>(?:[-\w]+\s+)*[-\w]+)\s*(?:\[(?P<code>[a-z]{3})\])?\s*')
-lit_tag_rgx = re.compile(r'^(?P<tag>{})$'.format('|'.join(OKAY_LITERACY_TAG_NAMES), re.I))
-macrol_rgx = re.compile(r'^macrolanguage,?\s*')
-overall_pop_rgx = re.compile(r'.*Population total[^\d]+(?P<total_population>[\d,]+).*')
-percent_rgx = re.compile(r'^(?:\w+\s+)*(?P<low>\d+)%?(?:-(?P<high>\d+)%?)?')
-pop_and_country_rgx = re.compile(r"^(?:(?P<pop>[\d,]+)|(?P<desc>\w+))\s+in\s+(?P<country>[\w',\s]+(?!:\s+\(|\s+\.|\s+and))(?:(?P<and>\s*and\s*)(?(and)(?P<other_country>(?:[\w',\s](?!:\s+\())+)))?", re.UNICODE)
-pop_rgx = re.compile(r'^(?P<pop>[\d,]+)')
-script_rgx = regex.compile(r'''
+dev_status_rgx = lazy_compile(re, r'^(?P<status>[^.]+)(?:\.\s*(?P<notes>.+))?\.?$')
+dialect_notes_split_rgx = lazy_compile(re, r'\.\s*(?!:$)')
+dialect_split_rgx = lazy_compile(re, r'(?:[^,(]|\([^)]*\))+')
+family_name_rgx = lazy_compile(re, r'^(?P<glottolog_name>.*)\s+\[(?P<glottolog_id>[a-z]{4}\d{4}|[a-z]\d{2}[a-z]\d{4})\]\s*$')
+find_country_rgx = lazy_compile(regex, r".*\s+in\s+(?:the\s+)?(?P<name>(?:\p{Lu}\p{Ll}+[-\s]+)*\p{Lu}\p{Ll}+).*")
+full_dialect_rgx = lazy_compile(re, r'^(?P<dialect>[^()]*[^()\s])(?:\s*\((?P<akas>.+)\))?\.?')
+language_name_rgx = lazy_compile(re, r'^(?P<mother_language>(?:\w+\s+)*\w+),\s*(?P<language_prefix>\w+(?:\s+\w+)*)\s*(?:\[(?P<code>[a-z]{3})\])?$')
+lex_sim_rgx = lazy_compile(re, r'(?P<name>(?:[-\w]+\s+)*[-\w]+)\s*(?:\[(?P<code>[a-z]{3})\])?\s*')
+lit_tag_rgx = lazy_compile(re, r'^(?P<tag>{})$'.format('|'.join(OKAY_LITERACY_TAG_NAMES), re.I))
+macrol_rgx = lazy_compile(re, r'^macrolanguage,?\s*')
+overall_pop_rgx = lazy_compile(re, r'.*Population total[^\d]+(?P<total_population>[\d,]+).*')
+percent_rgx = lazy_compile(re, r'^(?:\w+\s+)*(?P<low>\d+)%?(?:-(?P<high>\d+)%?)?')
+pop_and_country_rgx = lazy_compile(re, r"^(?:(?P<pop>[\d,]+)|(?P<desc>\w+))\s+in\s+(?P<country>[\w',\s]+(?!:\s+\(|\s+\.|\s+and))"
+                                       r"(?:(?P<and>\s*and\s*)(?(and)(?P<other_country>(?:[\w',\s](?!:\s+\())+)))?", re.UNICODE)
+pop_rgx = lazy_compile(re, r'^(?P<pop>[\d,]+)')
+script_rgx = lazy_compile(regex, r'''
     ^
     (?(DEFINE)
         (?P<name_part>\(?(?:\p{Lu}\p{Ll}*(?:[-']?\p{Lu}?\p{Ll}*)*|ideograms|movement|notation|system)\)?)
@@ -361,22 +423,33 @@ script_rgx = regex.compile(r'''
     (?:,\s+(?P<notes>.*))?
     $
     ''', regex.VERBOSE)
-script_names_rgx = re.compile(r'''
+script_names_rgx = lazy_compile(re, r'''
     (?P<name>(?:[^()\s]+\s+)*[^()\s]+)
     (?:\s+
     \((?P<alt_names>[^)]+)\))?
     (?:\s+
       (?P<other_things>(?:[^()\s]+\s+)*[^()\s]+)+
     )?''', re.VERBOSE)
-script_usage_end_century_rgx = re.compile(r'(?:used\s+)?(?:{})(?P<about>\s+about)?(?:\s+the)?(?:\s+(?P<early_or_late>early|late))?\s+(?:(?P<turn_of_the_other_century>turn of the )?(?P<other_century>\d+)(?:st|nd|rd|th)?\s+(?:to)(?:the\s+)?)?(?P<turn_of_the_century>turn of the )?(?P<century>\d+)(?:st|nd|rd|th)? century'.format('|'.join(SCRIPT_USAGE_BEGIN_PHRASES)))
-script_usage_end_year_rgx = re.compile(r'(?:used\s+)?(?:{})(?P<about>\s+about)?(?:\s+the)?\s+(?P<year>\d{{4}})(?P<decade>s)?(?:\s+or\s+(?P<other_year>\d{{4}})(?P<other_decade>s)?)?'.format('|'.join(SCRIPT_USAGE_END_PHRASES)))
-script_usage_start_century_rgx = re.compile(r'(?:used\s+)?(?:{})(?P<about>\s+about)?(?:\s+the)?(?:\s+(?P<early_or_late>early|late))?\s+(?:(?P<turn_of_the_other_century>turn of the )?(?P<other_century>\d+)(?:st|nd|rd|th)?\s+(?:to)(?:the\s+)?)?(?P<turn_of_the_century>turn of the )?(?P<century>\d+)(?:st|nd|rd|th)? century'.format('|'.join(SCRIPT_USAGE_BEGIN_PHRASES)))
-script_usage_start_year_rgx = re.compile(r'(?:used\s+)?(?:{})(?P<about>\s+about)?(?:\s+the)?\s+(?P<year>\d{{4}})(?P<decade>s)?(?:\s+or\s+(?P<other_year>\d{{4}})(?P<other_decade>s)?)?'.format('|'.join(SCRIPT_USAGE_END_PHRASES)))
-script_usage_in_rgx = regex.compile(r'(?(DEFINE)(?P<country_name>(?:\p{Lu}\p{Ll}+[-\s]+)*\p{Lu}\p{Ll}+)).*(?:us(?:e|ed|age)|official script) in(?:\s+the)? (?P<country_list>(?:(?&country_name),?\s*)?(?:(?&country_name),\s*)*(?:and\s+)?(?&country_name)).*')
-tag_rgx = re.compile(r'^(?P<tag>{})$'.format('|'.join(OKAY_TAG_NAMES)), re.I)
-usage_status_rgx = re.compile(r'^(?P<code>\d+)(?P<subcode>\w*|Unattested\.)\s+\((?P<status>[^)]+)\)(?:\.\s*(?P<notes>.+|\.?))?$')
-wt_rgx = regex.compile(
-    r'''
+script_usage_end_century_rgx = lazy_compile(re, (r'(?:used\s+)?(?:{})(?P<about>\s+about)?(?:\s+the)?(?:\s+(?P<early_or_late>early|late))?'
+                                                 r'\s+(?:(?P<turn_of_the_other_century>turn of the )?(?P<other_century>\d+)(?:st|nd|rd|th)?'
+                                                 r'\s+(?:to)(?:the\s+)?)?'
+                                                 r'(?P<turn_of_the_century>turn of the )?(?P<century>\d+)(?:st|nd|rd|th)? century').format(
+                                                     '|'.join(SCRIPT_USAGE_BEGIN_PHRASES)))
+script_usage_end_year_rgx = lazy_compile(re, (r'(?:used\s+)?(?:{})(?P<about>\s+about)?(?:\s+the)?\s+(?P<year>\d{{4}})(?P<decade>s)?'
+                                              r'(?:\s+or\s+(?P<other_year>\d{{4}})(?P<other_decade>s)?)?').format('|'.join(SCRIPT_USAGE_END_PHRASES)))
+script_usage_start_century_rgx = lazy_compile(re, (r'(?:used\s+)?(?:{})(?P<about>\s+about)?(?:\s+the)?(?:\s+(?P<early_or_late>early|late))?'
+                                                   r'\s+(?:(?P<turn_of_the_other_century>turn of the )?(?P<other_century>\d+)(?:st|nd|rd|th)?'
+                                                   r'\s+(?:to)(?:the\s+)?)?'
+                                                   r'(?P<turn_of_the_century>turn of the )?(?P<century>\d+)(?:st|nd|rd|th)? century').format(
+                                                       '|'.join(SCRIPT_USAGE_BEGIN_PHRASES)))
+script_usage_start_year_rgx = lazy_compile(re, (r'(?:used\s+)?(?:{})(?P<about>\s+about)?(?:\s+the)?\s+(?P<year>\d{{4}})(?P<decade>s)?'
+                                                r'(?:\s+or\s+(?P<other_year>\d{{4}})(?P<other_decade>s)?)?').format('|'.join(SCRIPT_USAGE_END_PHRASES)))
+script_usage_in_rgx = lazy_compile(regex, r'(?(DEFINE)(?P<country_name>(?:\p{Lu}\p{Ll}+[-\s]+)*\p{Lu}\p{Ll}+))'
+                                          r'.*(?:us(?:e|ed|age)|official script) in(?:\s+the)? '
+                                          r'(?P<country_list>(?:(?&country_name),?\s*)?(?:(?&country_name),\s*)*(?:and\s+)?(?&country_name)).*')
+tag_rgx = lazy_compile(re, r'^(?P<tag>{})$'.format('|'.join(OKAY_TAG_NAMES)), re.I)
+usage_status_rgx = lazy_compile(re, r'^(?P<code>\d+)(?P<subcode>\w*|Unattested\.)\s+\((?P<status>[^)]+)\)(?:\.\s*(?P<notes>.+|\.?))?$')
+wt_rgx = lazy_compile(regex, r'''
     (?(DEFINE)
         (?P<tbns>
             (?:
@@ -442,7 +515,7 @@ wt_rgx = regex.compile(
     things_before_nouns='|'.join(['{}s?'.format(tbn) for tbn in GRAMEMES]).replace(' ', r'\s+')
     ), regex.VERBOSE | regex.IGNORECASE)
 # Used to tokenize word type orders
-wt_token_rgx = regex.compile(r'(?:{})'.format(
+wt_token_rgx = lazy_compile(regex, r'(?:{})'.format(
     '|'.join(
         list(r'\b{}(?:es)?\b'.format(tbn)
              if tbn.endswith('ss')
@@ -453,23 +526,11 @@ wt_token_rgx = regex.compile(r'(?:{})'.format(
         list(r'\b{}\b'.format(m) for m in MODIFIERS)
     ).replace(' ', r'\s+')))
 
-cv_number_index = cv_num_rgx.groupindex['number']-1
-cv_modifier_index = cv_num_rgx.groupindex['modifier']-1
-cv_type_index = cv_num_rgx.groupindex['type']-1
-cvs_index = syllable_pattern_rgx.groupindex['cvs']-1
-wt_rgx_index = wt_rgx.groupindex['tbnses']-1
-
 
 def add_alt_names(en, l, alt_names):
-    for i, alt_name in enumerate(alt_names):
-        try:
-            aln = AlternativeName.objects.get(name=alt_name, in_language=en)
-        except AlternativeName.DoesNotExist:
-            aln = AlternativeName.objects.create(
-                language=l,
-                name=alt_name,
-                type=AlternativeName.TYPE.name,
-                in_language=en)
+    AlternativeName.objects.upsert_many([
+        AlternativeName(language=l, name=alt_name, type=AlternativeName.TYPE.name, in_language=en)
+        for alt_name in alt_names])
 
 
 def add_dialects(used_in, dialect_soup):
@@ -489,25 +550,23 @@ def add_dialects(used_in, dialect_soup):
         # dialect (aka1, aka2)
         m = full_dialect_rgx.match(dialect)
 
-        # Only create the notes on the first one
-        try:
-            d = Dialect.objects.get(used_in=used_in, name=m.group('dialect'))
-        except Dialect.DoesNotExist:
-            dnotes = ' '.join(['{}.'.format(n) for n in dialect_notes])
-            d = Dialect.objects.create(used_in=used_in, name=m.group('dialect'), notes=dnotes)
-
-        # Create the rest of the dialects
-        dakas = [d]
+        names = [m.group('dialect')]
         if m.group('akas') is not None:
-            for dialect in m.group('akas').split(', '):
-                d, _ = Dialect.objects.get_or_create(used_in=used_in, name=dialect)
-                dakas.append(d)
+            for name in m.group('akas').split(', '):
+                if name not in names:
+                    names.append(name)
 
-        # Link them together with also_known_as
-        # Assumes also_known_as is symmetrical, and is O(N^2) time
-        for i, d1 in enumerate(dakas[:-1]):
-            for d2 in dakas[i+1:]:
-                d1.also_known_as.add(d2)
+        # Create the missing dialects in bulk, only the first one gets the notes
+        existing = set(Dialect.objects.filter(used_in=used_in, name__in=names).values_list('name', flat=True))
+        Dialect.objects.bulk_create([
+            Dialect(used_in=used_in, name=name,
+                    notes=' '.join(['{}.'.format(n) for n in dialect_notes]) if i == 0 else '')
+            for i, name in enumerate(names) if name not in existing])
+        dakas = list(Dialect.objects.filter(used_in=used_in, name__in=names))
+
+        # Aliases share a group
+        if len(dakas) > 1:
+            Dialect.objects.link_aliases(dakas)
 
 
 def add_language(name, name_gl, iso639_1, iso639_2t, iso639_2b, iso639_3,
@@ -601,66 +660,17 @@ def add_lexical_similarities(language, lexical_similarities, lex_sim_soup):
 
 
 def add_native_names(l, native_names):
-    for i, native_name in enumerate(native_names):
-        aln = None
-        name = alt_name_rgx.sub('', native_name).strip()
-        while aln is None:
-            try:
-                aln = l.alternative_names.get(
-                    name=name,
-                    in_language=l,
-                    type=AlternativeName.TYPE.name)
-            except AlternativeName.DoesNotExist:
-                log('l: {}'.format(l))
-                try:
-                    log("AlternativeName (slug): {}".format(slugify('{}_({})'.format(name, l.iso639_3))))
-                    aln = AlternativeName.objects.get(slug=slugify('{}_({})'.format(name, l.iso639_3)))
-                except AlternativeName.DoesNotExist:
-                    try:
-                        log("AlternativeName:")
-                        plog({
-                            'language': l,
-                            'name': name,
-                            'in_language': l,
-                            'type': AlternativeName.TYPE.name,
-                            'preferred': True if i == 0 else False,
-                            'colloquial': True
-                        })
-                        aln = AlternativeName.objects.get(
-                            language=l,
-                            name=name,
-                            in_language=l,
-                            type=AlternativeName.TYPE.name,
-                            preferred=True if i == 0 else False,
-                            colloquial=True)
-                    except AlternativeName.DoesNotExist:
-                        log("Creating AlternativeName:")
-                        plog({
-                            'language': l,
-                            'name': name,
-                            'in_language': l,
-                            'type': AlternativeName.TYPE.name,
-                            'preferred': True if i == 0 else False,
-                            'colloquial': True
-                        })
-                        aln = AlternativeName.objects.create(
-                            language=l,
-                            name=name,
-                            in_language=l,
-                            type=AlternativeName.TYPE.name,
-                            preferred=True if i == 0 else False,
-                            colloquial=True)
-                    except AlternativeName.MultipleObjectsReturned:
-                        aln = AlternativeName.objects.get(
-                            language=l,
-                            name=name,
-                            in_language=l,
-                            type=AlternativeName.TYPE.name,
-                            colloquial=True)
-                    aln.preferred = True if i == 0 else False
-                    aln.save()
-            except IntegrityError:
-                aln = None
+    # The first native name is the preferred one
+    AlternativeName.objects.upsert_many([
+        AlternativeName(
+            language=l,
+            name=alt_name_rgx.sub('', native_name).strip(),
+            in_language=l,
+            type=AlternativeName.TYPE.name,
+            preferred=True if i == 0 else False,
+            colloquial=True)
+        for i, native_name in enumerate(native_names)
+    ], update_fields=['preferred'])
 
 
 def clean_word_orders(word_orders):
@@ -695,7 +705,33 @@ def clean_word_orders(word_orders):
                 word_orders[char][i]['modifier'] = word_orders[char][i]['modifier'].replace(' ', '_')
 
 
-def create_language(cmd, data, en):
+def remember_language(pending, l):
+    """
+    Remember ``l`` in ``pending`` by its codes and name, so rows later in the
+    same chunk find it before it's saved
+    """
+    for field in ('iso639_3', 'iso639_1', 'name'):
+        value = getattr(l, field)
+        if value:
+            pending[(field, value)] = l
+
+
+def find_linked_characteristic(chars, model, **values):
+    """
+    The characteristic of exactly ``model`` with ``values`` among ``chars``,
+    the characteristics the language being imported was already linked to,
+    or None
+
+    The links are only written once every language has been imported, so
+    the language's characteristics in the database don't include them yet.
+    """
+    for char in chars:
+        if type(char) is model and all(getattr(char, k) == v for k, v in values.items()):
+            return char
+    return None
+
+
+def create_language(cmd, data, en, pending=None):
     family_name = data[1]
     name, *alt_names = data[2].split(', ')
     native_names = data[3].split(', ')
@@ -727,13 +763,16 @@ def create_language(cmd, data, en):
                 lf = Family.objects.create(name=family_name)
             cmd.call_hook('languagefamily_post', lf, d)
 
-    try:
-        l = Language.objects.get(iso639_3=iso639_3)
-    except Language.DoesNotExist:
+    # Languages of earlier rows of the chunk aren't saved yet
+    l = pending.get(('iso639_3', iso639_3)) if pending and iso639_3 else None
+    if l is None:
         try:
-            Language.objects.get(iso639_1=iso639_1)
+            l = Language.objects.get(iso639_3=iso639_3)
         except Language.DoesNotExist:
-            l = Language()
+            try:
+                Language.objects.get(iso639_1=iso639_1)
+            except Language.DoesNotExist:
+                l = Language()
 
     l.name = name
     l.name_gl = name
@@ -794,6 +833,8 @@ def create_used_in(country, language, known_ases, population, status, usage_note
 class Command(BaseCommand):
     logger = logging.getLogger("cities")
     force = False
+    prefetcher = None
+    typology_index = None
 
     option_list = BaseCommand.option_list + (
         make_option(
@@ -805,26 +846,70 @@ class Command(BaseCommand):
             '--import',
             metavar="DATA_TYPES",
             default='all',
-            help='Selectively import data. Comma separated list of data types: {}'.format(str(import_opts).replace("'", ''))),
+            help='Selectively import data. Comma separated list of data types or import stages: {}'.format(
+                str(import_opts + list(IMPORT_STAGES)).replace("'", ''))),
         make_option(
             '--flush',
             metavar="DATA_TYPES",
             default='',
-            help="Selectively flush data. Comma separated list of data types.")
+            help="Selectively flush data. Comma separated list of data types: {}".format(
+                str(sorted(FLUSH_GROUPS) + ['all']).replace("'", ''))),
+        make_option(
+            '--shadow',
+            action='store_true',
+            default=False,
+            help="Import into copies of the tables and swap them in at the end (PostgreSQL only)."),
+        make_option(
+            '--maintenance',
+            metavar="STEPS",
+            default='',
+            help="Database maintenance to run after importing. Comma separated list of: {}".format(
+                str(MAINTENANCE_STEPS + ['all']).replace("'", ''))),
     )
 
-    @_transact
     def handle(self, *args, **options):
         self.options = options
+        self.check_prerequisites()
+
+        maintenance = [e for e in self.options['maintenance'].split(',') if e]
+        if 'all' in maintenance:
+            maintenance = MAINTENANCE_STEPS
+        unknown = set(maintenance) - set(MAINTENANCE_STEPS)
+        if unknown:
+            raise CommandError("Unknown maintenance steps: {}".format(', '.join(sorted(unknown))))
+
+        unknown = set(e for e in self.options['flush'].split(',') if e) - set(FLUSH_GROUPS) - {'all'}
+        if unknown:
+            raise CommandError("Unknown data types to flush: {}".format(', '.join(sorted(unknown))))
+
+        unknown = set(e for e in self.options['import'].split(',') if e) - set(import_opts) - set(IMPORT_STAGES)
+        if unknown:
+            raise CommandError("Unknown data types to import: {}".format(', '.join(sorted(unknown))))
+
+        with _transact():
+            self.run_imports()
+
+        # VACUUM and REINDEX CONCURRENTLY can't run in a transaction, and the
+        # statistics should describe the committed data
+        if maintenance:
+            self.maintain(maintenance)
+
+    def run_imports(self):
+        self.sources = collections.OrderedDict()
+        started = now()
 
         self.force = self.options['force']
 
+        self.shadow = None
+        if self.options['shadow']:
+            self.shadow = ShadowSchema(connection, settings.shadow_min_row_ratio)
+            self.shadow.create()
+
         self.flushes = [e for e in self.options['flush'].split(',') if e]
         if 'all' in self.flushes:
             self.flushes = import_opts_all
         for flush in self.flushes:
-            func = getattr(self, "flush_" + flush)
-            func()
+            self.flush(flush)
 
         self.imports = [e for e in self.options['import'].split(',') if e]
         if 'all' in self.imports:
@@ -832,22 +917,118 @@ class Command(BaseCommand):
         if self.flushes:
             self.imports = []
         for import_ in self.imports:
-            func = getattr(self, "import_" + import_)
-            func()
+            if import_ not in IMPORT_STAGES:
+                func = getattr(self, "import_" + import_)
+                func()
+        stages = [e for e in self.imports if e in IMPORT_STAGES]
+        if stages:
+            self.run_stages(stages)
+
+        if self.imports:
+            # Codes changed with update(), which doesn't send signals
+            UsedIn.objects.refresh_country_codes()
+            AlternativeName.all_objects.refresh_language_codes()
+
+        if self.flushes or self.imports:
+            if self.shadow:
+                self.shadow.validate(COUNTED_MODELS)
+            self.record_import_run(started)
+
+        if self.shadow:
+            self.shadow.swap()
+
+    def maintain(self, steps):
+        for step, seconds in run_maintenance(steps):
+            if seconds is None:
+                self.stdout.write("{}: skipped, not supported by this database".format(step))
+            else:
+                self.stdout.write("{}: {:.2f}s".format(step, seconds))
+
+    def record_import_run(self, started):
+        run = ImportRun.objects.create(
+            version=uuid.uuid4().hex,
+            imports=','.join(self.imports),
+            flushes=','.join(self.flushes),
+            sources=json.dumps(self.sources),
+            row_counts=json.dumps({model.__name__: model._base_manager.count() for model in COUNTED_MODELS}),
+            started=started,
+            finished=now())
+
+        # Only tell caches about the new data once it's visible to them
+        transaction.on_commit(lambda: self.announce_import_run(run))
+
+    def announce_import_run(self, run):
+        if self.typology_index is not None:
+            # Cached before the new version is announced, so no process
+            # builds it again
+            TypologyIndex.discard(data_version())
+            self.typology_index.save(run.version)
+        bump_data_version(run.version)
+        languages_imported.send(sender=ImportRun, import_run=run, version=run.version)
+
+    def fetch(self, url):
+        """
+        Download ``url``, recording its hash for the import run
+        """
+        data = self.prefetcher.get(url) if self.prefetcher else None
+        if data is None:
+            data = urlopen_with_progress(url)
+        self.sources[url] = hashlib.sha256(data.encode('utf-8')).hexdigest()
+        return data
+
+    def check_prerequisites(self):
+        if Country.objects.count() < 200:
+            raise CommandError("You must import continents and countries before importing "
+                               "languages. To do this run:"
+                               "\n"
+                               "\n"
+                               "    python manage.py cities --import=country"
+                               "\n"
+                               "\n"
+                               "or:"
+                               "\n"
+                               "\n"
+                               "    python manage.py cities --import=all"
+                               "\n"
+                               "\n"
+                               "Refer to the django-cities package documentation for more "
+                               "specific information:\n\ndjango-cities.rtfd.org")
 
     def call_hook(self, hook, *args, **kwargs):
-        if hasattr(settings, 'plugins'):
-            for plugin in settings.plugins[hook]:
-                try:
-                    func = getattr(plugin, hook)
-                    func(self, *args, **kwargs)
-                except HookException as e:
-                    error = str(e)
-                    if error:
-                        self.logger.error(error)
-                    return False
+        for func in settings.plugins.get(hook, ()):
+            try:
+                func(self, *args, **kwargs)
+            except HookException as e:
+                error = str(e)
+                if error:
+                    self.logger.error(error)
+                return False
         return True
 
+    def call_batch_hook(self, hook, *chunks):
+        """
+        Call a batch hook of every plugin with whole chunks of rows, eg:
+
+            language_pre_batch(cmd, items)
+            language_post_batch(cmd, languages, items)
+
+        Each hook returns its (filtered) chunks, or None to keep them as
+        they are, and the next plugin is called with the result. Returns the
+        chunks (a single chunk if there is only one), or None if a hook
+        raised HookException to skip the whole batch.
+        """
+        for func in settings.plugins.get(hook, ()):
+            try:
+                result = func(self, *chunks)
+            except HookException as e:
+                error = str(e)
+                if error:
+                    self.logger.error(error)
+                return None
+            if result is not None:
+                chunks = (result,) if len(chunks) == 1 else tuple(result)
+        return chunks[0] if len(chunks) == 1 else chunks
+
     def get_data(self, filekey, key_index=None):
         if key_index is None:
             filename = settings.files[filekey]['filename']
@@ -859,7 +1040,7 @@ class Command(BaseCommand):
             # TODO: Fix this logic - don't catch all exceptions here, it makes
             #       it more difficult to debug
             try:
-                web_file = urlopen_with_progress(url)
+                web_file = self.fetch(url)
                 # if 'html' in web_file.headers['content-type']:
                 #     raise Exception()
                 break
@@ -886,6 +1067,7 @@ class Command(BaseCommand):
                         break
                 file_obj = zipfile.open(zipfilename).readlines()
             elif ext == 'yaml':
+                import yaml
                 data = yaml.safe_load(web_file)
 
                 for key in sorted(data):
@@ -930,9 +1112,10 @@ class Command(BaseCommand):
                 development_status=None,
                 population=0)
 
-        doc = pq(url="https://en.wikipedia.org/wiki/List_of_ISO_639-1_codes",
-                 opener=lambda url, **kwargs: urlopen_with_progress(url))
+        doc = pq(url=ISO639_1_URL,
+                 opener=lambda url, **kwargs: self.fetch(url))
 
+        rows = []
         for row in tqdm(doc("#Partial_ISO_639_table").parent().siblings('table.wikitable > tr')[1:],
                         desc="Importing languages from Wikipedia..."):
             data = [pq(el).text() for el in pq(row).children()]
@@ -960,23 +1143,46 @@ class Command(BaseCommand):
                 'notes': macrol_rgx.sub('', data[9].strip()),
             }
 
-            if not self.call_hook('language_pre', item):
+            rows.append((data, item))
+
+        for chunk in chunked(rows, settings.batch_size):
+            # Batch hooks return the very item dictionaries they were given
+            data_by_item = {id(item): data for data, item in chunk}
+
+            items = self.call_batch_hook('language_pre_batch', [item for data, item in chunk])
+            if items is None:
                 continue
 
-            l = create_language(self, data, en)
+            languages = []
+            kept_items = []
+            pending = {}
+            for item in items:
+                if not self.call_hook('language_pre', item):
+                    continue
+
+                l = create_language(self, data_by_item[id(item)], en, pending)
+
+                if not self.call_hook('language_post', l, item):
+                    continue
+
+                remember_language(pending, l)
+                languages.append(l)
+                kept_items.append(item)
 
-            if not self.call_hook('language_post', l, item):
+            result = self.call_batch_hook('language_post_batch', languages, kept_items)
+            if result is None:
                 continue
 
-            l.save()
+            for l, item in zip(*result):
+                l.save()
 
-            add_alt_names(en, l, item['alt_names'])
+                add_alt_names(en, l, item['alt_names'])
 
-            add_native_names(l, item['native_names'])
+                add_native_names(l, item['native_names'])
 
     def import_macrolanguages_from_wikipedia(self):
-        doc = pq(url="https://en.wikipedia.org/wiki/ISO_639_macrolanguage",
-                 opener=lambda url, **kwargs: urlopen_with_progress(url))
+        doc = pq(url=MACROLANGUAGES_URL,
+                 opener=lambda url, **kwargs: self.fetch(url))
 
         for row in tqdm(doc("#List_of_macrolanguages").parent().siblings('table.wikitable > tr')[1:],
                         desc="Importing macrolanguages from Wikipedia..."):
@@ -992,8 +1198,8 @@ class Command(BaseCommand):
                 continue
 
     def import_iso639_2_language_types_and_scopes_from_wikipedia(self):
-        doc = pq(url="https://en.wikipedia.org/wiki/List_of_ISO_639-2_codes",
-                 opener=lambda url, **kwargs: urlopen_with_progress(url))
+        doc = pq(url=ISO639_2_URL,
+                 opener=lambda url, **kwargs: self.fetch(url))
 
         for row in tqdm(doc("table tr th:contains('Scope')").parent().parent().children()[1:],
                         desc="Importing ISO 639-2 types..."):
@@ -1034,8 +1240,8 @@ class Command(BaseCommand):
             l.save()
 
         # Tie each macrolanguage to its family
-        doc = pq(url="https://en.wikipedia.org/wiki/ISO_639_macrolanguage",
-                 opener=lambda url, **kwargs: urlopen_with_progress(url))
+        doc = pq(url=MACROLANGUAGES_URL,
+                 opener=lambda url, **kwargs: self.fetch(url))
 
         for row in tqdm(doc("#List_of_macrolanguages_and_the_individual_languages").parent().nextAll('h4, ol'),
                         desc="Importing ISO macrolanguages from Wikipedia..."):
@@ -1081,8 +1287,8 @@ class Command(BaseCommand):
                 population=0)
 
         # Import the actual languages first
-        doc = pq(url="https://en.wikipedia.org/wiki/List_of_ISO_639-5_codes",
-                 opener=lambda url, **kwargs: urlopen_with_progress(url))
+        doc = pq(url=ISO639_5_URL,
+                 opener=lambda url, **kwargs: self.fetch(url))
 
         hierarchy = []
 
@@ -1139,8 +1345,8 @@ class Command(BaseCommand):
                     saved_hierarchy[lcode] = iso_family
 
         # Tie each language to its family
-        doc = pq(url="https://en.wikipedia.org/wiki/List_of_ISO_639-1_codes",
-                 opener=lambda url, **kwargs: urlopen_with_progress(url))
+        doc = pq(url=ISO639_1_URL,
+                 opener=lambda url, **kwargs: self.fetch(url))
 
         for row in tqdm(doc("table tr th:contains('Language family')").parent().parent().children()[1:],
                         desc="Tying languages to their ISO language families..."):
@@ -1203,8 +1409,8 @@ class Command(BaseCommand):
             add_native_names(l, native_names)
 
     def import_language_families_from_wikipedia(self):
-        doc = pq(url="https://en.wikipedia.org/wiki/List_of_language_families",
-                 opener=lambda url, **kwargs: urlopen_with_progress(url))
+        doc = pq(url=LANGUAGE_FAMILIES_URL,
+                 opener=lambda url, **kwargs: self.fetch(url))
 
         for row in tqdm(doc("#Language_families").parent().siblings('table.wikitable')[0].children('tbody').children('tr'),
                         desc="Importing language families from Wikipedia..."):
@@ -1223,13 +1429,15 @@ class Command(BaseCommand):
                 continue
 
     def import_alternative_language_names(self):
-        url = "https://en.wikipedia.org/wiki/ISO_639:{}"
+        url = ALTERNATIVE_NAMES_URL
 
         purl = urlparse(url)
 
+        language_ids = dict(Language.objects.exclude(iso639_3=None).values_list('iso639_3', 'pk'))
+
         for letter in string.ascii_lowercase:
             doc = pq(url=url.format(letter),
-                     opener=lambda url, **kwargs: urlopen_with_progress(url))
+                     opener=lambda url, **kwargs: self.fetch(url))
 
             header_row, *rows = doc('#mw-content-text').children('table.wikitable').children('tr')
 
@@ -1237,6 +1445,9 @@ class Command(BaseCommand):
 
             translated_languages = [(i[0], Language.objects.get(iso639_3=i[1])) for i in header_cols]
 
+            # Every name on the page is written at once
+            names = []
+
             for row in [pq(r) for r in rows]:
                 lang_id = pq(row.children('th')[0])
                 iso639_3 = lang_id.text().strip()
@@ -1245,8 +1456,8 @@ class Command(BaseCommand):
                     continue
 
                 try:
-                    l = Language.objects.get(iso639_3=iso639_3)
-                except Language.DoesNotExist:
+                    language_id = language_ids[iso639_3]
+                except KeyError:
                     continue
 
                 cols = row.children('td')
@@ -1260,31 +1471,11 @@ class Command(BaseCommand):
                                 if ',' in alt_name:
                                     alt_name = ' '.join(reversed(regex.split(r',\s+', alt_name))).strip()
 
-                                try:
-                                    log('Alternative name (by slug):')
-                                    plog({
-                                        'slug': slugify('{}_({})'.format(alt_name, lang.iso639_3)),
-                                        'language': l,
-                                        'name': alt_name,
-                                        'type': AlternativeName.TYPE.name,
-                                        'in_language': lang,
-                                    })
-                                    an = AlternativeName.objects.get(
-                                        type=AlternativeName.TYPE.name,
-                                        slug=slugify('{}_({})'.format(alt_name, lang.iso639_3)))
-                                except AlternativeName.DoesNotExist:
-                                    log('Alternative name:')
-                                    plog({
-                                        'language': l,
-                                        'name': alt_name,
-                                        'type': AlternativeName.TYPE.name,
-                                        'in_language': lang,
-                                    })
-                                    an, _ = AlternativeName.objects.get_or_create(
-                                        language=l,
-                                        name=alt_name,
-                                        type=AlternativeName.TYPE.name,
-                                        in_language=lang)
+                                names.append(AlternativeName(
+                                    language_id=language_id,
+                                    name=alt_name,
+                                    type=AlternativeName.TYPE.name,
+                                    in_language=lang))
 
                     except IndexError as e:
                         log('header cols:')
@@ -1293,9 +1484,18 @@ class Command(BaseCommand):
                         plog([pq(col).text() for col in cols])
                         raise e
 
+            AlternativeName.objects.upsert_many(names)
+
     def import_glottolog(self):
+        cv_number_index = cv_num_rgx.groupindex['number'] - 1
+        cv_modifier_index = cv_num_rgx.groupindex['modifier'] - 1
+        cv_type_index = cv_num_rgx.groupindex['type'] - 1
+        cvs_index = syllable_pattern_rgx.groupindex['cvs'] - 1
+
         self.build_iso_index()
 
+        countries = CountryResolver.build()
+
         ldata = self.get_data('glottolog')
 
         try:
@@ -1330,6 +1530,9 @@ class Command(BaseCommand):
 
         lexical_similarities = {}
         note_lcodes = {}
+        # (characteristic id, language id) pairs, linked once every language
+        # has been imported
+        characteristic_links = set()
 
         for lk, ld in tqdm(ldata, total=sum(1 for _ in self.get_data('glottolog')),
                            desc="Importing languages from Glottolog..."):
@@ -2025,20 +2228,12 @@ class Command(BaseCommand):
             log('country code: {}'.format(home_country_code))
             log('country name: {}'.format(home_country_name))
             if home_country_code:
-                home_country = Country.objects.get(code=home_country_code)
+                home_country = countries.by_code(home_country_code)
             else:
-                if home_country_name == 'Congo (Kinshasa)':
-                    home_country_name = 'Democratic Republic of the Congo'
-
-                try:
-                    home_country = Country.objects.get(name=home_country_name)
-                except Country.DoesNotExist:
-                    try:
-                        home_country = Country.objects.get(name=home_country_name.replace(' ', '').capitalize())
-                    except Country.DoesNotExist:
-                        home_country = Country.objects.get(
-                            alt_names__kind=AlternativeCountryName.TYPE.name,
-                            alt_names__name=home_country_name)
+                home_country = countries.resolve(home_country_name)
+            if home_country is None:
+                raise Country.DoesNotExist("Cannot find the country '{}' ({})".format(
+                    home_country_name, home_country_code))
 
             ui = create_used_in(
                 home_country,
@@ -2054,7 +2249,9 @@ class Command(BaseCommand):
                 if ccname in asi_data.keys():
                     cdata = asi_data[ccname]
 
-                    country = Country.objects.get(code=ccode)
+                    country = countries.by_code(ccode)
+                    if country is None:
+                        raise Country.DoesNotExist("Cannot find the country '{}'".format(ccode))
 
                     if 'Language name' in cdata:
                         name = cdata['Language name']
@@ -2129,7 +2326,9 @@ class Command(BaseCommand):
                     # Uniquify
                     for sp in list(set(clist[cvs_index] for clist in syllable_pattern_rgx.findall(char))):
                         try:
-                            syllable_pattern = l.characteristics.instance_of(SyllablePattern).get(syllablepattern__pattern=sp)
+                            syllable_pattern = (
+                                find_linked_characteristic(chars, SyllablePattern, pattern=sp) or
+                                l.characteristics.instance_of(SyllablePattern).get(syllablepattern__pattern=sp))
 
                         except Characteristic.DoesNotExist:
                             syllable_pattern, _ = SyllablePattern.objects.get_or_create(
@@ -2144,8 +2343,7 @@ class Command(BaseCommand):
                                     'notes': char,
                                 })
 
-                        if syllable_pattern not in l.characteristics.instance_of(SyllablePattern):
-                            l.characteristics.add(syllable_pattern)
+                        characteristic_links.add((syllable_pattern.pk, l.pk))
 
                         chars.append(syllable_pattern)
                         char = re.sub(r'\b{}(?:,\s+|\s+|$)'.format(sp.replace(' ', r'\s+').replace('(', r'\(').replace(')', r'\)')), '', char)
@@ -2154,7 +2352,9 @@ class Command(BaseCommand):
                 if svo_rgx.match(char):
                     for c in svo_rgx.findall(char):
                         try:
-                            svo = l.characteristics.instance_of(SubjectVerbObjectOrder).get(subjectverbobjectorder__order=c)
+                            svo = (
+                                find_linked_characteristic(chars, SubjectVerbObjectOrder, order=c) or
+                                l.characteristics.instance_of(SubjectVerbObjectOrder).get(subjectverbobjectorder__order=c))
 
                         except Characteristic.DoesNotExist:
                             svo, _ = SubjectVerbObjectOrder.objects.get_or_create(order=c, notes=char)
@@ -2167,8 +2367,7 @@ class Command(BaseCommand):
                                     'notes': char,
                                 })
 
-                        if svo not in l.characteristics.instance_of(SubjectVerbObjectOrder):
-                            l.characteristics.add(svo)
+                        characteristic_links.add((svo.pk, l.pk))
 
                         chars.append(svo)
                         char = re.sub(r'\b{}\b(?:,\s+|\s+|:\s+|\)$|\s*$)'.format(c), '', char)
@@ -2321,7 +2520,12 @@ class Command(BaseCommand):
                         if 'related_word' in d:
                             for word in d['words']:
                                 try:
-                                    wo = l.characteristics.instance_of(RelativeWordTypeOrder).get(
+                                    wo = find_linked_characteristic(
+                                        chars, RelativeWordTypeOrder,
+                                        word_type=word,
+                                        modifier=d['modifier'],
+                                        position=d['positioner'],
+                                        related_word_type=d['related_word']) or l.characteristics.instance_of(RelativeWordTypeOrder).get(
                                         relativewordtypeorder__word_type=c,
                                         relativewordtypeorder__modifier=d['modifier'],
                                         relativewordtypeorder__position=d['positioner'],
@@ -2355,15 +2559,18 @@ class Command(BaseCommand):
                                                 'notes': c,
                                             })
 
-                                if wo not in l.characteristics.instance_of(RelativeWordTypeOrder):
-                                    l.characteristics.add(wo)
+                                characteristic_links.add((wo.pk, l.pk))
 
                                 chars.append(wo)
 
                         else:
                             for word in d['words']:
                                 try:
-                                    wo = l.characteristics.instance_of(AbsoluteWordTypeOrder).get(
+                                    wo = find_linked_characteristic(
+                                        chars, AbsoluteWordTypeOrder,
+                                        word_type=word,
+                                        modifier=d['modifier'],
+                                        position=d['positioner']) or l.characteristics.instance_of(AbsoluteWordTypeOrder).get(
                                         absolutewordtypeorder__word_type=word,
                                         absolutewordtypeorder__modifier=d['modifier'],
                                         absolutewordtypeorder__position=d['positioner'])
@@ -2393,8 +2600,7 @@ class Command(BaseCommand):
                                                 'notes': c,
                                             })
 
-                                if wo not in l.characteristics.instance_of(AbsoluteWordTypeOrder):
-                                    l.characteristics.add(wo)
+                                characteristic_links.add((wo.pk, l.pk))
 
                                 chars.append(wo)
 
@@ -2419,7 +2625,11 @@ class Command(BaseCommand):
 
                         if m[cv_modifier_index]:
                             try:
-                                ssc = l.characteristics.instance_of(SpeechSoundCount).get(
+                                ssc = find_linked_characteristic(
+                                    chars, SpeechSoundCount,
+                                    number=1 if m[cv_number_index] == 'one' else int(m[cv_number_index]),
+                                    modifier=m[cv_modifier_index].lower(),
+                                    type=t) or l.characteristics.instance_of(SpeechSoundCount).get(
                                     # TODO: Need a better way to convert numbers words to numbers
                                     speechsoundcount__number=1 if m[cv_number_index] == 'one' else int(m[cv_number_index]),
                                     speechsoundcount__modifier=m[cv_modifier_index].lower(),
@@ -2444,7 +2654,10 @@ class Command(BaseCommand):
                                     })
                         else:
                             try:
-                                ssc = l.characteristics.instance_of(SpeechSoundCount).get(
+                                ssc = find_linked_characteristic(
+                                    chars, SpeechSoundCount,
+                                    number=1 if m[cv_number_index] == 'one' else int(m[cv_number_index]),
+                                    type=t) or l.characteristics.instance_of(SpeechSoundCount).get(
                                     # TODO: Need a better way to convert numbers words to numbers
                                     speechsoundcount__number=1 if m[cv_number_index] == 'one' else int(m[cv_number_index]),
                                     speechsoundcount__type=t)
@@ -2465,8 +2678,7 @@ class Command(BaseCommand):
                                         'notes': char,
                                     })
 
-                        if ssc not in l.characteristics.instance_of(SpeechSoundCount).all():
-                            l.characteristics.add(ssc)
+                        characteristic_links.add((ssc.pk, l.pk))
 
                         chars.append(ssc)
 
@@ -2478,7 +2690,8 @@ class Command(BaseCommand):
                         log('remaining char: {}'.format(char))
                         try:
                             log('char_obj: {}'.format(l.characteristics.not_instance_of(AbsoluteWordTypeOrder, RelativeWordTypeOrder, SpeechSoundCount, SubjectVerbObjectOrder, SyllablePattern).exclude(id__in=[ch.id for ch in chars]).filter(notes=char)))
-                            char_obj = l.characteristics.not_instance_of(AbsoluteWordTypeOrder, RelativeWordTypeOrder, SpeechSoundCount, SubjectVerbObjectOrder, SyllablePattern).exclude(id__in=[ch.id for ch in chars]).get(notes=char)
+                            char_obj = find_linked_characteristic(chars, Characteristic, notes=char) or \
+                                l.characteristics.not_instance_of(AbsoluteWordTypeOrder, RelativeWordTypeOrder, SpeechSoundCount, SubjectVerbObjectOrder, SyllablePattern).exclude(id__in=[ch.id for ch in chars]).get(notes=char)
 
                         except Characteristic.DoesNotExist:
                             log('language id: {}'.format(l.id))
@@ -2541,8 +2754,7 @@ class Command(BaseCommand):
 
                             raise e
 
-                        if char_obj not in l.characteristics.instance_of(Characteristic).exclude(id__in=[ch.id for ch in chars]):
-                            l.characteristics.add(char_obj)
+                        characteristic_links.add((char_obj.pk, l.pk))
 
                         chars.append(char_obj)
 
@@ -2864,8 +3076,26 @@ class Command(BaseCommand):
 
                 ls.save()
 
-        for note, lcodes in note_lcodes.items():
-            note.other_languages.add(*list(Language.objects.filter(iso639_3__in=[_.strip() for _ in lcodes])))
+        self.logger.info("Linking characteristics")
+        load_rows(Characteristic.languages.through, ['characteristic_id', 'language_id'],
+                  characteristic_links, conflict_fields=['characteristic_id', 'language_id'])
+
+        # The codes were matched with their brackets, eg: '[eng]'
+        note_lcodes = {note: set(code.strip('[] ') for code in lcodes) for note, lcodes in note_lcodes.items()}
+        language_ids = dict(Language.objects.filter(
+            iso639_3__in=set().union(*note_lcodes.values())).values_list('iso639_3', 'pk'))
+        load_rows(DevelopmentNote.other_languages.through, ['developmentnote_id', 'language_id'],
+                  [(note.pk, language_ids[code])
+                   for note, codes in note_lcodes.items()
+                   for code in codes if code in language_ids],
+                  conflict_fields=['developmentnote_id', 'language_id'])
+
+        self.logger.info("Rebuilding flattened characteristics")
+        FlatCharacteristic.objects.rebuild()
+
+        # Only cached once the import commits (see announce_import_run())
+        self.logger.info("Building typology index")
+        self.typology_index = TypologyIndex.build()
 
     def build_iso_index(self):
         self.logger.info("Building ISO language code index")
@@ -2899,64 +3129,106 @@ class Command(BaseCommand):
 
         data = self.get_data('language')
 
+        # Skip the header row
+        data = (item for item in data if item['iso639-3'] != "ISO 639-3")
+
         self.logger.info("Importing language data")
-        for item in tqdm(data, total=len(self.iso_index),
-                         desc="Importing additional languages..."):
-            if item['iso639-3'] == "ISO 639-3":
-                continue
+        progress = tqdm(total=len(self.iso_index), desc="Importing additional languages...")
+        for chunk in chunked(data, settings.batch_size):
+            progress.update(len(chunk))
 
-            self.logger.info(item)
-            if not self.call_hook('language_pre', item):
+            items = self.call_batch_hook('language_pre_batch', chunk)
+            if items is None:
                 continue
 
-            name, *alt_names = item['name'].strip().split('; ')
+            languages = []
+            kept_items = []
+            pending = {}
+            for item in items:
+                l = self.find_additional_language(item, pending)
+                if l is not None:
+                    remember_language(pending, l)
+                    languages.append(l)
+                    kept_items.append(item)
+
+            result = self.call_batch_hook('language_post_batch', languages, kept_items)
+            if result is None:
+                continue
 
-            try:
-                if item['iso639-3']:
-                    l = Language.objects.get(iso639_3=item['iso639-3'].strip())
-                else:
-                    l = Language.objects.exclude(iso639_1=None).get(
-                        Q(iso639_1=item['iso639-1'].strip()) |
-                        Q(name=name.strip()))
+            for l, item in zip(*result):
+                l.save()
 
-                if not l.iso639_1 and l.iso639_3 == item['iso639-3']:
-                    l.iso639_1 = item['iso639-1'] if item['iso639-1'] else None
+                name, *alt_names = item['name'].strip().split('; ')
+                for alt_name in alt_names:
+                    aln = AlternativeName.objects.get_or_create(
+                        language=l,
+                        name=alt_name,
+                        type=AlternativeName.TYPE.name,
+                        in_language=en)
+        progress.close()
+
+    def find_additional_language(self, item, pending=None):
+        """
+        The (unsaved) language for a row of the ISO language codes file, or
+        None if a hook skipped it
+
+        ``pending`` holds the languages of the earlier rows of the chunk (see
+        ``remember_language()``), which aren't saved yet.
+        """
+        self.logger.info(item)
+        if not self.call_hook('language_pre', item):
+            return None
+
+        name = item['name'].strip().split('; ')[0]
+
+        l = None
+        if pending:
+            if item['iso639-3']:
+                l = pending.get(('iso639_3', item['iso639-3'].strip()))
+            else:
+                l = pending.get(('iso639_1', item['iso639-1'].strip())) or pending.get(('name', name.strip()))
+                if l is not None and not l.iso639_1:
+                    l = None
 
-                if not l.iso639_3 and l.iso639_1 == item['iso639-1']:
-                    l.iso639_3 = item['iso639-3'] if item['iso639-3'] else None
+        try:
+            if l is None and item['iso639-3']:
+                l = Language.objects.get(iso639_3=item['iso639-3'].strip())
+            elif l is None:
+                l = Language.objects.exclude(iso639_1=None).get(
+                    Q(iso639_1=item['iso639-1'].strip()) |
+                    Q(name=name.strip()))
 
-            except Language.DoesNotExist:
-                l = Language()
-                l.name = name
+            if not l.iso639_1 and l.iso639_3 == item['iso639-3']:
                 l.iso639_1 = item['iso639-1'] if item['iso639-1'] else None
-                l.iso639_2t = item['iso639-2'] if item['iso639-2'] else None
-                l.iso639_3 = item['iso639-3'] if item['iso639-3'] else None
-            except Language.MultipleObjectsReturned as e:
-                log('item:')
-                plog(item)
-                log('name:')
-                plog(name)
-                log('criteria:\n  (iso639-1: {} | name: {})\n  & iso639-3: {}'.format(
-                    item['iso639-1'].strip(),
-                    name.strip(),
-                    item['iso639-3'].strip()))
-                log('options:')
-                plog([model_to_dict(l) for l in Language.objects.filter(
-                    Q(iso639_1=item['iso639-1'].strip()) |
-                    Q(Q(name=name.strip()) &
-                      Q(iso639_3=item['iso639-3'].strip())))])
-                raise e
 
-            if not self.call_hook('language_post', l, item):
-                continue
-            l.save()
+            if not l.iso639_3 and l.iso639_1 == item['iso639-1']:
+                l.iso639_3 = item['iso639-3'] if item['iso639-3'] else None
 
-            for alt_name in alt_names:
-                aln = AlternativeName.objects.get_or_create(
-                    language=l,
-                    name=alt_name,
-                    type=AlternativeName.TYPE.name,
-                    in_language=en)
+        except Language.DoesNotExist:
+            l = Language()
+            l.name = name
+            l.iso639_1 = item['iso639-1'] if item['iso639-1'] else None
+            l.iso639_2t = item['iso639-2'] if item['iso639-2'] else None
+            l.iso639_3 = item['iso639-3'] if item['iso639-3'] else None
+        except Language.MultipleObjectsReturned as e:
+            log('item:')
+            plog(item)
+            log('name:')
+            plog(name)
+            log('criteria:\n  (iso639-1: {} | name: {})\n  & iso639-3: {}'.format(
+                item['iso639-1'].strip(),
+                name.strip(),
+                item['iso639-3'].strip()))
+            log('options:')
+            plog([model_to_dict(l) for l in Language.objects.filter(
+                Q(iso639_1=item['iso639-1'].strip()) |
+                Q(Q(name=name.strip()) &
+                  Q(iso639_3=item['iso639-3'].strip())))])
+            raise e
+
+        if not self.call_hook('language_post', l, item):
+            return None
+        return l
 
     def create_undetermined_and_english_languages(self):
         und_ma, _ = Macroarea.objects.get_or_create(name='Undetermined')
@@ -3027,25 +3299,38 @@ class Command(BaseCommand):
         return en, und
 
     def import_language(self):
-        self.create_undetermined_and_english_languages()
-
-        self.import_glottolog()
-
-        self.import_iso_language_families_from_wikipedia()
+        self.run_stages(list(IMPORT_STAGES))
 
-        self.import_iso639_2_language_types_and_scopes_from_wikipedia()
+    def run_stages(self, names):
+        """
+        Run the import stages ``names`` (see ``IMPORT_STAGES``) one at a
+        time, downloading the files of later stages on worker threads while
+        earlier stages parse theirs and write to the database
+        """
+        stages = order_stages(IMPORT_STAGES, names)
 
-        self.import_languages_from_wikipedia()
+        def download(url):
+            return urlopen_with_progress(url, progress=False)
 
-        self.import_alternative_language_names()
-
-        self.import_additional_languages()
+        self.prefetcher = Prefetcher(download, settings.download_workers)
+        try:
+            for name in stages:
+                self.prefetcher.prefetch(IMPORT_STAGES[name].urls())
+
+            for name in stages:
+                self.logger.info("Running import stage %s", name)
+                started = time.time()
+                getattr(self, IMPORT_STAGES[name].method)()
+                self.logger.info("Import stage %s took %.1fs", name, time.time() - started)
+        except BaseException:
+            # The failed import won't read the downloads still in progress
+            self.prefetcher.close(wait=False)
+            raise
+        else:
+            self.prefetcher.close()
+        finally:
+            self.prefetcher = None
 
-    def flush(self):
-        self.logger.info("Flushing language data")
-        for cls in inspect.getmembers(sys.modules['languages.models'],
-                                      lambda c: (inspect.isclass(c)
-                                                 and issubclass(c, models.Model)
-                                                 and c.__modules__ == 'languages.models'
-                                                 and not c._meta.abstract)):
-            cls.objects.all().delete()
+    def flush(self, data_type):
+        self.logger.info("Flushing %s data", data_type)
+        flush_tables(flush_models(data_type))
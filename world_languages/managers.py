@@ -1,12 +1,335 @@
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
 from django.db import models
-from django.utils.timezone import now
+from django.db.models import F, Prefetch, Q
+from django.utils.timezone import localtime, now
 
+from .loaders import load_rows
+from .version import data_version
 
-class AlternativeNameManager(models.Manager):
+
+# FlatCharacteristic.kind -> (Characteristic subclass, {flat field: subclass field})
+FLAT_CHARACTERISTIC_SOURCES = {
+    'absolute_word_type_order': ('AbsoluteWordTypeOrder', {
+        'word_type': 'word_type',
+        'modifier': 'modifier',
+        'position': 'position',
+    }),
+    'relative_word_type_order': ('RelativeWordTypeOrder', {
+        'word_type': 'word_type',
+        'related_word_type': 'related_word_type',
+        'modifier': 'modifier',
+        'position': 'position',
+    }),
+    'speech_sound_count': ('SpeechSoundCount', {
+        'number': 'number',
+        'modifier': 'modifier',
+        'sound_type': 'type',
+    }),
+    'subject_verb_object_order': ('SubjectVerbObjectOrder', {
+        'order': 'order',
+    }),
+    'syllable_pattern': ('SyllablePattern', {
+        'pattern': 'pattern',
+    }),
+}
+
+DEVELOPMENT_NOTE_SUBCLASSES = [
+    'developmentnotetag',
+    'developmentnotebible',
+    'developmentnoteliteracy',
+    'developmentnoteliteracytag',
+    'developmentnoteliteracypercent',
+]
+
+
+class NormalizingQuerySet(models.QuerySet):
+    """
+    QuerySet whose bulk writes normalize their objects (strip names, compute
+    slugs) the same way the model's save() does
+
+    Models using it define ``normalize()``. Only ``bulk_create()`` is
+    covered, so objects changed with ``update()`` aren't normalized.
+    """
+    def normalize(self, objs):
+        for obj in objs:
+            obj.normalize()
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        self.normalize(objs)
+        return super().bulk_create(objs, *args, **kwargs)
+
+
+class AlternativeNameQuerySet(NormalizingQuerySet):
+    def normalize(self, objs):
+        """
+        Normalize a whole batch, looking up the ISO 639-3 codes of every
+        in_language with a single query instead of one per object
+        """
+        Language = apps.get_model('world_languages', 'Language')
+
+        language_ids = set(obj.in_language_id for obj in objs if obj.in_language_id)
+        codes = dict(Language.objects.filter(pk__in=language_ids).values_list('pk', 'iso639_3'))
+
+        for obj in objs:
+            obj.name = obj.name.strip()
+            if obj.in_language_id:
+                obj.in_language_code = codes[obj.in_language_id]
+            else:
+                obj.in_language_code = 'und'
+            obj.slugify()
+
+    def refresh_language_codes(self):
+        """
+        Copy the ISO 639-3 codes of the in_languages whose code changed since
+        their names were saved, and recompute the slugs of those names
+        """
+        stale = self.filter(in_language__isnull=False).exclude(
+            in_language_code=F('in_language__iso639_3')).select_related('in_language')
+        for obj in stale:
+            obj.normalize()
+            self.model.all_objects.using(self.db).filter(pk=obj.pk).update(
+                in_language_code=obj.in_language_code, slug=obj.slug)
+
+    def upsert_many(self, objs, update_fields=(), batch_size=500):
+        """
+        Insert the (unsaved) alternative names ``objs``, or update the
+        existing ones with the same slug, ie: the same name in the same
+        language
+
+        Only ``update_fields`` of existing names are updated. New names are
+        written with a constant number of statements per batch, whatever its
+        size (see ``load_rows()``). Returns the saved names, in the same order as
+        ``objs``.
+        """
+        objs = [obj if isinstance(obj, self.model) else self.model(**obj) for obj in objs]
+        fields = [f.attname for f in self.model._meta.concrete_fields if not f.primary_key]
+
+        saved = {}
+        for start in range(0, len(objs), batch_size):
+            batch = objs[start:start + batch_size]
+            self.normalize(batch)
+
+            # The first of the names with the same slug wins
+            unique = {}
+            for obj in batch:
+                unique.setdefault(obj.slug, obj)
+
+            load_rows(self.model, fields,
+                      [[getattr(obj, f) for f in fields] for obj in unique.values()],
+                      conflict_fields=['slug'], update_fields=update_fields,
+                      using=self.db, batch_size=batch_size)
+
+            saved.update((obj.slug, obj) for obj in self.model.all_objects.using(self.db).filter(
+                slug__in=list(unique)))
+
+        return [saved[obj.slug] for obj in objs]
+
+
+class AlternativeNameManager(models.Manager.from_queryset(AlternativeNameQuerySet)):
     def get_queryset(self):
-        return super().get_queryset().exclude(type='link')
+        # Templates and the admin render in_language and language, so avoid
+        # queries per row
+        return super().get_queryset().exclude(type='link').select_related('in_language', 'language')
+
+
+IN_USE_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def today():
+    """
+    The current date, in the current time zone when time zones are enabled
+    """
+    if settings.USE_TZ:
+        return localtime(now()).date()
+    return now().date()
+
+
+class DialectManager(models.Manager):
+    def aliases_of(self, dialect):
+        """
+        The other dialects in the group of ``dialect``
+        """
+        if dialect.group_id is None:
+            return self.none()
+        return self.filter(group_id=dialect.group_id).exclude(pk=dialect.pk)
+
+    def link_aliases(self, dialects):
+        """
+        Put ``dialects`` (and every alias they already have) into a single
+        group, merging their existing groups into the oldest one
+        """
+        DialectGroup = apps.get_model('world_languages', 'DialectGroup')
+
+        group_ids = sorted(set(d.group_id for d in dialects if d.group_id is not None))
+        if group_ids:
+            group_id = group_ids[0]
+        else:
+            group_id = DialectGroup.objects.create().pk
+
+        self.filter(Q(pk__in=[d.pk for d in dialects]) | Q(group_id__in=group_ids[1:])).exclude(
+            group_id=group_id).update(group_id=group_id)
+        if group_ids[1:]:
+            DialectGroup.objects.filter(pk__in=group_ids[1:]).delete()
+
+        for d in dialects:
+            d.group_id = group_id
+        return group_id
 
 
 class InUseManager(models.Manager):
-    def in_use(self):
-        return super().get_queryset().filter(start__lt=now(), end__gt=now()).exclude(in_use=False)
+    def in_use(self, day=None):
+        # start and end are dates, so this only changes once a day
+        if day is None:
+            day = today()
+        return super().get_queryset().filter(start__lt=day, end__gt=day).exclude(in_use=False)
+
+    def in_use_cached(self, day=None):
+        """
+        The in_use() rows (with their scripts) as a list, cached for the day
+        or until the next import
+        """
+        if day is None:
+            day = today()
+        key = 'world_languages:in_use:{}:{}:{}'.format(
+            self.model._meta.label_lower, day.isoformat(), data_version())
+
+        objs = cache.get(key)
+        if objs is None:
+            objs = list(self.in_use(day).select_related('script'))
+            cache.set(key, objs, IN_USE_CACHE_TIMEOUT)
+        return objs
+
+
+class FlatCharacteristicManager(models.Manager):
+    def rebuild(self, languages=None, batch_size=1000):
+        """
+        Recreate the flattened rows for ``languages`` (or every language) from
+        Characteristic and its subclass tables, without going through the
+        polymorphic querysets
+        """
+        Characteristic = apps.get_model('world_languages', 'Characteristic')
+        through = Characteristic.languages.through
+
+        links = through.objects.all()
+        flats = self.get_queryset()
+        characteristics = Characteristic.objects.non_polymorphic()
+        if languages is not None:
+            links = links.filter(language__in=languages)
+            flats = flats.filter(language__in=languages)
+            # Only the characteristics of those languages
+            characteristics = characteristics.filter(pk__in=links.values('characteristic_id'))
+
+        details = {
+            pk: {'kind': self.model.KIND.characteristic, 'notes': notes}
+            for pk, notes in characteristics.values_list('pk', 'notes')}
+
+        for kind, (model_name, fields) in FLAT_CHARACTERISTIC_SOURCES.items():
+            model = apps.get_model('world_languages', model_name)
+            rows = model.objects.non_polymorphic()
+            if languages is not None:
+                rows = rows.filter(pk__in=links.values('characteristic_id'))
+            for row in rows.values_list('pk', *fields.values()):
+                details[row[0]]['kind'] = kind
+                details[row[0]].update(zip(fields.keys(), row[1:]))
+
+        flats.delete()
+        return self.bulk_create([
+            self.model(language_id=language_id, characteristic_id=characteristic_id,
+                       **details[characteristic_id])
+            for characteristic_id, language_id in links.values_list('characteristic_id', 'language_id')
+        ], batch_size=batch_size)
+
+
+class LanguageQuerySet(NormalizingQuerySet):
+    def with_typology(self, *filters):
+        """
+        Languages that have a flattened characteristic matching each of the
+        ``filters`` (dicts of FlatCharacteristic lookups), eg: all SOV
+        languages with postpositions:
+
+            Language.objects.with_typology(
+                {'kind': 'subject_verb_object_order', 'order': 'SOV'},
+                {'word_type': 'postposition'})
+        """
+        FlatCharacteristic = apps.get_model('world_languages', 'FlatCharacteristic')
+
+        qs = self
+        for lookups in filters:
+            qs = qs.filter(id__in=FlatCharacteristic.objects.filter(**lookups).values('language'))
+        return qs
+
+    def with_full_detail(self):
+        """
+        Everything a language detail page renders, in a constant number of
+        queries regardless of how many related rows there are
+        """
+        AlternativeName = apps.get_model('world_languages', 'AlternativeName')
+        Characteristic = apps.get_model('world_languages', 'Characteristic')
+        DevelopmentNote = apps.get_model('world_languages', 'DevelopmentNote')
+        UsedIn = apps.get_model('world_languages', 'UsedIn')
+
+        names = AlternativeName.objects.select_related('in_language')
+
+        return self.select_related('family', 'macroarea').prefetch_related(
+            Prefetch('alternative_names', queryset=names),
+            Prefetch('usedin_set', queryset=UsedIn.objects.select_related('country').prefetch_related(
+                Prefetch('known_as', queryset=names),
+                'scripts__script',
+                'dialects')),
+            # Multi-table inheritance, so the subclass rows can be joined in
+            Prefetch('development_notes', queryset=DevelopmentNote.objects.select_related(*DEVELOPMENT_NOTE_SUBCLASSES)),
+            # Polymorphic, so this is one query plus one per subclass present
+            Prefetch('characteristics', queryset=Characteristic.objects.all()))
+
+
+FamilyManager = models.Manager.from_queryset(NormalizingQuerySet)
+LanguageManager = models.Manager.from_queryset(LanguageQuerySet)
+
+
+def _by_population(row):
+    # Largest populations first, unknown populations last
+    return (row[1] is None, -(row[1] or 0))
+
+
+class UsedInQuerySet(models.QuerySet):
+    def with_scripts_in_use(self, day=None):
+        """
+        Prefetch the in-use scripts of every UsedIn into ``scripts_in_use``,
+        with one query for all of them
+        """
+        ScriptUsage = apps.get_model('world_languages', 'ScriptUsage')
+
+        return self.prefetch_related(Prefetch(
+            'scripts',
+            queryset=ScriptUsage.objects.in_use(day).select_related('script'),
+            to_attr='scripts_in_use'))
+
+
+class UsedInManager(models.Manager.from_queryset(UsedInQuerySet)):
+    def refresh_country_codes(self):
+        """
+        Copy the codes of the countries whose code changed since their rows
+        were saved, with one UPDATE per changed country
+        """
+        stale = self.get_queryset().exclude(country_code=F('country__code'))
+        for country_id, code in stale.values_list('country_id', 'country__code').distinct():
+            self.get_queryset().filter(country_id=country_id).update(country_code=code)
+
+    def languages_in(self, country_code):
+        """
+        ``(language_id, population, development_status)`` tuples for the
+        languages used in the country, largest population first
+        """
+        return sorted(self.get_queryset().filter(country_code=country_code.upper()).values_list(
+            'language_id', 'population', 'development_status'), key=_by_population)
+
+    def countries_of(self, language):
+        """
+        ``(country_code, population, development_status)`` tuples for the
+        countries the language is used in, largest population first
+        """
+        return sorted(self.get_queryset().filter(language=language).values_list(
+            'country_code', 'population', 'development_status'), key=_by_population)
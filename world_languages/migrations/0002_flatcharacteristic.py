@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('world_languages', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FlatCharacteristic',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('characteristic', 'Characteristic'), ('absolute_word_type_order', 'Absolute word type order'), ('relative_word_type_order', 'Relative word type order'), ('speech_sound_count', 'Speech sound count'), ('subject_verb_object_order', 'Subject-verb-object order'), ('syllable_pattern', 'Syllable pattern')], max_length=25)),
+                ('notes', models.CharField(max_length=1023)),
+                ('word_type', models.CharField(blank=True, default=None, max_length=16, null=True)),
+                ('related_word_type', models.CharField(blank=True, default=None, max_length=16, null=True)),
+                ('position', models.CharField(blank=True, default=None, max_length=18, null=True)),
+                ('modifier', models.CharField(blank=True, default=None, max_length=9, null=True)),
+                ('number', models.IntegerField(blank=True, default=None, null=True)),
+                ('sound_type', models.CharField(blank=True, default=None, max_length=17, null=True)),
+                ('order', models.CharField(blank=True, default=None, max_length=3, null=True)),
+                ('pattern', models.CharField(blank=True, default=None, max_length=31, null=True)),
+                ('characteristic', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='world_languages.Characteristic')),
+                ('language', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='flat_characteristics', to='world_languages.Language')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='flatcharacteristic',
+            unique_together=set([('language', 'characteristic')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='flatcharacteristic',
+            index_together=set([('kind', 'order'), ('kind', 'word_type', 'position'), ('kind', 'sound_type', 'number'), ('kind', 'pattern')]),
+        ),
+    ]
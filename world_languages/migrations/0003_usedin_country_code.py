@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+def set_country_codes(apps, schema_editor):
+    Country = apps.get_model('cities', 'Country')
+    UsedIn = apps.get_model('world_languages', 'UsedIn')
+
+    for country_id, code in Country.objects.filter(
+            id__in=UsedIn.objects.values('country')).values_list('id', 'code'):
+        UsedIn.objects.filter(country_id=country_id).update(country_code=code)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('world_languages', '0002_flatcharacteristic'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usedin',
+            name='country_code',
+            field=models.CharField(default='', editable=False, max_length=2),
+            preserve_default=False,
+        ),
+        migrations.RunPython(set_country_codes, migrations.RunPython.noop),
+        migrations.AlterIndexTogether(
+            name='usedin',
+            index_together=set([('country_code', 'population')]),
+        ),
+    ]
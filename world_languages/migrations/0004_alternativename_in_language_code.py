@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+def set_in_language_codes(apps, schema_editor):
+    AlternativeName = apps.get_model('world_languages', 'AlternativeName')
+    Language = apps.get_model('world_languages', 'Language')
+
+    for language_id, code in Language.objects.filter(
+            id__in=AlternativeName.objects.values('in_language')).values_list('id', 'iso639_3'):
+        AlternativeName.objects.filter(in_language_id=language_id).update(in_language_code=code)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('world_languages', '0003_usedin_country_code'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alternativename',
+            name='in_language_code',
+            field=models.CharField(blank=True, default='und', editable=False, max_length=3, null=True),
+        ),
+        migrations.RunPython(set_in_language_codes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import django.core.validators
+from django.db import migrations, models
+import re
+
+
+# The admin searches with iexact and istartswith, which compare UPPER(column),
+# so on PostgreSQL they need expression indexes to avoid sequential scans
+UPPER_INDEXES = [
+    ('world_languages_language_name_upper', 'world_languages_language', 'name'),
+    ('world_languages_language_iso639_3_upper', 'world_languages_language', 'iso639_3'),
+    ('world_languages_alternativename_name_upper', 'world_languages_alternativename', 'name'),
+]
+
+
+def create_upper_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    for index, table, column in UPPER_INDEXES:
+        schema_editor.execute(
+            'CREATE INDEX {} ON {} (UPPER({}) varchar_pattern_ops)'.format(index, table, column))
+
+
+def drop_upper_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    for index, table, column in UPPER_INDEXES:
+        schema_editor.execute('DROP INDEX IF EXISTS {}'.format(index))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('world_languages', '0004_alternativename_in_language_code'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='alternativename',
+            name='name',
+            field=models.CharField(db_index=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='language',
+            name='iso639_1',
+            field=models.CharField(blank=True, db_index=True, max_length=2, null=True, validators=[django.core.validators.RegexValidator(re.compile('^[a-z]{2}$', 32), 'ISO 639-1 IDs must be unique and two lowercase letters')]),
+        ),
+        migrations.AlterField(
+            model_name='language',
+            name='iso639_3',
+            field=models.CharField(blank=True, db_index=True, max_length=3, null=True, validators=[django.core.validators.RegexValidator(re.compile('^[a-z]{3}$', 32), 'ISO 639-3 IDs must be unique')]),
+        ),
+        migrations.AlterField(
+            model_name='language',
+            name='name',
+            field=models.CharField(db_index=True, max_length=255),
+        ),
+        migrations.RunPython(create_upper_indexes, drop_upper_indexes),
+    ]
@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('world_languages', '0005_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='scriptusage',
+            index_together=set([('in_use', 'start', 'end')]),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('world_languages', '0006_scriptusage_in_use_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportRun',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.CharField(max_length=32, unique=True)),
+                ('imports', models.CharField(blank=True, default='', max_length=255)),
+                ('flushes', models.CharField(blank=True, default='', max_length=255)),
+                ('sources', models.TextField(default='{}')),
+                ('row_counts', models.TextField(default='{}')),
+                ('started', models.DateTimeField()),
+                ('finished', models.DateTimeField()),
+            ],
+            options={
+                'get_latest_by': 'finished',
+            },
+        ),
+    ]
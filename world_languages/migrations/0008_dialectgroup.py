@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def find(parents, dialect_id):
+    root = dialect_id
+    while parents[root] != root:
+        root = parents[root]
+    # Path compression
+    while parents[dialect_id] != root:
+        parents[dialect_id], dialect_id = root, parents[dialect_id]
+    return root
+
+
+def alias_groups(edges):
+    """
+    The connected components of the ``(from_id, to_id)`` alias edges, with
+    union-find
+    """
+    parents = {}
+    for from_id, to_id in edges:
+        parents.setdefault(from_id, from_id)
+        parents.setdefault(to_id, to_id)
+        from_root, to_root = find(parents, from_id), find(parents, to_id)
+        if from_root != to_root:
+            parents[max(from_root, to_root)] = min(from_root, to_root)
+
+    components = {}
+    for dialect_id in parents:
+        components.setdefault(find(parents, dialect_id), []).append(dialect_id)
+    return list(components.values())
+
+
+def group_aliases(apps, schema_editor):
+    """
+    Turn the also_known_as edges into groups
+    """
+    Dialect = apps.get_model('world_languages', 'Dialect')
+    DialectGroup = apps.get_model('world_languages', 'DialectGroup')
+    through = Dialect._meta.get_field('also_known_as').remote_field.through
+
+    edges = through.objects.values_list('from_dialect_id', 'to_dialect_id').iterator()
+    for dialect_ids in alias_groups(edges):
+        group = DialectGroup.objects.create()
+        Dialect.objects.filter(pk__in=dialect_ids).update(group=group)
+
+
+def ungroup_aliases(apps, schema_editor):
+    Dialect = apps.get_model('world_languages', 'Dialect')
+    through = Dialect._meta.get_field('also_known_as').remote_field.through
+
+    groups = {}
+    for pk, group_id in Dialect.objects.exclude(group=None).values_list('pk', 'group_id').iterator():
+        groups.setdefault(group_id, []).append(pk)
+
+    # also_known_as is symmetrical, so it stores both directions
+    through.objects.bulk_create([
+        through(from_dialect_id=from_id, to_dialect_id=to_id)
+        for dialect_ids in groups.values()
+        for from_id in dialect_ids
+        for to_id in dialect_ids
+        if from_id != to_id
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('world_languages', '0007_importrun'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DialectGroup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='dialect',
+            name='group',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='dialects', to='world_languages.DialectGroup'),
+        ),
+        migrations.RunPython(group_aliases, ungroup_aliases),
+        migrations.RemoveField(
+            model_name='dialect',
+            name='also_known_as',
+        ),
+    ]
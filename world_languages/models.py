@@ -1,7 +1,9 @@
+import json
 import re
 import regex
 import unicodedata
 import uuid
+from functools import lru_cache
 from urllib.parse import urlparse
 
 from django.core.exceptions import ValidationError
@@ -20,7 +22,10 @@ from six import text_type
 
 from cities.models import Continent, Country
 
-from .managers import AlternativeNameManager, InUseManager
+from .managers import (AlternativeNameManager, AlternativeNameQuerySet,
+                       DialectManager,
+                       FamilyManager, FlatCharacteristicManager,
+                       InUseManager, LanguageManager, UsedInManager)
 
 
 # TODO: Move regexes and lists of words into their own module
@@ -55,19 +60,33 @@ to_und_rgx = re.compile(r"(?:[-_]'|'[-_])+")  # -> _
 und_dash_rgx = re.compile(r'[-_]+-')  # -> -
 
 
-# TODO: Tests for this function. It needs them.
-def slugify(value):
-    value = force_text(value)
+SLUGIFY_CACHE_SIZE = 2 ** 16
+
+
+@lru_cache(maxsize=SLUGIFY_CACHE_SIZE)
+def _slugify(value):
     value = unicodedata.normalize('NFKC', value.strip().lower())
-    value = re.sub(slugify_rgx, '-', value)
-    value = re.sub(to_und_rgx, '_', value)
-    value = re.sub(multi_dash_rgx, '-', value)
-    value = re.sub(dash_und_rgx, '-', value)
-    value = re.sub(und_dash_rgx, '_', value)
-    value = re.sub(starting_chars_rgx, '', value)
-    value = re.sub(ending_chars_rgx, '', value)
-    return mark_safe(value)
-slugify = allow_lazy(slugify, text_type, SafeText)
+    value = slugify_rgx.sub('-', value)
+    # The remaining substitutions can only match if these characters are
+    # present, so skip the passes that can't change anything
+    if "'" in value:
+        value = to_und_rgx.sub('_', value)
+    if '-' in value:
+        value = multi_dash_rgx.sub('-', value)
+        if '_' in value:
+            value = dash_und_rgx.sub('-', value)
+        value = und_dash_rgx.sub('_', value)
+    # Equivalent to starting_chars_rgx and ending_chars_rgx, since no newlines
+    # survive slugify_rgx
+    return mark_safe(value.lstrip('-._').rstrip('-._'))
+
+
+def eager_slugify(value):
+    """
+    slugify() for callers that never pass lazy strings
+    """
+    return _slugify(force_text(value))
+slugify = allow_lazy(eager_slugify, text_type, SafeText)
 
 
 class Macroarea(models.Model):
@@ -84,14 +103,19 @@ class Family(models.Model):
     glottolog_id = models.CharField(blank=True, max_length=8, null=True, unique=True, validators=[RegexValidator(glid_rgx, "Glottolog IDs must be unique and of the form 'xxxx####' (except for the 'x##x####' one)")])
     parent = models.ForeignKey('self', blank=True, null=True)
 
+    objects = FamilyManager()
+
     class Meta:
         verbose_name_plural = 'families'
 
     def __str__(self):
         return self.name
 
+    def normalize(self):
+        self.slug = eager_slugify(self.name)
+
     def save(self, *args, **kwargs):
-        self.slug = slugify(self.name)
+        self.normalize()
         super().save(*args, **kwargs)
 
 
@@ -132,13 +156,14 @@ class Language(models.Model):
         (14, 'extinct',              _("10 (Extinct)")),
     )
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    name = models.CharField(max_length=255)
+    name = models.CharField(db_index=True, max_length=255)
     name_gl = models.CharField(max_length=255)
     slug = models.CharField(max_length=255, unique=True)
-    iso639_1 = models.CharField(blank=True, max_length=2, null=True, validators=[RegexValidator(iso639_1_rgx, "ISO 639-1 IDs must be unique and two lowercase letters")])
+    iso639_1 = models.CharField(blank=True, db_index=True, max_length=2, null=True,
+                                validators=[RegexValidator(iso639_1_rgx, "ISO 639-1 IDs must be unique and two lowercase letters")])
     iso639_2t = models.CharField(blank=True, max_length=3, null=True, validators=[RegexValidator(iso639_3_rgx, "ISO 639-2T IDs must be unique and three lowercase letters")])
     iso639_2b = models.CharField(blank=True, max_length=3, null=True, validators=[RegexValidator(iso639_3_rgx, "ISO 639-2B IDs must be unique and three lowercase letters")])
-    iso639_3 = models.CharField(blank=True, max_length=3, null=True, validators=[RegexValidator(iso639_3_rgx, "ISO 639-3 IDs must be unique")])
+    iso639_3 = models.CharField(blank=True, db_index=True, max_length=3, null=True, validators=[RegexValidator(iso639_3_rgx, "ISO 639-3 IDs must be unique")])
     iso639_5 = models.CharField(blank=True, default=None, max_length=3, null=True, validators=[RegexValidator(re.compile(r'[a-z]{3}|'), "ISO 639-5 IDs must be unique and three lowercase letters")])
     iso639_2_type = models.CharField(choices=TYPE, default=TYPE.living, max_length=11, db_column='type')
     iso639_2_scope = models.CharField(choices=SCOPE, default=SCOPE.individual, max_length=13)
@@ -156,6 +181,8 @@ class Language(models.Model):
     notes = models.TextField(blank=True, default='')
     used_in = models.ManyToManyField(Country, through='UsedIn', related_name='languages')
 
+    objects = LanguageManager()
+
     class Meta:
         unique_together = (('glottolog_id', 'family'),)
 
@@ -170,7 +197,16 @@ class Language(models.Model):
 
     abbreviation = property(get_abbreviation, set_abbreviation)
 
-    def save(self, *args, **kwargs):
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The code the alternative names in this language were saved with, so
+        # saves that don't change it don't have to update them
+        if 'iso639_3' in instance.__dict__:
+            instance._saved_iso639_3 = instance.iso639_3
+        return instance
+
+    def normalize(self):
         self.name = self.name.strip()
         self.name_gl = self.name_gl.strip()
 
@@ -181,8 +217,11 @@ class Language(models.Model):
         if name.startswith("//"):
             name = name.replace("//", 'X{}'.format(name))
 
-        self.slug = slugify(name)
+        self.slug = eager_slugify(name)
         # print('({}, {}) --> {}'.format(self.name, self.iso639_3, self.slug))
+
+    def save(self, *args, **kwargs):
+        self.normalize()
         super().save(*args, **kwargs)
 
 
@@ -193,36 +232,46 @@ class AlternativeName(models.Model):
         ('abbr', _("Abbreviation")),
     )
     language = models.ForeignKey(Language, related_name='alternative_names')
-    name = models.CharField(max_length=255)
+    name = models.CharField(db_index=True, max_length=255)
     slug = models.CharField(max_length=255, unique=True, validators=[RegexValidator(r'^.+$', "AlternativeName.slug cannot be blank")])
     type = models.CharField(choices=TYPE, max_length=4)
     in_language = models.ForeignKey(Language, blank=True, null=True, related_name='+')
+    # Denormalized from in_language so rendering doesn't need a join
+    in_language_code = models.CharField(blank=True, default='und', editable=False, max_length=3, null=True)
     preferred = models.BooleanField(default=False)
     colloquial = models.BooleanField(default=False)
 
     objects = AlternativeNameManager()
-    all_objects = models.Manager()
+    all_objects = AlternativeNameQuerySet.as_manager()
 
     class Meta:
         unique_together = (('language', 'name', 'type', 'in_language'),)
 
     def __str__(self):
-        if self.in_language.iso639_3 != 'und':
-            return "{} ({})".format(force_text(self.name), force_text(self.in_language))
+        if self.in_language_code != 'und':
+            return "{} ({})".format(force_text(self.name), self.in_language_code)
         else:
             return self.name
 
+    @staticmethod
+    def build_slug(name, iso639_3='und'):
+        return eager_slugify('{}_({})'.format(name, iso639_3))
+
     def slugify(self, *args, **kwargs):
-        if not self.in_language:
-            self.slug = slugify('{}_(und)'.format(self.name))
-        else:
-            self.slug = slugify('{}_({})'.format(self.name, self.in_language.iso639_3))
+        self.slug = self.build_slug(self.name, self.in_language_code)
 
-    def save(self, *args, **kwargs):
+    def normalize(self):
         self.name = self.name.strip()
 
+        if not self.in_language:
+            self.in_language_code = 'und'
+        else:
+            self.in_language_code = self.in_language.iso639_3
+
         self.slugify()
 
+    def save(self, *args, **kwargs):
+        self.normalize()
         super().save(*args, **kwargs)
 
 
@@ -246,6 +295,8 @@ class UsedIn(models.Model):
         (15, 'extinct',              _("10 (Extinct)")),
     )
     country = models.ForeignKey(Country)
+    # Denormalized from country so lookups by country code don't need a join
+    country_code = models.CharField(editable=False, max_length=2)
     language = models.ForeignKey(Language)
     known_as = models.ManyToManyField(AlternativeName, related_name='used_in')
     population = models.PositiveIntegerField(null=True)
@@ -255,20 +306,41 @@ class UsedIn(models.Model):
     development_status_notes = models.TextField(blank=True, default='', null=True)
     usage_notes = models.TextField(blank=True, default='', null=True)
 
+    objects = UsedInManager()
+
     class Meta:
         unique_together = (('country', 'language'),)
+        index_together = (('country_code', 'population'),)
+
+    def save(self, *args, **kwargs):
+        self.country_code = self.country.code
+        super().save(*args, **kwargs)
+
+
+class DialectGroup(models.Model):
+    """
+    Dialects that are aliases of each other
+    """
+    pass
 
 
 class Dialect(models.Model):
     used_in = models.ForeignKey(UsedIn, related_name='dialects')
     name = models.CharField(max_length=255)
-    also_known_as = models.ManyToManyField('self')
+    # Aliases share a group, instead of being linked to each other pairwise
+    group = models.ForeignKey(DialectGroup, blank=True, null=True, on_delete=models.SET_NULL, related_name='dialects')
     #mixed_with = models.ForeignKey(Language, default=None, null=True)
     notes = models.TextField()
 
+    objects = DialectManager()
+
     class Meta:
         unique_together = (('used_in', 'name'),)
 
+    @property
+    def also_known_as(self):
+        return Dialect.objects.aliases_of(self)
+
 
 class DialectNote(models.Model):
     used_in = models.ForeignKey(UsedIn, related_name='dialect_notes')
@@ -454,6 +526,56 @@ class SyllablePattern(Characteristic):
         super().save(*args, **kwargs)
 
 
+class FlatCharacteristic(models.Model):
+    """
+    Denormalized, non-polymorphic copy of every (language, characteristic)
+    pair
+
+    This is rebuilt by the importer with ``FlatCharacteristic.objects.rebuild()``
+    so typology filters run as a single indexed query instead of a
+    polymorphic join per subtype.
+    """
+    KIND = Choices(
+        ('characteristic',            _("Characteristic")),
+        ('absolute_word_type_order',  _("Absolute word type order")),
+        ('relative_word_type_order',  _("Relative word type order")),
+        ('speech_sound_count',        _("Speech sound count")),
+        ('subject_verb_object_order', _("Subject-verb-object order")),
+        ('syllable_pattern',          _("Syllable pattern")),
+    )
+    language = models.ForeignKey(Language, related_name='flat_characteristics')
+    characteristic = models.ForeignKey(Characteristic, related_name='+')
+    kind = models.CharField(choices=KIND, max_length=25)
+    notes = models.CharField(max_length=1023)
+    # AbsoluteWordTypeOrder and RelativeWordTypeOrder
+    word_type = models.CharField(blank=True, default=None, max_length=16, null=True)
+    related_word_type = models.CharField(blank=True, default=None, max_length=16, null=True)
+    position = models.CharField(blank=True, default=None, max_length=18, null=True)
+    # AbstractWordTypeOrder and SpeechSoundCount
+    modifier = models.CharField(blank=True, default=None, max_length=9, null=True)
+    # SpeechSoundCount
+    number = models.IntegerField(blank=True, default=None, null=True)
+    sound_type = models.CharField(blank=True, default=None, max_length=17, null=True)
+    # SubjectVerbObjectOrder
+    order = models.CharField(blank=True, default=None, max_length=3, null=True)
+    # SyllablePattern
+    pattern = models.CharField(blank=True, default=None, max_length=31, null=True)
+
+    objects = FlatCharacteristicManager()
+
+    class Meta:
+        unique_together = (('language', 'characteristic'),)
+        index_together = (
+            ('kind', 'order'),
+            ('kind', 'word_type', 'position'),
+            ('kind', 'sound_type', 'number'),
+            ('kind', 'pattern'),
+        )
+
+    def __str__(self):
+        return self.notes
+
+
 class Script(models.Model):
     TYPE = Choices(
         ('abjad',           'Abjad'),  # Only consonants (not vowels) have graphemes
@@ -513,6 +635,9 @@ class ScriptUsage(models.Model):
 
     objects = InUseManager()
 
+    class Meta:
+        index_together = (('in_use', 'start', 'end'),)
+
 
 class ScriptUsageStyle(models.Model):
     script_usage = models.ForeignKey(ScriptUsage)
@@ -605,3 +730,30 @@ class DevelopmentNoteLiteracyTag(DevelopmentNote):
 class DevelopmentNoteLiteracyPercent(DevelopmentNote):
     low = models.PositiveIntegerField(validators=[MinValueValidator(0), MaxValueValidator(100)])
     high = models.PositiveIntegerField(validators=[MinValueValidator(0), MaxValueValidator(100)])
+
+
+@python_2_unicode_compatible
+class ImportRun(models.Model):
+    """
+    A run of the world_languages management command that changed the data
+    """
+    version = models.CharField(max_length=32, unique=True)
+    imports = models.CharField(blank=True, default='', max_length=255)
+    flushes = models.CharField(blank=True, default='', max_length=255)
+    # JSON objects of {url: sha256 of its contents} and {model name: rows}
+    sources = models.TextField(default='{}')
+    row_counts = models.TextField(default='{}')
+    started = models.DateTimeField()
+    finished = models.DateTimeField()
+
+    class Meta:
+        get_latest_by = 'finished'
+
+    def __str__(self):
+        return '{} ({})'.format(self.version, self.finished)
+
+    def get_sources(self):
+        return json.loads(self.sources)
+
+    def get_row_counts(self):
+        return json.loads(self.row_counts)
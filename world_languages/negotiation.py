@@ -0,0 +1,173 @@
+from functools import lru_cache
+
+from cities.models import Country
+
+from .models import Language, UsedIn
+from .version import data_version
+
+
+# Distinct Accept-Language headers to remember the matches of
+MATCH_CACHE_SIZE = 4096
+
+
+def parse_accept_language(header):
+    """
+    ``(tag, q)`` tuples of an Accept-Language header, most preferred first
+
+    Tags are lowercased, and tags with a q-value of 0 or an invalid q-value
+    are dropped.
+    """
+    tags = []
+    for position, part in enumerate(header.split(',')):
+        tag, _, params = part.partition(';')
+        tag = tag.strip().lower()
+        if not tag:
+            continue
+
+        # Parameter names are case-insensitive, and q needn't be the only
+        # (or the first) one
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = None
+                break
+        if q is None or not 0 < q <= 1:
+            continue
+
+        tags.append((-q, position, tag))
+
+    return [(tag, -q) for q, position, tag in sorted(tags)]
+
+
+class LanguageMatcher(object):
+    """
+    Matches Accept-Language headers against the languages in the database
+
+    ``codes`` maps ISO 639-1 and ISO 639-3 codes to Language primary keys,
+    ``macrolanguages`` maps Language primary keys to the primary key of their
+    macrolanguage, ``countries`` is the set of known country codes, and
+    ``used_in`` the set of ``(language primary key, country code)`` pairs.
+    """
+    def __init__(self, codes, macrolanguages, countries, used_in, cache_size=MATCH_CACHE_SIZE):
+        self.codes = codes
+        self.macrolanguages = macrolanguages
+        self.countries = countries
+        self.used_in = used_in
+        self.match = lru_cache(maxsize=cache_size)(self._match)
+
+    @classmethod
+    def build(cls):
+        codes = {}
+        macrolanguages = {}
+        for pk, iso639_1, iso639_3, macrolanguage_id in Language.objects.values_list(
+                'pk', 'iso639_1', 'iso639_3', 'macrolanguage_id'):
+            # Two and three letter codes can't collide
+            if iso639_1:
+                codes[iso639_1] = pk
+            if iso639_3:
+                codes[iso639_3] = pk
+            if macrolanguage_id:
+                macrolanguages[pk] = macrolanguage_id
+
+        countries = set(code.lower() for code in Country.objects.values_list('code', flat=True))
+        used_in = set((language_id, code.lower()) for language_id, code in UsedIn.objects.values_list(
+            'language_id', 'country_code'))
+
+        return cls(codes, macrolanguages, countries, used_in)
+
+    def lookup(self, tag):
+        """
+        ``(language primary key, country code)`` of a single BCP-47 tag
+
+        The country code is None if the tag has no region subtag, or if the
+        region isn't a known country.
+        """
+        subtags = tag.replace('_', '-').split('-')
+        language_id = self.codes.get(subtags[0])
+
+        country = None
+        for subtag in subtags[1:]:
+            # Extended language subtags, eg: zh-yue, name the actual language
+            if len(subtag) == 3 and subtag.isalpha() and subtag in self.codes:
+                language_id = self.codes[subtag]
+            elif len(subtag) == 2 and subtag.isalpha():
+                country = subtag if subtag in self.countries else None
+                break
+
+        return language_id, country
+
+    def _match(self, header):
+        """
+        ``(language primary key, country code, q)`` tuples for every tag of
+        ``header`` that names a known language, most preferred first
+        """
+        matches = []
+        for tag, q in parse_accept_language(header):
+            if tag == '*':
+                continue
+            language_id, country = self.lookup(tag)
+            if language_id is not None:
+                matches.append((language_id, country.upper() if country else None, q))
+        return tuple(matches)
+
+    def chain(self, language_id):
+        """
+        The language followed by its macrolanguage, that macrolanguage's
+        macrolanguage, etc.
+        """
+        seen = set()
+        while language_id is not None and language_id not in seen:
+            seen.add(language_id)
+            yield language_id
+            language_id = self.macrolanguages.get(language_id)
+
+    def is_used_in(self, language_id, country_code):
+        return (language_id, country_code.lower()) in self.used_in
+
+    def negotiate(self, header, supported=None):
+        """
+        ``(language primary key, country code)`` of the most preferred
+        language in ``supported`` (any language if None), falling back
+        through the macrolanguages of each requested language
+
+        The country code is only kept if the language is used there. Returns
+        None if nothing matches.
+        """
+        for language_id, country, q in self.match(header):
+            for candidate in self.chain(language_id):
+                if supported is None or candidate in supported:
+                    if country and not self.is_used_in(candidate, country):
+                        country = None
+                    return candidate, country
+        return None
+
+
+# (data version, matcher) of the matcher built by this process
+_language_matcher = (None, None)
+
+
+def get_language_matcher():
+    """
+    The matcher for the current data, rebuilt after each import
+    """
+    global _language_matcher
+
+    version = data_version()
+    if _language_matcher[0] != version:
+        _language_matcher = (version, LanguageMatcher.build())
+    return _language_matcher[1]
+
+
+def negotiate_language(request, supported=None):
+    """
+    Negotiate the content language of ``request`` from its Accept-Language
+    header. See ``LanguageMatcher.negotiate()``.
+    """
+    header = request.META.get('HTTP_ACCEPT_LANGUAGE', '')
+    if not header:
+        return None
+    return get_language_matcher().negotiate(header, supported)
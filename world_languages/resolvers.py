@@ -0,0 +1,198 @@
+import re
+import unicodedata
+from functools import lru_cache
+
+from cities.models import Country, AlternativeName as AlternativeCountryName
+
+from .models import AlternativeName, Language
+from .version import data_version
+
+
+# Language fields to match tags against, in priority order
+LANGUAGE_TAG_FIELDS = [
+    'iso639_1', 'iso639_2t', 'iso639_2b', 'iso639_3', 'iso639_5',
+    'glottolog_id', 'slug', 'name', 'name_gl',
+]
+
+
+def normalize_tag(tag):
+    return tag.strip().casefold()
+
+
+def primary_subtag(key):
+    """
+    The primary language subtag of a BCP-47 (or POSIX locale) tag, eg: 'en'
+    for 'en-US', 'zh' for 'zh-Hant-TW', 'pt' for 'pt_BR'
+    """
+    return key.replace('_', '-').split('-', 1)[0]
+
+
+class LanguageResolver(object):
+    """
+    Resolves free-form language tags ("en", "eng", "en-US", "English",
+    "Deutsch", "ger") to languages with in-memory dictionary lookups
+
+    ``index`` maps normalized tags to Language primary keys. When a tag
+    matches more than one language the match on the higher priority field
+    wins (see ``LANGUAGE_TAG_FIELDS``), then the more populous language.
+    Alternative names are matched last, preferred names first.
+    """
+    def __init__(self, index):
+        self.index = index
+
+    @classmethod
+    def build(cls):
+        rows = list(Language.objects.values_list('pk', 'population', *LANGUAGE_TAG_FIELDS))
+        # Most populous first, unknown populations last
+        rows.sort(key=lambda row: (row[1] is None, -(row[1] or 0)))
+
+        index = {}
+        for position in range(2, 2 + len(LANGUAGE_TAG_FIELDS)):
+            for row in rows:
+                if row[position]:
+                    index.setdefault(normalize_tag(row[position]), row[0])
+
+        for name, language_id in AlternativeName.all_objects.order_by('-preferred').values_list(
+                'name', 'language_id').iterator():
+            index.setdefault(normalize_tag(name), language_id)
+
+        return cls(index)
+
+    def lookup(self, tag):
+        """
+        The primary key of the language ``tag`` refers to, or None
+        """
+        if not tag:
+            return None
+
+        key = normalize_tag(tag)
+        language_id = self.index.get(key)
+        if language_id is None and ('-' in key or '_' in key):
+            language_id = self.index.get(primary_subtag(key))
+        return language_id
+
+    def resolve_ids(self, tags):
+        """
+        Language primary keys (or None) for each of ``tags``, in order
+
+        Each distinct tag is only looked up once.
+        """
+        seen = {}
+        ids = []
+        append = ids.append
+        for tag in tags:
+            try:
+                append(seen[tag])
+            except KeyError:
+                seen[tag] = language_id = self.lookup(tag)
+                append(language_id)
+        return ids
+
+    def resolve(self, tags):
+        """
+        Languages (or None) for each of ``tags``, in order, fetched with one
+        query
+        """
+        ids = self.resolve_ids(tags)
+        languages = Language.objects.in_bulk(set(ids) - {None})
+        return [languages.get(language_id) for language_id in ids]
+
+
+# (data version, resolver) of the resolver built by this process
+_language_resolver = (None, None)
+
+
+def get_language_resolver():
+    """
+    The resolver for the current data, rebuilt after each import
+    """
+    global _language_resolver
+
+    version = data_version()
+    if _language_resolver[0] != version:
+        _language_resolver = (version, LanguageResolver.build())
+    return _language_resolver[1]
+
+
+def resolve_languages(tags):
+    """
+    Resolve an iterable of free-form language tags to a list of ``Language``
+    objects, with None for tags that don't match any language
+    """
+    return get_language_resolver().resolve(tags)
+
+
+# Country names used by Glottolog that aren't names (or alternative names) of
+# the country in django-cities
+COUNTRY_ALIASES = {
+    'Congo (Kinshasa)': 'CD',
+    'Congo (Brazzaville)': 'CG',
+    'Timor-Leste': 'TL',
+}
+
+country_code_rgx = re.compile(r'\s*\[(?P<code>[A-Za-z]{2})\]\s*$')
+country_key_rgx = re.compile(r'[\W_]+', re.UNICODE)
+
+
+def country_key(name):
+    """
+    Normalize a country name for lookups, ignoring case, accents,
+    punctuation, whitespace and a leading "The"
+    """
+    name = unicodedata.normalize('NFKD', name.strip().casefold())
+    name = ''.join(c for c in name if not unicodedata.combining(c))
+    if name.startswith('the '):
+        name = name[4:]
+    return country_key_rgx.sub('', name)
+
+
+class CountryResolver(object):
+    """
+    Resolves the country strings in language data ("Germany", "Germany [DE]",
+    "Congo, The", "Korea, South") to ``cities.Country`` objects, without any
+    queries once built
+
+    ``countries`` maps ISO 3166-1 alpha-2 codes to countries and ``names``
+    maps country keys (see ``country_key()``) to alpha-2 codes.
+    """
+    def __init__(self, countries, names, cache_size=None):
+        self.countries = countries
+        self.names = names
+        self.resolve = lru_cache(maxsize=cache_size)(self._resolve)
+
+    @classmethod
+    def build(cls):
+        countries = {country.code: country for country in Country.objects.all()}
+
+        names = {}
+        for code, country in countries.items():
+            names.setdefault(country_key(country.name), code)
+        for code, name in Country.objects.filter(
+                alt_names__kind=AlternativeCountryName.KIND.name).values_list(
+                'code', 'alt_names__name').iterator():
+            names.setdefault(country_key(name), code)
+        for name, code in COUNTRY_ALIASES.items():
+            names[country_key(name)] = code
+
+        return cls(countries, names)
+
+    def by_code(self, code):
+        return self.countries.get(code.upper())
+
+    def _resolve(self, value):
+        """
+        The country named by ``value``, or None
+        """
+        m = country_code_rgx.search(value)
+        if m:
+            country = self.by_code(m.group('code'))
+            if country is not None:
+                return country
+            value = value[:m.start()]
+
+        code = self.names.get(country_key(value))
+        if code is None and ', ' in value:
+            # Inverted names, eg: "Congo, Democratic Republic of the"
+            head, tail = value.split(', ', 1)
+            code = self.names.get(country_key('{} {}'.format(tail, head)))
+        return self.countries.get(code)
@@ -0,0 +1,175 @@
+from django.apps import apps
+from django.core.management.base import CommandError
+
+
+SHADOW_SCHEMA = 'world_languages_shadow'
+RETIRED_SCHEMA = 'world_languages_retired'
+
+
+class ShadowSchema(object):
+    """
+    Imports into copies of the app's tables in a separate PostgreSQL schema,
+    then swaps them in for the live tables
+
+    Readers keep seeing the live tables, and the only lock the import takes
+    on them is the brief one the swap needs at the very end. Everything
+    happens in the import's transaction, so a failed import (or validation)
+    just drops the shadow schema.
+    """
+    def __init__(self, connection, min_row_ratio=0.9):
+        if connection.vendor != 'postgresql':
+            raise CommandError("Shadow imports need PostgreSQL, not {}".format(connection.vendor))
+
+        self.connection = connection
+        self.min_row_ratio = min_row_ratio
+        self.qn = connection.ops.quote_name
+        self.tables = sorted(set(
+            model._meta.db_table
+            for model in apps.get_app_config('world_languages').get_models(include_auto_created=True)))
+
+    def query(self, cursor, sql, params=None):
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+    def live(self, table):
+        return '{}.{}'.format(self.qn(self.live_schema), self.qn(table))
+
+    def shadow(self, table):
+        return '{}.{}'.format(self.qn(SHADOW_SCHEMA), self.qn(table))
+
+    def create(self):
+        """
+        Copy the live tables (and their constraints and indexes, with the same
+        names) into the shadow schema, and point the connection at it
+        """
+        with self.connection.cursor() as cursor:
+            self.live_schema, self.search_path = self.query(
+                cursor, "SELECT current_schema(), current_setting('search_path')")[0]
+
+            # Read before the search path changes, so the definitions refer
+            # to the live tables unqualified and resolve to the shadow ones
+            self.constraints = self.query(cursor, """
+                SELECT rel.relname, con.conname, con.contype, pg_get_constraintdef(con.oid)
+                FROM pg_constraint con
+                JOIN pg_class rel ON rel.oid = con.conrelid
+                JOIN pg_namespace nsp ON nsp.oid = rel.relnamespace
+                WHERE nsp.nspname = %s AND rel.relname = ANY(%s) AND con.contype IN ('p', 'u', 'f')
+                ORDER BY con.contype DESC, rel.relname, con.conname
+            """, [self.live_schema, self.tables])
+            self.indexes = self.query(cursor, """
+                SELECT rel.relname, pg_get_indexdef(idx.indexrelid)
+                FROM pg_index idx
+                JOIN pg_class rel ON rel.oid = idx.indrelid
+                JOIN pg_namespace nsp ON nsp.oid = rel.relnamespace
+                WHERE nsp.nspname = %s AND rel.relname = ANY(%s)
+                  AND NOT EXISTS (SELECT 1 FROM pg_constraint con WHERE con.conindid = idx.indexrelid)
+            """, [self.live_schema, self.tables])
+            # Foreign keys of other apps' tables that reference these tables
+            self.references = self.query(cursor, """
+                SELECT con.conrelid::regclass::text, con.conname, pg_get_constraintdef(con.oid)
+                FROM pg_constraint con
+                JOIN pg_class ref ON ref.oid = con.confrelid
+                JOIN pg_namespace nsp ON nsp.oid = ref.relnamespace
+                JOIN pg_class rel ON rel.oid = con.conrelid
+                WHERE con.contype = 'f' AND nsp.nspname = %s AND ref.relname = ANY(%s)
+                  AND NOT (rel.relnamespace = ref.relnamespace AND rel.relname = ANY(%s))
+            """, [self.live_schema, self.tables, self.tables])
+
+            cursor.execute('DROP SCHEMA IF EXISTS {} CASCADE'.format(self.qn(SHADOW_SCHEMA)))
+            cursor.execute('CREATE SCHEMA {}'.format(self.qn(SHADOW_SCHEMA)))
+
+            for table in self.tables:
+                cursor.execute('CREATE TABLE {} (LIKE {} INCLUDING DEFAULTS INCLUDING CONSTRAINTS '
+                               'INCLUDING IDENTITY)'.format(self.shadow(table), self.live(table)))
+                cursor.execute('INSERT INTO {} SELECT * FROM {}'.format(self.shadow(table), self.live(table)))
+
+            cursor.execute('SET LOCAL search_path TO {}, {}'.format(self.qn(SHADOW_SCHEMA), self.search_path))
+
+            # Indexes after the rows, which is quicker than maintaining them
+            for table, name, contype, definition in self.constraints:
+                cursor.execute('ALTER TABLE {} ADD CONSTRAINT {} {}'.format(
+                    self.shadow(table), self.qn(name), definition))
+            for table, definition in self.indexes:
+                head, body = definition.split(' USING ', 1)
+                cursor.execute('{} ON {} USING {}'.format(
+                    head.split(' ON ', 1)[0], self.shadow(table), body))
+
+            # Identity columns get their own sequence, which has to carry on
+            # from the copied rows
+            for table, column, sequence in self.sequences(cursor, SHADOW_SCHEMA):
+                cursor.execute('SELECT setval(%s, COALESCE(MAX({0}), 0) + 1, false) FROM {1}'.format(
+                    self.qn(column), self.shadow(table)), [sequence])
+
+    def sequences(self, cursor, schema):
+        """
+        ``(table, column, sequence)`` of the columns in ``schema`` that own a
+        sequence
+        """
+        return [row for row in self.query(cursor, """
+            SELECT c.relname, a.attname, pg_get_serial_sequence(format('%%I.%%I', n.nspname, c.relname), a.attname)
+            FROM pg_attribute a
+            JOIN pg_class c ON c.oid = a.attrelid
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = %s AND c.relname = ANY(%s) AND a.attnum > 0 AND NOT a.attisdropped
+        """, [schema, self.tables]) if row[2]]
+
+    def validate(self, models):
+        """
+        Check the deferred foreign keys now, and that none of ``models`` has
+        lost more than ``min_row_ratio`` of its rows
+        """
+        with self.connection.cursor() as cursor:
+            # Django's foreign keys are only checked at commit otherwise
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+            errors = []
+            for model in models:
+                table = model._meta.db_table
+                (shadow_count,), = self.query(cursor, 'SELECT COUNT(*) FROM {}'.format(self.shadow(table)))
+                (live_count,), = self.query(cursor, 'SELECT COUNT(*) FROM {}'.format(self.live(table)))
+                if shadow_count < live_count * self.min_row_ratio:
+                    errors.append("{}: {} rows, down from {}".format(model.__name__, shadow_count, live_count))
+
+        if errors:
+            raise CommandError("The shadow tables lost too many rows, not swapping them in:\n{}".format(
+                '\n'.join(errors)))
+
+    def swap(self):
+        """
+        Swap the shadow tables in for the live ones, and drop the old ones
+        """
+        with self.connection.cursor() as cursor:
+            cursor.execute('DROP SCHEMA IF EXISTS {} CASCADE'.format(self.qn(RETIRED_SCHEMA)))
+            cursor.execute('CREATE SCHEMA {}'.format(self.qn(RETIRED_SCHEMA)))
+
+            # Other apps' foreign keys are re-pointed at (and checked against)
+            # the new tables
+            for table, name, definition in self.references:
+                cursor.execute('ALTER TABLE {} DROP CONSTRAINT {}'.format(table, self.qn(name)))
+
+            # Serial columns of the shadow tables share the live tables'
+            # sequences, which would otherwise move (and be dropped) with the
+            # live tables. A sequence can only be owned by a table of its own
+            # schema, so it's released until the shadow table moves in.
+            shadow_sequences = set((table, column) for table, column, sequence in
+                                   self.sequences(cursor, SHADOW_SCHEMA))
+            shared_sequences = [row for row in self.sequences(cursor, self.live_schema)
+                                if row[:2] not in shadow_sequences]
+            for table, column, sequence in shared_sequences:
+                cursor.execute('ALTER SEQUENCE {} OWNED BY NONE'.format(sequence))
+
+            for table in self.tables:
+                cursor.execute('ALTER TABLE {} SET SCHEMA {}'.format(self.live(table), self.qn(RETIRED_SCHEMA)))
+                cursor.execute('ALTER TABLE {} SET SCHEMA {}'.format(self.shadow(table), self.qn(self.live_schema)))
+
+            for table, column, sequence in shared_sequences:
+                cursor.execute('ALTER SEQUENCE {} OWNED BY {}.{}'.format(
+                    sequence, self.live(table), self.qn(column)))
+
+            cursor.execute('SET LOCAL search_path TO {}'.format(self.search_path))
+
+            for table, name, definition in self.references:
+                cursor.execute('ALTER TABLE {} ADD CONSTRAINT {} {}'.format(table, self.qn(name), definition))
+
+            cursor.execute('DROP SCHEMA {} CASCADE'.format(self.qn(RETIRED_SCHEMA)))
+            cursor.execute('DROP SCHEMA {} CASCADE'.format(self.qn(SHADOW_SCHEMA)))
@@ -0,0 +1,6 @@
+from django.dispatch import Signal
+
+
+# Sent by the world_languages command once its changes have been committed,
+# with the ``import_run`` (an ImportRun) and the new data ``version``
+languages_imported = Signal()
@@ -0,0 +1,175 @@
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from .models import LexicalSimilarity
+
+
+PLANES = ('low', 'high')
+
+
+def _require_numpy():
+    if np is None:
+        raise ImproperlyConfigured(
+            "The lexical similarity matrix requires NumPy. Install it with:"
+            "\n"
+            "\n"
+            "    pip install django-world-languages[analytics]")
+
+
+class SimilarityMatrix(object):
+    """
+    Dense matrix of lexical similarities between languages
+
+    ``data`` is a float32 array of shape (2, N, N): plane 0 holds
+    ``percent_low`` and plane 1 holds ``percent_high``. Missing similarities
+    are NaN. ``language_ids`` maps matrix rows (and columns) back to
+    ``Language`` primary keys.
+    """
+    def __init__(self, language_ids, data):
+        _require_numpy()
+        self.language_ids = list(language_ids)
+        self.index = {lid: i for i, lid in enumerate(self.language_ids)}
+        self.data = data
+
+    def __len__(self):
+        return len(self.language_ids)
+
+    def __contains__(self, language_id):
+        return str(language_id) in self.index
+
+    @property
+    def low(self):
+        return self.data[0]
+
+    @property
+    def high(self):
+        return self.data[1]
+
+    def plane(self, plane):
+        try:
+            return self.data[PLANES.index(plane)]
+        except ValueError:
+            raise ValueError("Unknown plane '{}', must be one of: {}".format(plane, ', '.join(PLANES)))
+
+    @classmethod
+    def build(cls, queryset=None):
+        """
+        Materialize every ``LexicalSimilarity`` row with a single query
+        """
+        _require_numpy()
+
+        if queryset is None:
+            queryset = LexicalSimilarity.objects.all()
+
+        rows = list(queryset.values_list('language_1_id', 'language_2_id',
+                                         'percent_low', 'percent_high'))
+
+        language_ids = sorted(set(str(r[0]) for r in rows) | set(str(r[1]) for r in rows))
+        index = {lid: i for i, lid in enumerate(language_ids)}
+
+        data = np.full((2, len(language_ids), len(language_ids)), np.nan, dtype=np.float32)
+
+        if rows:
+            ones = np.fromiter((index[str(r[0])] for r in rows), dtype=np.intp, count=len(rows))
+            twos = np.fromiter((index[str(r[1])] for r in rows), dtype=np.intp, count=len(rows))
+            lows = np.array([r[2] for r in rows], dtype=np.float32)
+            highs = np.array([r[3] for r in rows], dtype=np.float32)
+
+            data[0, ones, twos] = lows
+            data[1, ones, twos] = highs
+
+        return cls(language_ids, data)
+
+    @staticmethod
+    def _paths(path):
+        base, ext = os.path.splitext(path)
+        if ext != '.npy':
+            base = path
+        return '{}.npy'.format(base), '{}.index.npy'.format(base)
+
+    def save(self, path):
+        """
+        Write the matrix to ``path`` (a ``.npy`` file) and the row index next
+        to it (``<path>.index.npy``)
+        """
+        data_path, index_path = self._paths(path)
+        np.save(data_path, self.data)
+        np.save(index_path, np.array(self.language_ids, dtype='U36'))
+
+    @classmethod
+    def load(cls, path, mmap_mode=None):
+        _require_numpy()
+
+        data_path, index_path = cls._paths(path)
+        data = np.load(data_path, mmap_mode=mmap_mode)
+        language_ids = np.load(index_path).tolist()
+        return cls(language_ids, data)
+
+    def most_similar(self, language_id, k=10, plane='high'):
+        """
+        Return up to ``k`` ``(language_id, percent)`` tuples, most similar
+        first
+        """
+        try:
+            row = self.plane(plane)[self.index[str(language_id)]]
+        except KeyError:
+            return []
+
+        scores = np.where(np.isnan(row), -np.inf, row)
+        k = min(k, int(np.count_nonzero(np.isfinite(scores))))
+        if k <= 0:
+            return []
+
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(self.language_ids[i], float(scores[i])) for i in top]
+
+    def top_k(self, k=10, plane='high'):
+        """
+        Vectorized top-k for every language at once
+
+        Returns ``(indices, scores)``, both of shape (N, k). Rows are sorted
+        most similar first; missing entries have an index of -1 and a score
+        of NaN.
+        """
+        matrix = self.plane(plane)
+        n = len(self)
+        k = min(k, n)
+        if k <= 0:
+            return np.empty((n, 0), dtype=np.intp), np.empty((n, 0), dtype=np.float32)
+
+        scores = np.where(np.isnan(matrix), -np.inf, matrix)
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind='stable')
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+        missing = np.isinf(top_scores)
+        top[missing] = -1
+        top_scores[missing] = np.nan
+        return top, top_scores.astype(np.float32)
+
+
+def get_similarity_matrix(path=None, rebuild=False, mmap_mode=None):
+    """
+    Load the similarity matrix cached at ``path``, building (and caching) it
+    from the database if the cache doesn't exist yet
+    """
+    if path is not None and not rebuild:
+        data_path, index_path = SimilarityMatrix._paths(path)
+        if os.path.exists(data_path) and os.path.exists(index_path):
+            return SimilarityMatrix.load(path, mmap_mode=mmap_mode)
+
+    matrix = SimilarityMatrix.build()
+
+    if path is not None:
+        matrix.save(path)
+
+    return matrix
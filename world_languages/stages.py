@@ -0,0 +1,64 @@
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+
+# An import stage: the name of the Command method that runs it, the stages
+# whose data it reads, and a function returning the URLs it downloads
+Stage = namedtuple('Stage', ['method', 'depends_on', 'urls'])
+
+
+def order_stages(stages, names):
+    """
+    ``names`` in an order that runs each stage after the stages it depends on
+    (that are also in ``names``), otherwise in the order of ``stages``
+    """
+    names = [name for name in stages if name in set(names)]
+    ordered = []
+    while names:
+        for name in names:
+            if all(dep in ordered or dep not in names for dep in stages[name].depends_on):
+                ordered.append(name)
+                names.remove(name)
+                break
+        else:
+            raise ValueError("Import stages depend on each other: {}".format(', '.join(names)))
+    return ordered
+
+
+class Prefetcher(object):
+    """
+    Downloads URLs on worker threads, ahead of the stages that need them
+
+    Downloads are started in the order they're prefetched. ``get()`` waits
+    for a prefetched download. Only the downloads overlap: the stages still
+    parse their files and write to the database one at a time.
+    """
+    def __init__(self, download, workers):
+        self.download = download
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.futures = {}
+
+    def prefetch(self, urls):
+        for url in urls:
+            if url not in self.futures:
+                self.futures[url] = self.executor.submit(self.download, url)
+
+    def get(self, url):
+        """
+        The contents of ``url`` if it was prefetched, otherwise None
+
+        Raises whatever the download raised.
+        """
+        future = self.futures.get(url)
+        if future is None:
+            return None
+        return future.result()
+
+    def close(self, wait=True):
+        """
+        Cancel the downloads that haven't started, and wait for the ones in
+        progress unless ``wait`` is False
+        """
+        for future in self.futures.values():
+            future.cancel()
+        self.executor.shutdown(wait=wait)
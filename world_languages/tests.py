@@ -1,3 +1,1097 @@
-from django.test import TestCase
+import datetime
+import importlib
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+from io import StringIO
+from collections import OrderedDict
+from unittest import mock, skipIf
 
-# Create your tests here.
+from django.apps import apps
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.core.management.base import BaseCommand
+from django.db import connection, models, transaction
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.encoding import force_text
+from django.utils.functional import lazy
+from django.utils.timezone import now
+
+import yaml
+from cities.models import AlternativeName as AlternativeCountryName, Country
+
+from .admin import EstimatedCountPaginator
+from .flush import flush_models, flush_tables
+from .maintenance import MAINTENANCE_STEPS, app_tables, run_maintenance
+from .negotiation import LanguageMatcher, negotiate_language, parse_accept_language
+from .resolvers import CountryResolver, LanguageResolver, resolve_languages
+from .shadow import ShadowSchema
+from .signals import languages_imported
+from .management.commands.benchmark_world_languages import original_slugify
+from .similarity import SimilarityMatrix, np
+from .stages import Prefetcher, Stage, order_stages
+from .typology import CACHE_KEY, TypologyIndex, get_typology_index
+from .version import bump_data_version, data_version
+from .models import (AlternativeName, Characteristic, DevelopmentNote,
+                     DevelopmentNoteTag, Dialect, DialectGroup, Family, ImportRun, Language,
+                     FlatCharacteristic, LexicalSimilarity, Macroarea, Script,
+                     ScriptUsage, SpeechSoundCount, SubjectVerbObjectOrder,
+                     SyllablePattern, UsedIn, eager_slugify, slugify)
+
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'tests', 'data')
+
+
+class SlugifyTestCase(SimpleTestCase):
+    alphabet = "-_.'!*+(),$ \t\n/\\[]aZ9\u00e9\u00df\u017f\ufb01\u00a0\uff21\u2013\u01c5\u0130"
+
+    def test_matches_reference_implementation(self):
+        rnd = random.Random(639)
+        for _ in range(20000):
+            value = ''.join(rnd.choice(self.alphabet) for _ in range(rnd.randint(0, 12)))
+            self.assertEqual(eager_slugify(value), original_slugify(value), repr(value))
+            self.assertEqual(slugify(value), original_slugify(value), repr(value))
+
+    def test_matches_reference_implementation_for_real_names(self):
+        # Every string of the Ethnologue and Glottolog test data, and the
+        # lookup keys the importer builds from the names
+        def strings(value):
+            if isinstance(value, dict):
+                for key, item in value.items():
+                    yield from strings(key)
+                    yield from strings(item)
+            elif isinstance(value, list):
+                for item in value:
+                    yield from strings(item)
+            elif isinstance(value, str):
+                yield value
+
+        values = set()
+        for filename in os.listdir(DATA_DIR):
+            with open(os.path.join(DATA_DIR, filename), encoding='utf-8') as f:
+                for language in yaml.safe_load(f).values():
+                    values.update(strings(language))
+                    for name in [language['name']] + language.get('alternate_names', []):
+                        values.add('{}_({})'.format(name, language.get('iso_639-3', 'und')))
+        self.assertGreater(len(values), 1000)
+
+        for value in sorted(values):
+            self.assertEqual(eager_slugify(value), original_slugify(value), repr(value))
+            self.assertEqual(slugify(value), original_slugify(value), repr(value))
+
+    def test_examples(self):
+        self.assertEqual(eager_slugify('Indo-European'), 'indo-european')
+        self.assertEqual(eager_slugify('English [eng]'), 'english-eng')
+        self.assertEqual(eager_slugify("  //Xam_(eng)  "), 'xam_(eng)')
+        self.assertEqual(eager_slugify("O'odham - Pima_(und)"), "o'odham-pima_(und)")
+
+    def test_lazy(self):
+        lazy_name = lazy(lambda: 'Lazy Name', str)()
+        self.assertEqual(force_text(slugify(lazy_name)), 'lazy-name')
+
+
+class ExportTestCase(TestCase):
+    def test_export(self):
+        en = Language.objects.create(name='English', name_gl='Standard English', iso639_3='eng')
+        zza = Language.objects.create(name='Zaza', name_gl='Zaza', iso639_3='zza', macrolanguage=en)
+        AlternativeName.objects.create(language=zza, name='Zazaki', type=AlternativeName.TYPE.name, in_language=en)
+
+        for chunk_size, queries in ((1, 2 * 5 + 1), (500, 5 + 1)):
+            out = StringIO()
+            # Every chunk of languages (and then an empty page), with a query
+            # per kind of related row
+            with self.assertNumQueries(queries):
+                call_command('export_world_languages', chunk_size=chunk_size, stdout=out)
+            records = sorted((json.loads(line) for line in out.getvalue().splitlines()), key=lambda r: r['name'])
+            self.assertEqual([(r['iso639_3'], r['macrolanguage']) for r in records], [('eng', None), ('zza', 'eng')])
+            self.assertEqual([name['name'] for name in records[1]['alternative_names']], ['Zazaki'])
+
+        out = StringIO()
+        call_command('export_world_languages', format='csv', stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 3)
+
+
+class BenchmarkTestCase(TestCase):
+    def test_slugify(self):
+        zza = Language.objects.create(name='Zaza', name_gl='Zaza', iso639_3='zza')
+        AlternativeName.objects.create(language=zza, name="Dımıli / Zazaki", type=AlternativeName.TYPE.name)
+
+        out = StringIO()
+        call_command('benchmark_world_languages', 'slugify', repeat=1, stdout=out)
+        self.assertEqual([line.split()[1] for line in out.getvalue().splitlines()],
+                         ['original', 'uncached', 'cached'])
+
+    def test_resolve(self):
+        Language.objects.create(name='Zaza', name_gl='Zaza', iso639_3='zza')
+
+        out = StringIO()
+        call_command('benchmark_world_languages', 'resolve', repeat=1, tags=1000, stdout=out)
+        self.assertEqual([line.split()[1] for line in out.getvalue().splitlines()],
+                         ['build', 'lookup', 'resolve_ids'])
+
+    @skipIf(not hasattr(BaseCommand, 'option_list'), "The import command needs BaseCommand.option_list")
+    def test_import(self):
+        out = StringIO()
+        call_command('benchmark_world_languages', 'import', repeat=1, stdout=out)
+        self.assertEqual([line.split()[1] for line in out.getvalue().splitlines()],
+                         ['django.setup', 'command'])
+
+
+class LanguageQuerySetTestCase(TestCase):
+    def setUp(self):
+        self.en = Language.objects.create(
+            name='English',
+            name_gl='Standard English',
+            iso639_1='en',
+            iso639_3='eng')
+        self.family = Family.objects.create(name='Indo-European')
+        self.macroarea = Macroarea.objects.create(name='Eurasia')
+        self.script = Script.objects.create(name='Latin')
+
+    def add_details(self, language, count):
+        language.family = self.family
+        language.macroarea = self.macroarea
+        language.save()
+        for i in range(count):
+            country = Country.objects.create(
+                name='{} Country {}'.format(language.name, i), code='{}{}'.format(language.iso639_3[1], i),
+                code3='{}{}'.format(language.iso639_3[1:], i), population=0)
+            used_in = UsedIn.objects.create(
+                country=country, language=language, development_status=UsedIn.DEVELOPMENT_STATUS.vigorous)
+            used_in.scripts.add(ScriptUsage.objects.create(script=self.script))
+            Dialect.objects.create(used_in=used_in, name='Dialect {}'.format(i))
+            AlternativeName.objects.create(
+                language=language,
+                name='{} {}'.format(language.name, i),
+                type=AlternativeName.TYPE.name,
+                in_language=self.en)
+            used_in.known_as.add(AlternativeName.objects.create(
+                language=language,
+                name='{} {} (local)'.format(language.name, i),
+                type=AlternativeName.TYPE.name))
+            DevelopmentNote.objects.create(language=language, note='Note {}'.format(i))
+            DevelopmentNoteTag.objects.create(language=language, note='Radio {}'.format(i), name='Radio programs')
+            language.characteristics.add(
+                SubjectVerbObjectOrder.objects.create(order='SOV', notes='SOV {}'.format(i)),
+                SyllablePattern.objects.create(pattern='CV', notes='CV {}'.format(i)))
+
+    def render_details(self):
+        with CaptureQueriesContext(connection) as queries:
+            for language in Language.objects.with_full_detail():
+                str(language.family)
+                str(language.macroarea)
+                [str(an) for an in language.alternative_names.all()]
+                for ui in language.usedin_set.all():
+                    str(ui.country)
+                    [str(an) for an in ui.known_as.all()]
+                    [su.script.name for su in ui.scripts.all()]
+                    [d.name for d in ui.dialects.all()]
+                for dn in language.development_notes.all():
+                    hasattr(dn, 'developmentnotetag')
+                    hasattr(dn, 'developmentnotebible')
+                [str(c) for c in language.characteristics.all()]
+        return len(queries)
+
+    def test_with_full_detail_query_count_is_constant(self):
+        self.add_details(Language.objects.create(name='Zaza', name_gl='Zaza', iso639_3='zza'), 1)
+        # The first render looks up (and caches) the content types of the
+        # polymorphic characteristics
+        self.render_details()
+        few = self.render_details()
+
+        self.add_details(Language.objects.create(name='Estonian', name_gl='Estonian', iso639_3='est'), 5)
+        self.add_details(self.en, 3)
+        self.assertEqual(self.render_details(), few)
+
+
+class BulkCreateTestCase(TestCase):
+    def test_bulk_create_computes_slugs(self):
+        en = Language.objects.create(name='English', name_gl='Standard English', iso639_3='eng')
+        zza, est = Language.objects.bulk_create([
+            Language(name=' Zaza ', name_gl='Zaza', iso639_3='zza'),
+            Language(name='Estonian', name_gl='Estonian', iso639_3='est'),
+        ])
+        self.assertEqual((zza.name, zza.slug), ('Zaza', 'zaza-zza'))
+        self.assertEqual(est.slug, 'estonian-est')
+
+        with self.assertNumQueries(2):
+            AlternativeName.objects.bulk_create([
+                AlternativeName(language_id=zza.id, name='Zazaki ', type=AlternativeName.TYPE.name, in_language_id=en.id),
+                AlternativeName(language_id=zza.id, name='Dimli', type=AlternativeName.TYPE.name),
+            ])
+        self.assertEqual(
+            sorted(AlternativeName.objects.values_list('name', 'in_language_code', 'slug')),
+            [('Dimli', 'und', 'dimli_(und)'), ('Zazaki', 'eng', 'zazaki_(eng)')])
+
+        # Rendering doesn't need in_language, even when it isn't joined
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                sorted(str(an) for an in AlternativeName.all_objects.all()),
+                ['Dimli', 'Zazaki (eng)'])
+
+    def test_upsert_many(self):
+        en = Language.objects.create(name='English', name_gl='Standard English', iso639_3='eng')
+        zza = Language.objects.create(name='Zaza', name_gl='Zaza', iso639_3='zza')
+
+        def names(count, preferred=False):
+            return [AlternativeName(language=zza, name='Name {}'.format(i), type=AlternativeName.TYPE.name,
+                                    in_language=en, preferred=preferred)
+                    for i in range(count)]
+
+        with CaptureQueriesContext(connection) as small:
+            AlternativeName.objects.upsert_many(names(2))
+        with CaptureQueriesContext(connection) as large:
+            AlternativeName.objects.upsert_many(names(20))
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(AlternativeName.objects.count(), 20)
+
+        # Duplicates within the batch are only written once, and only
+        # update_fields of existing names change
+        saved = AlternativeName.objects.upsert_many(
+            names(1, preferred=True) + names(1) + [
+                AlternativeName(language=zza, name='Dimli', type=AlternativeName.TYPE.name)],
+            update_fields=['preferred'])
+        self.assertEqual([an.slug for an in saved], ['name-0_(eng)', 'name-0_(eng)', 'dimli_(und)'])
+        self.assertEqual(saved[0].pk, saved[1].pk)
+        self.assertEqual(AlternativeName.objects.count(), 21)
+        self.assertEqual(list(AlternativeName.objects.filter(preferred=True).values_list('name', flat=True)),
+                         ['Name 0'])
+
+
+# The import command still declares its options with option_list, which
+# Django 1.10 removed
+@skipIf(not hasattr(BaseCommand, 'option_list'), "The import command needs BaseCommand.option_list")
+class ImportChunkTestCase(TestCase):
+    def setUp(self):
+        from .management.commands.world_languages import Command, remember_language
+        self.command = Command()
+        self.remember_language = remember_language
+
+    def test_rows_find_the_earlier_rows_of_their_chunk(self):
+        Language.objects.create(name='Zaza', name_gl='Zaza', iso639_3='zza')
+        pending = {}
+
+        def find(iso639_1, iso639_2, iso639_3, name):
+            language = self.command.find_additional_language(
+                {'iso639-1': iso639_1, 'iso639-2': iso639_2, 'iso639-3': iso639_3, 'name': name}, pending)
+            self.remember_language(pending, language)
+            return language
+
+        with self.assertNumQueries(3):
+            zza = find('', '', 'zza', 'Zaza')
+            kmr = find('', '', 'kmr', 'Northern Kurdish')
+            self.assertIs(find('', '', 'kmr', 'Kurmanji'), kmr)
+            ku = find('ku', 'kur', '', 'Kurdish')
+            self.assertIs(find('ku', 'kur', '', 'Kurdish; Kurdi'), ku)
+        self.assertFalse(zza._state.adding)
+        self.assertFalse(Language.objects.filter(iso639_3__in=['kmr', 'kur']).exists())
+
+        # Without the chunk, the unsaved rows are created again
+        self.assertIsNot(self.command.find_additional_language(
+            {'iso639-1': '', 'iso639-2': '', 'iso639-3': 'kmr', 'name': 'Kurmanji'}), kmr)
+
+
+@skipIf(not hasattr(BaseCommand, 'option_list'), "The import command needs BaseCommand.option_list")
+class GlottologImportTestCase(TestCase):
+    def setUp(self):
+        Macroarea.objects.create(name='North America')
+        Country.objects.create(name='Canada', code='CA', code3='CAN', population=0)
+        Country.objects.create(name='United States', code='US', code3='USA', population=0)
+
+    def import_glottolog(self, data):
+        from .management.commands.world_languages import Command
+        command = Command()
+        command.iso_index = {'psd': {'name': 'Plains Indian Sign Language', 'iso639-1': '', 'iso639-2t': '',
+                                     'iso639-2b': '', 'alt_names': []}}
+        with mock.patch.object(Command, 'get_data', return_value=list(data.items())):
+            command.import_glottolog()
+
+    def test_repeated_typology(self):
+        with open(os.path.join(DATA_DIR, 'plai1235.yaml')) as f:
+            data = yaml.safe_load(f)
+        # The same order and sound count, with different notes
+        data['plai1235']['typology'] = ['SOV', '24 consonants', 'verb agreement', 'SOV, verb agreement',
+                                        'SOV, 24 consonants']
+
+        # Reimporting finds the characteristics the first import linked
+        for _ in range(2):
+            self.import_glottolog(data)
+            psd = Language.objects.get(iso639_3='psd')
+            self.assertEqual(
+                sorted((type(char).__name__, str(char)) for char in psd.characteristics.all()),
+                [('Characteristic', 'verb agreement'), ('SpeechSoundCount', '24 consonants'),
+                 ('SubjectVerbObjectOrder', 'SOV')])
+
+
+# on_commit() callbacks only run when a transaction really commits
+@skipIf(not hasattr(BaseCommand, 'option_list'), "The import command needs BaseCommand.option_list")
+class ImportRunTestCase(TransactionTestCase):
+    def setUp(self):
+        from .management.commands.world_languages import Command
+        self.command = Command()
+        self.command.imports = ['language']
+        self.command.flushes = []
+        self.command.sources = {}
+        cache.clear()
+
+    def test_typology_index_cached_on_commit(self):
+        self.command.typology_index = TypologyIndex(['zza'], {('order', 'SOV'): 1})
+        old = data_version()
+        with transaction.atomic():
+            self.command.record_import_run(now())
+            self.assertIsNone(TypologyIndex.load())
+        run = ImportRun.objects.get()
+        self.assertEqual(data_version(), run.version)
+        self.assertEqual(TypologyIndex.load().language_ids, ['zza'])
+        self.assertIsNone(TypologyIndex.load(old))
+
+    def receive(self):
+        received = []
+
+        def handler(sender, **kwargs):
+            received.append(kwargs)
+        languages_imported.connect(handler, weak=False)
+        self.addCleanup(languages_imported.disconnect, handler)
+        return received
+
+    def test_recorded_and_announced_on_commit(self):
+        Language.objects.create(name='Zaza', name_gl='Zaza', iso639_3='zza')
+        self.command.sources = {'http://example.com/languages.tsv': 'abc'}
+        received = self.receive()
+        old = data_version()
+        started = now()
+        with transaction.atomic():
+            self.command.record_import_run(started)
+            self.assertEqual(data_version(), old)
+            self.assertEqual(received, [])
+
+        run = ImportRun.objects.get()
+        self.assertEqual(run.imports, 'language')
+        self.assertEqual(run.flushes, '')
+        self.assertEqual(run.get_sources(), {'http://example.com/languages.tsv': 'abc'})
+        self.assertEqual(run.get_row_counts()['Language'], 1)
+        self.assertEqual(run.started, started)
+        self.assertGreaterEqual(run.finished, started)
+
+        self.assertNotEqual(run.version, old)
+        self.assertEqual(data_version(), run.version)
+        self.assertEqual(received, [{'signal': languages_imported, 'import_run': run, 'version': run.version}])
+
+    def test_not_announced_on_rollback(self):
+        received = self.receive()
+        old = data_version()
+        with self.assertRaises(ValueError):
+            with transaction.atomic():
+                self.command.record_import_run(now())
+                raise ValueError
+        self.assertFalse(ImportRun.objects.exists())
+        self.assertEqual(data_version(), old)
+        self.assertEqual(received, [])
+
+
+def create_typology():
+    zza = Language.objects.create(name='Zaza', name_gl='Zaza', iso639_3='zza')
+    est = Language.objects.create(name='Estonian', name_gl='Estonian', iso639_3='est')
+    zza.characteristics.add(
+        SubjectVerbObjectOrder.objects.create(order='SOV', notes='SOV'),
+        SpeechSoundCount.objects.create(number=8, type='vowel', modifier='basic', notes='8 vowels'))
+    est.characteristics.add(
+        SubjectVerbObjectOrder.objects.create(order='SVO', notes='SVO'),
+        SpeechSoundCount.objects.create(number=9, type='vowel', modifier='basic', notes='9 vowels'),
+        SyllablePattern.objects.create(pattern='CV', notes='CV'))
+    return zza, est
+
+
+class LanguageResolverTestCase(TestCase):
+    def setUp(self):
+        self.en = Language.objects.create(name='English', name_gl='Standard English', iso639_1='en',
+                                          iso639_2b='eng', iso639_3='eng', population=1000)
+        self.de = Language.objects.create(name='German', name_gl='Standard German', iso639_1='de',
+                                          iso639_2t='deu', iso639_2b='ger', iso639_3='deu', population=100)
+        self.pt = Language.objects.create(name='Portuguese', name_gl='Portuguese', iso639_1='pt', iso639_3='por',
+                                          glottolog_id='port1283')
+        # A name that's also another language's code
+        self.xx = Language.objects.create(name='En', name_gl='En', iso639_3='enc')
+        AlternativeName.objects.create(language=self.de, name='Deutsch', type=AlternativeName.TYPE.name)
+        AlternativeName.objects.create(language=self.pt, name='Português', type=AlternativeName.TYPE.name,
+                                       preferred=True)
+        AlternativeName.objects.create(language=self.en, name='Português', type=AlternativeName.TYPE.name,
+                                       in_language=self.de)
+        cache.clear()
+
+    def test_resolve(self):
+        resolver = LanguageResolver.build()
+        self.assertEqual(resolver.resolve_ids([
+            'en', 'eng', ' EN ', 'en-US', 'en_GB', 'English', 'standard english',
+            'Deutsch', 'ger', 'deu', 'de-Latn-DE',
+            'port1283', 'portuguese-por', 'português', 'pt-BR',
+            'enc', 'nonsense', 'xx-YY', '', None,
+        ]), [
+            self.en.pk, self.en.pk, self.en.pk, self.en.pk, self.en.pk, self.en.pk, self.en.pk,
+            self.de.pk, self.de.pk, self.de.pk, self.de.pk,
+            self.pt.pk, self.pt.pk, self.pt.pk, self.pt.pk,
+            self.xx.pk, None, None, None, None,
+        ])
+
+    def test_resolve_languages(self):
+        tags = ['en', 'de-AT', 'eng', 'nonsense', 'en']
+        resolve_languages(tags)
+        # One query for the languages, each tag only looked up once
+        with self.assertNumQueries(1), mock.patch.object(LanguageResolver, 'lookup',
+                                                         autospec=True, side_effect=LanguageResolver.lookup) as lookup:
+            self.assertEqual(resolve_languages(tags), [self.en, self.de, self.en, None, self.en])
+        self.assertEqual(lookup.call_count, 4)
+
+
+class AcceptLanguageTestCase(SimpleTestCase):
+    def test_parse_accept_language(self):
+        self.assertEqual(parse_accept_language('da, en-GB;q=0.8, en;q=0.7'),
+                         [('da', 1.0), ('en-gb', 0.8), ('en', 0.7)])
+        # Ties keep their order
+        self.assertEqual(parse_accept_language('fr;q=0.5, de, EN;Q=0.5, *;q=0.1'),
+                         [('de', 1.0), ('fr', 0.5), ('en', 0.5), ('*', 0.1)])
+        # q can come after (or among) other parameters
+        self.assertEqual(parse_accept_language('en;level=1;q=0.4, de;q=0.6;x=y, fr;x=y'),
+                         [('fr', 1.0), ('de', 0.6), ('en', 0.4)])
+        # Refused, invalid and empty entries are dropped
+        self.assertEqual(parse_accept_language('en;q=0, de;q=abc, fr;q=1.5, , es ;q= 0.9'),
+                         [('es', 0.9)])
+        self.assertEqual(parse_accept_language(''), [])
+
+
+class LanguageMatcherTestCase(TestCase):
+    def setUp(self):
+        self.zh = Language.objects.create(name='Chinese', name_gl='Chinese', iso639_1='zh', iso639_3='zho',
+                                          iso639_2_scope=Language.SCOPE.macrolanguage)
+        self.yue = Language.objects.create(name='Yue Chinese', name_gl='Cantonese', iso639_3='yue',
+                                           macrolanguage=self.zh)
+        self.en = Language.objects.create(name='English', name_gl='Standard English', iso639_1='en', iso639_3='eng')
+        hong_kong = Country.objects.create(name='Hong Kong', code='HK', code3='HKG', population=0)
+        Country.objects.create(name='United States', code='US', code3='USA', population=0)
+        UsedIn.objects.create(language=self.yue, country=hong_kong,
+                              development_status=UsedIn.DEVELOPMENT_STATUS.vigorous)
+        cache.clear()
+
+    def test_match(self):
+        matcher = LanguageMatcher.build()
+        self.assertEqual(matcher.match('zh-yue-HK, en-US;Q=0.5, xx, en-ZZ;q=0.1'), (
+            (self.yue.pk, 'HK', 1.0), (self.en.pk, 'US', 0.5), (self.en.pk, None, 0.1)))
+        self.assertEqual(matcher.match('en-us;q=0.5'), matcher.match('en-US;q=0.5'))
+
+    def test_negotiate(self):
+        matcher = LanguageMatcher.build()
+        self.assertEqual(matcher.negotiate('yue-HK, en;q=0.8'), (self.yue.pk, 'HK'))
+        # Falls back to the macrolanguage, which isn't known to be used there
+        self.assertEqual(matcher.negotiate('yue-HK, en;q=0.8', supported={self.zh.pk}), (self.zh.pk, None))
+        # The region is dropped where the language isn't used
+        self.assertEqual(matcher.negotiate('en-US;q=0.5, yue;q=0.1', supported={self.en.pk}), (self.en.pk, None))
+        self.assertIsNone(matcher.negotiate('fr, *;q=0.5'))
+
+    def test_negotiate_language(self):
+        factory = RequestFactory()
+        self.assertEqual(negotiate_language(factory.get('/', HTTP_ACCEPT_LANGUAGE='fr, EN;Q=0.5')),
+                         (self.en.pk, None))
+        self.assertIsNone(negotiate_language(factory.get('/')))
+
+
+class CountryResolverTestCase(TestCase):
+    def setUp(self):
+        self.germany = Country.objects.create(name='Germany', code='DE', code3='DEU', population=0)
+        self.congo = Country.objects.create(name='Democratic Republic of the Congo', code='CD', code3='COD',
+                                            population=0)
+        self.korea = Country.objects.create(name='South Korea', code='KR', code3='KOR', population=0)
+        self.korea.alt_names.add(
+            AlternativeCountryName.objects.create(name='Republic of Korea', kind=AlternativeCountryName.KIND.name),
+            AlternativeCountryName.objects.create(name='https://example.com/kr', kind=AlternativeCountryName.KIND.link))
+
+    def test_resolve(self):
+        with self.assertNumQueries(2):
+            resolver = CountryResolver.build()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(resolver.resolve('Germany'), self.germany)
+            self.assertEqual(resolver.resolve('germany [DE]'), self.germany)
+            self.assertEqual(resolver.resolve('Deutschland [DE]'), self.germany)
+            self.assertEqual(resolver.resolve('Germany [ZZ]'), self.germany)
+            self.assertEqual(resolver.resolve('Congo, Democratic Republic of the'), self.congo)
+            self.assertEqual(resolver.resolve('Congo (Kinshasa)'), self.congo)
+            self.assertEqual(resolver.resolve('Korea, Republic of'), self.korea)
+            self.assertEqual(resolver.by_code('kr'), self.korea)
+            self.assertIsNone(resolver.resolve('https://example.com/kr'))
+            self.assertIsNone(resolver.resolve('Atlantis'))
+
+
+class AlternativeNameTestCase(TestCase):
+    def setUp(self):
+        self.en = Language.objects.create(name='English', name_gl='Standard English', iso639_3='eng')
+        self.zza = Language.objects.create(name='Zaza', name_gl='Zaza', iso639_3='zza')
+        AlternativeName.objects.create(language=self.zza, name='Zazaki', type=AlternativeName.TYPE.name,
+                                       in_language=self.en)
+
+    def test_language_code_changes(self):
+        en = Language.objects.get(pk=self.en.pk)
+        en.name = 'English '
+        # Only the language itself when its code doesn't change
+        with self.assertNumQueries(1):
+            en.save()
+
+        en.iso639_3 = 'enx'
+        en.save()
+        self.assertEqual(list(AlternativeName.objects.values_list('in_language_code', 'slug')),
+                         [('enx', 'zazaki_(enx)')])
+        with self.assertNumQueries(1):
+            en.save()
+
+        # update() doesn't send signals
+        Language.objects.filter(pk=self.en.pk).update(iso639_3='eng')
+        AlternativeName.all_objects.refresh_language_codes()
+        self.assertEqual(list(AlternativeName.objects.values_list('in_language_code', 'slug')),
+                         [('eng', 'zazaki_(eng)')])
+
+
+class UsedInTestCase(TestCase):
+    def setUp(self):
+        self.zza = Language.objects.create(name='Zaza', name_gl='Zaza', iso639_3='zza')
+        self.kiu = Language.objects.create(name='Kirmanjki', name_gl='Kirmanjki', iso639_3='kiu')
+        self.turkey = Country.objects.create(name='Turkey', code='TR', code3='TUR', population=0)
+        self.germany = Country.objects.create(name='Germany', code='DE', code3='DEU', population=0)
+        for language, country, population in [(self.zza, self.turkey, 1000), (self.kiu, self.turkey, None),
+                                              (self.zza, self.germany, 100)]:
+            UsedIn.objects.create(language=language, country=country, population=population,
+                                  development_status=UsedIn.DEVELOPMENT_STATUS.vigorous)
+
+    def test_directions(self):
+        with self.assertNumQueries(1):
+            self.assertEqual([row[:2] for row in UsedIn.objects.languages_in('tr')],
+                             [(self.zza.pk, 1000), (self.kiu.pk, None)])
+        with self.assertNumQueries(1):
+            self.assertEqual([row[:2] for row in UsedIn.objects.countries_of(self.zza)],
+                             [('TR', 1000), ('DE', 100)])
+
+    def test_country_code_changes(self):
+        self.turkey.code = 'TU'
+        self.turkey.save()
+        self.assertEqual(len(UsedIn.objects.languages_in('TU')), 2)
+
+        # update() (like a country import) doesn't send signals
+        Country.objects.filter(pk=self.germany.pk).update(code='GE')
+        with self.assertNumQueries(2):
+            UsedIn.objects.refresh_country_codes()
+        self.assertEqual(sorted(UsedIn.objects.values_list('country_code', flat=True)), ['GE', 'TU', 'TU'])
+
+
+class DialectTestCase(TestCase):
+    def setUp(self):
+        zza = Language.objects.create(name='Zaza', name_gl='Zaza', iso639_3='zza')
+        turkey = Country.objects.create(name='Turkey', code='TR', code3='TUR', population=0)
+        self.used_in = UsedIn.objects.create(language=zza, country=turkey,
+                                             development_status=UsedIn.DEVELOPMENT_STATUS.vigorous)
+
+    def dialects(self, *names):
+        return [Dialect.objects.create(used_in=self.used_in, name=name) for name in names]
+
+    def groups(self):
+        groups = {}
+        for name, group_id in Dialect.objects.values_list('name', 'group_id'):
+            groups.setdefault(group_id, []).append(name)
+        return sorted(sorted(names) for group_id, names in groups.items() if group_id is not None)
+
+    def test_link_aliases(self):
+        dimli, zazaki, kird, kirmanjki, dersim = self.dialects('Dimli', 'Zazaki', 'Kird', 'Kirmanjki', 'Dersim')
+        self.assertEqual(list(Dialect.objects.aliases_of(dimli)), [])
+
+        first = Dialect.objects.link_aliases([dimli, zazaki])
+        second = Dialect.objects.link_aliases([kird, kirmanjki])
+        self.assertLess(first, second)
+
+        # Linking members of two groups merges the newer group into the
+        # oldest, along with the members that weren't passed
+        self.assertEqual(Dialect.objects.link_aliases([kirmanjki, zazaki, dersim]), first)
+        self.assertEqual(self.groups(), [['Dersim', 'Dimli', 'Kird', 'Kirmanjki', 'Zazaki']])
+        self.assertEqual(list(DialectGroup.objects.values_list('pk', flat=True)), [first])
+
+        # Every alias but the dialect itself
+        self.assertEqual(sorted(d.name for d in Dialect.objects.aliases_of(dimli)),
+                         ['Dersim', 'Kird', 'Kirmanjki', 'Zazaki'])
+        self.assertEqual(sorted(d.name for d in Dialect.objects.get(name='Kird').also_known_as),
+                         ['Dersim', 'Dimli', 'Kirmanjki', 'Zazaki'])
+
+    def test_alias_groups(self):
+        migration = importlib.import_module('world_languages.migrations.0008_dialectgroup')
+        # also_known_as was symmetrical, so both directions of most edges
+        edges = [(1, 2), (2, 1), (3, 4), (4, 3), (5, 4), (2, 5), (6, 7), (7, 6), (8, 8)]
+        self.assertEqual(sorted(sorted(group) for group in migration.alias_groups(edges)),
+                         [[1, 2, 3, 4, 5], [6, 7], [8]])
+
+    @skipIf(not hasattr(BaseCommand, 'option_list'), "The import command needs BaseCommand.option_list")
+    def test_add_dialects(self):
+        from .management.commands.world_languages import add_dialects
+
+        soup = 'Dimli (Zazaki, Kird), Dersim. Intelligible with Kirmanjki'
+        add_dialects(self.used_in, soup)
+        groups = self.groups()
+        self.assertEqual(groups, [['Dimli', 'Kird', 'Zazaki']])
+
+        # Importing the same dialects again changes nothing
+        group_ids = list(Dialect.objects.order_by('name').values_list('pk', 'group_id'))
+        add_dialects(self.used_in, soup)
+        self.assertEqual(list(Dialect.objects.order_by('name').values_list('pk', 'group_id')), group_ids)
+        self.assertEqual(DialectGroup.objects.count(), 1)
+        self.assertEqual(list(self.used_in.dialect_notes.values_list('note', flat=True)),
+                         ['Intelligible with Kirmanjki'])
+
+
+class ScriptUsageTestCase(TestCase):
+    def test_in_use(self):
+        latin = Script.objects.create(name='Latin')
+        current = ScriptUsage.objects.create(
+            script=latin, start=datetime.date(1900, 1, 1), end=datetime.date(2900, 1, 1))
+        ScriptUsage.objects.create(script=latin, start=datetime.date(1800, 1, 1), end=datetime.date(1900, 1, 1))
+        ScriptUsage.objects.create(
+            script=latin, start=datetime.date(1900, 1, 1), end=datetime.date(2900, 1, 1), in_use=False)
+
+        for use_tz in (False, True):
+            with self.settings(USE_TZ=use_tz):
+                cache.clear()
+                self.assertEqual(list(ScriptUsage.objects.in_use()), [current])
+                self.assertEqual(ScriptUsage.objects.in_use_cached(), [current])
+                self.assertEqual(ScriptUsage.objects.in_use(datetime.date(1850, 1, 1)).count(), 1)
+
+
+@override_settings(ROOT_URLCONF='world_languages.urls')
+class ApiTestCase(TestCase):
+    def setUp(self):
+        self.indo_european = Family.objects.create(name='Indo-European')
+        self.iranian = Family.objects.create(name='Iranian', parent=self.indo_european)
+        self.zaza_gorani = Family.objects.create(name='Zaza-Gorani', parent=self.iranian)
+        self.uralic = Family.objects.create(name='Uralic')
+        self.languages = [
+            Language.objects.create(name='English', name_gl='Standard English', iso639_1='en', iso639_3='eng',
+                                    family=self.indo_european),
+            Language.objects.create(name='Zaza', name_gl='Zaza', iso639_3='zza', family=self.zaza_gorani),
+            Language.objects.create(name='Persian', name_gl='Farsi', iso639_1='fa', iso639_3='fas',
+                                    family=self.iranian),
+            Language.objects.create(name='Estonian', name_gl='Estonian', iso639_1='et', iso639_3='est',
+                                    family=self.uralic),
+            Language.objects.create(name='Kirmanjki', name_gl='Kirmanjki', iso639_3='kiu', family=self.zaza_gorani),
+        ]
+
+    def test_etag(self):
+        response = self.client.get('/languages/en/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['iso639_3'], 'eng')
+        self.assertIn('public', response['Cache-Control'])
+
+        response = self.client.get('/languages/en/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+        # Another URL (or another data version) is another ETag
+        response = self.client.get('/languages/eng/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+
+    def test_cursor_pagination(self):
+        slugs = []
+        url = '/languages/?limit=2'
+        while url:
+            page = self.client.get(url).json()
+            self.assertLessEqual(len(page['results']), 2)
+            slugs.extend(language['slug'] for language in page['results'])
+            url = page['next']
+        self.assertEqual(slugs, sorted(language.slug for language in self.languages))
+
+    def test_fields(self):
+        page = self.client.get('/languages/', {'fields': 'iso639_3,family'}).json()
+        self.assertEqual(page['results'][0], {'iso639_3': 'eng', 'family': 'indo-european'})
+        self.assertIsNone(page['next'])
+
+        self.assertEqual(self.client.get('/languages/zza/', {'fields': 'name'}).json(), {'name': 'Zaza'})
+
+        response = self.client.get('/languages/', {'fields': 'name,nonsense'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('nonsense', response.json()['error'])
+
+    def test_family_tree(self):
+        tree = self.client.get('/families/iranian/').json()
+        self.assertEqual(tree['name'], 'Iranian')
+        self.assertEqual([language['iso639_3'] for language in tree['languages']], ['fas'])
+        zaza_gorani, = tree['children']
+        self.assertEqual([language['iso639_3'] for language in zaza_gorani['languages']], ['kiu', 'zza'])
+        self.assertEqual(zaza_gorani['children'], [])
+
+        # Only the subtree is read, not the whole tables
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/families/zaza-gorani/')
+        reads = [q['sql'] for q in queries if 'FROM "{}"'.format(Family._meta.db_table) in q['sql'] or
+                 'FROM "{}"'.format(Language._meta.db_table) in q['sql']]
+        self.assertEqual(len(reads), 3)
+        for sql in reads:
+            self.assertIn('WHERE', sql)
+
+        self.assertEqual(self.client.get('/families/nonsense/').status_code, 404)
+
+
+class FlatCharacteristicTestCase(TestCase):
+    def setUp(self):
+        self.zza, self.est = create_typology()
+
+    def test_rebuild(self):
+        FlatCharacteristic.objects.rebuild()
+        self.assertEqual(
+            sorted(FlatCharacteristic.objects.values_list('language__iso639_3', 'kind', 'order', 'number', 'pattern')),
+            [('est', 'speech_sound_count', None, 9, None),
+             ('est', 'subject_verb_object_order', 'SVO', None, None),
+             ('est', 'syllable_pattern', None, None, 'CV'),
+             ('zza', 'speech_sound_count', None, 8, None),
+             ('zza', 'subject_verb_object_order', 'SOV', None, None)])
+
+    def test_rebuild_languages(self):
+        FlatCharacteristic.objects.rebuild()
+        self.zza.characteristics.add(SyllablePattern.objects.create(pattern='CVC', notes='CVC'))
+        self.est.characteristics.add(SyllablePattern.objects.create(pattern='V', notes='V'))
+
+        with CaptureQueriesContext(connection) as queries:
+            FlatCharacteristic.objects.rebuild(languages=[self.zza])
+        self.assertEqual(
+            sorted(FlatCharacteristic.objects.filter(kind='syllable_pattern').values_list('language__iso639_3', 'pattern')),
+            [('est', 'CV'), ('zza', 'CVC')])
+
+        # Only the characteristics of the rebuilt languages are read
+        characteristic_tables = [model._meta.db_table for model in (
+            Characteristic, SubjectVerbObjectOrder, SpeechSoundCount, SyllablePattern)]
+        reads = [q['sql'] for q in queries if q['sql'].startswith('SELECT') and any(
+            'FROM "{}"'.format(table) in q['sql'] for table in characteristic_tables)]
+        self.assertTrue(reads)
+        for sql in reads:
+            self.assertIn(Characteristic.languages.through._meta.db_table, sql)
+
+
+class TypologyIndexTestCase(TestCase):
+    def setUp(self):
+        self.zza, self.est = create_typology()
+        Language.objects.create(name='English', name_gl='Standard English', iso639_3='eng')
+        FlatCharacteristic.objects.rebuild()
+        cache.delete(CACHE_KEY.format(data_version()))
+
+    def test_build(self):
+        with self.assertNumQueries(1):
+            index = TypologyIndex.build()
+        # Only languages with characteristics are indexed
+        self.assertEqual(sorted(index.language_ids), sorted([str(self.zza.pk), str(self.est.pk)]))
+        self.assertEqual(index.facets('order'), [('order', 'SOV'), ('order', 'SVO')])
+        self.assertEqual(index.facets('sound_count'), [('sound_count', 'vowel', 8), ('sound_count', 'vowel', 9)])
+
+    def test_filters(self):
+        index = TypologyIndex.build()
+        zza, est = str(self.zza.pk), str(self.est.pk)
+
+        self.assertEqual(index.filter(('order', 'SOV')), [zza])
+        self.assertEqual(sorted(index.filter(('sound_type', 'vowel'))), sorted([zza, est]))
+        self.assertEqual(index.filter(('sound_type', 'vowel'), ('syllable_pattern', 'CV')), [est])
+        self.assertEqual(index.filter(('order', 'SOV'), ('syllable_pattern', 'CV')), [])
+        self.assertEqual(index.filter(('order', 'OVS')), [])
+        self.assertEqual(sorted(index.filter()), sorted([zza, est]))
+        self.assertEqual(index.count(('sound_type', 'vowel')), 2)
+
+        self.assertEqual(index.filter(index.sound_count_between('vowel', 9)), [est])
+        self.assertEqual(index.filter(index.sound_count_between('vowel', high=8)), [zza])
+        self.assertEqual(index.count(index.sound_count_between('vowel', 5, 10), ('order', 'SVO')), 1)
+        self.assertEqual(index.count(index.sound_count_between('consonant')), 0)
+
+        # The same languages as the database query
+        self.assertEqual(
+            index.filter(('order', 'SVO'), ('syllable_pattern', 'CV')),
+            [str(pk) for pk in Language.objects.with_typology(
+                {'kind': 'subject_verb_object_order', 'order': 'SVO'},
+                {'kind': 'syllable_pattern', 'pattern': 'CV'}).values_list('pk', flat=True)])
+
+    def test_save_and_load(self):
+        self.assertIsNone(TypologyIndex.load())
+        index = TypologyIndex.build().save()
+        loaded = TypologyIndex.load()
+        self.assertEqual(loaded.language_ids, index.language_ids)
+        self.assertEqual(loaded.bitsets, index.bitsets)
+
+        # An index saved for the next version isn't loaded until the data
+        # version changes
+        TypologyIndex([], {}).save('next')
+        self.assertEqual(TypologyIndex.load().language_ids, index.language_ids)
+        old = data_version()
+        bump_data_version('next')
+        self.assertEqual(TypologyIndex.load().language_ids, [])
+        self.assertEqual(get_typology_index().language_ids, [])
+        TypologyIndex.discard(old)
+        self.assertIsNone(TypologyIndex.load(old))
+
+
+class FlushTestCase(TestCase):
+    def test_flush_models(self):
+        models = flush_models('characteristic')
+        self.assertNotIn(Language, models)
+        self.assertLess(models.index(SyllablePattern), models.index(Characteristic))
+        self.assertLess(models.index(Characteristic.languages.through), models.index(Characteristic))
+
+        models = flush_models('language')
+        self.assertNotIn(Macroarea, models)
+        self.assertNotIn(ImportRun, models)
+        self.assertLess(models.index(AlternativeName), models.index(Language))
+        self.assertLess(models.index(Language), models.index(Family))
+
+    def test_flush_tables(self):
+        en = Language.objects.create(name='English', name_gl='Standard English', iso639_3='eng')
+        zza = Language.objects.create(name='Zaza', name_gl='Zaza', iso639_3='zza', macrolanguage=en)
+        AlternativeName.objects.create(language=zza, name='Dimli', type=AlternativeName.TYPE.name)
+
+        flush_tables(flush_models('alternative_name'))
+        self.assertEqual(AlternativeName.all_objects.count(), 0)
+        self.assertEqual(Language.objects.count(), 2)
+
+        flush_tables(flush_models('language'))
+        self.assertEqual(Language.objects.count(), 0)
+
+
+# Creates (and drops) a table, which TestCase's transaction can't on SQLite
+class FlushReferencesTestCase(TransactionTestCase):
+    def setUp(self):
+        # A model of another app, referencing languages
+        class Speaker(models.Model):
+            name = models.CharField(max_length=255)
+            language = models.ForeignKey(Language, blank=True, null=True, on_delete=models.SET_NULL)
+
+            class Meta:
+                app_label = 'cities'
+
+        self.Speaker = Speaker
+        with connection.schema_editor() as editor:
+            editor.create_model(Speaker)
+
+    def tearDown(self):
+        with connection.schema_editor() as editor:
+            editor.delete_model(self.Speaker)
+        del apps.all_models['cities']['speaker']
+        apps.clear_cache()
+
+    def test_flush_tables(self):
+        en = Language.objects.create(name='English', name_gl='Standard English', iso639_3='eng')
+        self.Speaker.objects.create(name='Alice')
+
+        # Nothing references the languages yet, so the other app's table is
+        # left alone
+        flush_tables(flush_models('language'))
+        self.assertEqual(Language.objects.count(), 0)
+        self.assertEqual(self.Speaker.objects.count(), 1)
+
+        en = Language.objects.create(name='English', name_gl='Standard English', iso639_3='eng')
+        self.Speaker.objects.create(name='Bob', language=en)
+        flush_tables(flush_models('language'))
+        self.assertEqual(Language.objects.count(), 0)
+        self.assertEqual(sorted(self.Speaker.objects.values_list('name', 'language')),
+                         [('Alice', None), ('Bob', None)])
+
+
+# VACUUM and REINDEX CONCURRENTLY can't run in a transaction
+class MaintenanceTestCase(TransactionTestCase):
+    def test_run_maintenance(self):
+        Language.objects.create(name='Zaza', name_gl='Zaza', iso639_3='zza')
+        timings = run_maintenance(['reindex', 'analyze', 'vacuum'])
+        self.assertEqual([step for step, seconds in timings], ['reindex', 'analyze', 'vacuum'])
+        for step, seconds in timings:
+            self.assertGreaterEqual(seconds, 0)
+
+    def test_unsupported_database(self):
+        with mock.patch.object(connection, 'vendor', 'oracle'), \
+                mock.patch('world_languages.maintenance.run_statements') as run_statements:
+            timings = run_maintenance(['analyze', 'vacuum', 'reindex'])
+        self.assertEqual(timings, [('analyze', None), ('vacuum', None), ('reindex', None)])
+        self.assertFalse(run_statements.called)
+
+    def test_reindex_concurrently(self):
+        for pg_version, statement in ((110005, 'REINDEX TABLE '), (120000, 'REINDEX TABLE CONCURRENTLY ')):
+            with mock.patch.object(connection, 'vendor', 'postgresql'), \
+                    mock.patch.object(connection, 'pg_version', pg_version, create=True), \
+                    mock.patch('world_languages.maintenance.run_statements') as run_statements:
+                run_maintenance(['reindex'])
+            statements, = run_statements.call_args[0]
+            self.assertEqual(len(statements), len(app_tables()))
+            self.assertIn(statement + connection.ops.quote_name(Language._meta.db_table), statements)
+
+    @skipIf(not hasattr(BaseCommand, 'option_list'), "The import command needs BaseCommand.option_list")
+    def test_command_steps(self):
+        from .management.commands.world_languages import Command
+
+        with mock.patch.object(Command, 'check_prerequisites'):
+            with self.assertRaisesRegex(CommandError, 'Unknown maintenance steps: defrag'):
+                call_command('world_languages', maintenance='analyze,defrag', stdout=StringIO())
+
+            out = StringIO()
+            with mock.patch('world_languages.management.commands.world_languages.run_maintenance',
+                            return_value=[('analyze', 0.5), ('vacuum', None)]) as maintain:
+                call_command('world_languages', maintenance='all', stdout=out, **{'import': ''})
+        maintain.assert_called_once_with(MAINTENANCE_STEPS)
+        self.assertEqual(out.getvalue().splitlines(),
+                         ['analyze: 0.50s', 'vacuum: skipped, not supported by this database'])
+
+
+class EstimatedCountPaginatorTestCase(TestCase):
+    def setUp(self):
+        for code in ('eng', 'deu', 'zza'):
+            Language.objects.create(name=code, name_gl=code, iso639_3=code)
+
+    def count(self, queryset):
+        return EstimatedCountPaginator(queryset, 10).count
+
+    def test_exact_count(self):
+        # Small tables, filtered querysets and other databases
+        with mock.patch.object(EstimatedCountPaginator, 'ESTIMATE_THRESHOLD', 1):
+            self.assertEqual(self.count(Language.objects.filter(iso639_3__in=['eng', 'zza'])), 2)
+            self.assertEqual(self.count(Language.objects.all()[:2]), 2)
+        self.assertEqual(self.count(Language.objects.all()), 3)
+
+    @skipIf(connection.vendor != 'postgresql', "Counts are only estimated on PostgreSQL")
+    def test_estimated_count(self):
+        qn = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            # A table of the same name in another schema doesn't count
+            cursor.execute("CREATE SCHEMA estimates")
+            cursor.execute("CREATE TABLE estimates.{} AS SELECT generate_series(1, 100) AS id".format(
+                qn(Language._meta.db_table)))
+            cursor.execute("ANALYZE estimates.{}".format(qn(Language._meta.db_table)))
+            cursor.execute("ANALYZE {}".format(qn(Language._meta.db_table)))
+        Language.objects.filter(iso639_3='zza').delete()
+
+        with mock.patch.object(EstimatedCountPaginator, 'ESTIMATE_THRESHOLD', 1):
+            self.assertEqual(self.count(Language.objects.all()), 3)
+            self.assertEqual(self.count(Language.objects.filter(iso639_3='eng')), 1)
+        self.assertEqual(self.count(Language.objects.all()), 2)
+
+
+@skipIf(connection.vendor != 'postgresql', "Shadow imports need PostgreSQL")
+class ShadowSchemaTestCase(TestCase):
+    def test_swap(self):
+        en = Language.objects.create(name='English', name_gl='Standard English', iso639_3='eng')
+        AlternativeName.objects.create(language=en, name='Anglais', type=AlternativeName.TYPE.name)
+
+        shadow = ShadowSchema(connection)
+        shadow.create()
+        AlternativeName.objects.create(language=en, name='Englisch', type=AlternativeName.TYPE.name)
+        shadow.validate([Language, AlternativeName])
+        shadow.swap()
+
+        # The serial columns still draw from their sequences, which the
+        # swapped in tables own
+        AlternativeName.objects.create(language=en, name='Ingl\u00e9s', type=AlternativeName.TYPE.name)
+        self.assertEqual(sorted(AlternativeName.all_objects.values_list('name', flat=True)),
+                         ['Anglais', 'Englisch', 'Ingl\u00e9s'])
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_get_serial_sequence(%s, %s)', [AlternativeName._meta.db_table, 'id'])
+            self.assertIsNotNone(cursor.fetchone()[0])
+
+
+class OrderStagesTestCase(SimpleTestCase):
+    def test_order_stages(self):
+        stages = OrderedDict([
+            ('base', Stage('import_base', (), list)),
+            ('names', Stage('import_names', ('codes',), list)),
+            ('codes', Stage('import_codes', ('base',), list)),
+            ('extra', Stage('import_extra', ('base',), list)),
+        ])
+        self.assertEqual(order_stages(stages, ['extra', 'names', 'codes', 'base']),
+                         ['base', 'codes', 'names', 'extra'])
+        # Dependencies that weren't asked for aren't run
+        self.assertEqual(order_stages(stages, ['names', 'extra']), ['names', 'extra'])
+
+        stages['base'] = Stage('import_base', ('names',), list)
+        with self.assertRaises(ValueError):
+            order_stages(stages, list(stages))
+
+    def test_prefetcher(self):
+        started, release = threading.Event(), threading.Event()
+
+        def download(url):
+            started.set()
+            release.wait(5)
+            return url.upper()
+
+        prefetcher = Prefetcher(download, 1)
+        prefetcher.prefetch(['a', 'b', 'a'])
+        release.set()
+        self.assertEqual(prefetcher.get('a'), 'A')
+        self.assertIsNone(prefetcher.get('c'))
+        prefetcher.close()
+
+        # After a failed stage, closing doesn't wait for the download in
+        # progress, and cancels the others
+        started.clear()
+        release.clear()
+        prefetcher = Prefetcher(download, 1)
+        prefetcher.prefetch(['a', 'b'])
+        started.wait(5)
+        prefetcher.close(wait=False)
+        self.assertFalse(prefetcher.futures['a'].done())
+        self.assertTrue(prefetcher.futures['b'].cancelled())
+        release.set()
+
+
+@skipIf(np is None, "NumPy isn't installed")
+class SimilarityMatrixTestCase(TestCase):
+    def setUp(self):
+        self.zza, self.kiu, self.diq, self.est = Language.objects.bulk_create([
+            Language(name=name, name_gl=name, iso639_3=code)
+            for name, code in [('Zaza', 'zza'), ('Kirmanjki', 'kiu'), ('Dimli', 'diq'), ('Estonian', 'est')]])
+        # Saving one similarity also creates the reflexive one
+        LexicalSimilarity.objects.create(language_1=self.zza, language_2=self.kiu, percent_low=80, percent_high=70)
+        LexicalSimilarity.objects.create(language_1=self.zza, language_2=self.diq, percent_low=60, percent_high=90)
+
+    def test_build(self):
+        with self.assertNumQueries(1):
+            matrix = SimilarityMatrix.build()
+        self.assertEqual(len(matrix), 3)
+        self.assertIn(self.zza.pk, matrix)
+        self.assertNotIn(self.est.pk, matrix)
+
+        zza, kiu = matrix.index[str(self.zza.pk)], matrix.index[str(self.kiu.pk)]
+        # percent_low and percent_high are swapped when out of order
+        self.assertEqual((matrix.low[zza, kiu], matrix.high[zza, kiu]), (70, 80))
+        self.assertEqual(matrix.high[kiu, zza], 80)
+        self.assertTrue(np.isnan(matrix.high[zza, zza]))
+        with self.assertRaises(ValueError):
+            matrix.plane('medium')
+
+    def test_most_similar(self):
+        matrix = SimilarityMatrix.build()
+        self.assertEqual(matrix.most_similar(self.zza.pk),
+                         [(str(self.diq.pk), 90.0), (str(self.kiu.pk), 80.0)])
+        self.assertEqual(matrix.most_similar(self.zza.pk, k=1, plane='low'), [(str(self.kiu.pk), 70.0)])
+        self.assertEqual(matrix.most_similar(self.kiu.pk), [(str(self.zza.pk), 80.0)])
+        self.assertEqual(matrix.most_similar(self.est.pk), [])
+
+    def test_top_k(self):
+        matrix = SimilarityMatrix.build()
+        indices, scores = matrix.top_k(k=2)
+        self.assertEqual(indices.shape, (3, 2))
+        for language in (self.zza, self.kiu, self.diq):
+            row = matrix.index[str(language.pk)]
+            expected = matrix.most_similar(language.pk, k=2)
+            found = [(matrix.language_ids[i], float(score)) for i, score in zip(indices[row], scores[row]) if i >= 0]
+            self.assertEqual(found, expected)
+        # Languages with a single similarity pad their row
+        kiu = matrix.index[str(self.kiu.pk)]
+        self.assertEqual(indices[kiu, 1], -1)
+        self.assertTrue(np.isnan(scores[kiu, 1]))
+
+    def test_save_and_load(self):
+        matrix = SimilarityMatrix.build()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'similarity.npy')
+        matrix.save(path)
+
+        for mmap_mode in (None, 'r'):
+            loaded = SimilarityMatrix.load(path, mmap_mode=mmap_mode)
+            self.assertEqual(loaded.language_ids, matrix.language_ids)
+            np.testing.assert_array_equal(loaded.data, matrix.data)
+            self.assertEqual(loaded.most_similar(self.zza.pk), matrix.most_similar(self.zza.pk))
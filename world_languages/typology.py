@@ -0,0 +1,156 @@
+from django.core.cache import cache
+
+from .models import FlatCharacteristic
+from .version import data_version
+
+
+# Formatted with the data version the index was built from
+CACHE_KEY = 'world_languages:typology_index:{}'
+
+
+def facets_for(kind, order, pattern, word_type, related_word_type, position, sound_type, number):
+    """
+    The facets a single flattened characteristic contributes to a language
+    """
+    if kind == FlatCharacteristic.KIND.subject_verb_object_order:
+        return [('order', order)]
+    elif kind == FlatCharacteristic.KIND.syllable_pattern:
+        return [('syllable_pattern', pattern)]
+    elif kind == FlatCharacteristic.KIND.absolute_word_type_order:
+        return [('word_type', word_type), ('word_order', word_type, position)]
+    elif kind == FlatCharacteristic.KIND.relative_word_type_order:
+        return [('word_type', word_type), ('word_order', word_type, position),
+                ('word_order', word_type, position, related_word_type)]
+    elif kind == FlatCharacteristic.KIND.speech_sound_count:
+        return [('sound_type', sound_type), ('sound_count', sound_type, number)]
+    return []
+
+
+class TypologyIndex(object):
+    """
+    Per-facet bitsets over every language with characteristics
+
+    Bit ``i`` of a facet's bitset is set if ``language_ids[i]`` has that
+    facet. Facets are tuples:
+
+    * ``('order', 'SOV')``
+    * ``('syllable_pattern', 'CVC')``
+    * ``('word_type', 'postposition')``
+    * ``('word_order', 'adjective', 'after')``
+    * ``('word_order', 'adjective', 'after', 'noun')``
+    * ``('sound_type', 'vowel')``
+    * ``('sound_count', 'vowel', 5)``
+
+    Conjunctive filters are then a handful of integer ANDs.
+    """
+    def __init__(self, language_ids, bitsets):
+        self.language_ids = language_ids
+        self.bitsets = bitsets
+        self.all = (1 << len(language_ids)) - 1
+
+    @classmethod
+    def build(cls):
+        language_ids = []
+        positions = {}
+        bitsets = {}
+
+        for row in FlatCharacteristic.objects.order_by().values_list(
+                'language_id', 'kind', 'order', 'pattern', 'word_type',
+                'related_word_type', 'position', 'sound_type', 'number').iterator():
+            language_id = str(row[0])
+            try:
+                bit = positions[language_id]
+            except KeyError:
+                bit = positions[language_id] = 1 << len(language_ids)
+                language_ids.append(language_id)
+
+            for facet in facets_for(*row[1:]):
+                bitsets[facet] = bitsets.get(facet, 0) | bit
+
+        return cls(language_ids, bitsets)
+
+    def save(self, version=None):
+        """
+        Cache the index as the one for the data ``version`` (the current one
+        by default)
+        """
+        if version is None:
+            version = data_version()
+        cache.set(CACHE_KEY.format(version), (self.language_ids, self.bitsets), None)
+        return self
+
+    @classmethod
+    def load(cls, version=None):
+        """
+        The index cached for the data ``version`` (the current one by
+        default), or None
+        """
+        if version is None:
+            version = data_version()
+        data = cache.get(CACHE_KEY.format(version))
+        if data is None:
+            return None
+        return cls(*data)
+
+    @staticmethod
+    def discard(version):
+        cache.delete(CACHE_KEY.format(version))
+
+    def facets(self, name=None):
+        return sorted((f for f in self.bitsets if name is None or f[0] == name), key=str)
+
+    def sound_count_between(self, sound_type, low=None, high=None):
+        """
+        Bitset of languages with between ``low`` and ``high`` (inclusive)
+        sounds of ``sound_type``. It can be passed to ``mask()`` and friends
+        like any other facet.
+        """
+        bits = 0
+        for facet, bitset in self.bitsets.items():
+            if (facet[0] == 'sound_count' and facet[1] == sound_type and
+                    (low is None or facet[2] >= low) and
+                    (high is None or facet[2] <= high)):
+                bits |= bitset
+        return bits
+
+    def mask(self, *facets):
+        bits = self.all
+        for facet in facets:
+            bits &= facet if isinstance(facet, int) else self.bitsets.get(facet, 0)
+            if not bits:
+                break
+        return bits
+
+    def count(self, *facets):
+        return bin(self.mask(*facets)).count('1')
+
+    def filter(self, *facets):
+        """
+        Ids of the languages that have every one of ``facets``
+        """
+        bits = self.mask(*facets)
+        ids = []
+        while bits:
+            low = bits & -bits
+            ids.append(self.language_ids[low.bit_length() - 1])
+            bits ^= low
+        return ids
+
+
+# (data version, index) of the index loaded by this process
+_loaded = (None, None)
+
+
+def get_typology_index():
+    """
+    The index built by the last import, or a freshly built one
+
+    The index is kept in memory until the data version changes, ie: until the
+    next import.
+    """
+    global _loaded
+
+    version = data_version()
+    if _loaded[0] != version:
+        _loaded = (version, TypologyIndex.load(version) or TypologyIndex.build().save(version))
+    return _loaded[1]
@@ -0,0 +1,15 @@
+from django.conf.urls import url
+
+from . import views
+
+
+app_name = 'world_languages'
+
+urlpatterns = [
+    url(r'^languages/$', views.language_list, name='language-list'),
+    url(r'^languages/(?P<code>[A-Za-z]{2,3})/$', views.language_detail, name='language-detail'),
+    url(r'^languages/(?P<code>[A-Za-z]{2,3})/names/$', views.language_names, name='language-names'),
+    url(r'^languages/(?P<code>[A-Za-z]{2,3})/countries/$', views.language_countries, name='language-countries'),
+    url(r'^families/$', views.family_list, name='family-list'),
+    url(r'^families/(?P<slug>[^/]+)/$', views.family_tree, name='family-tree'),
+]
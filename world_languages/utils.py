@@ -1,9 +1,50 @@
+import itertools
 from urllib.request import urlretrieve
 
-from tqdm import tqdm
 
+class LazyRegex(object):
+    """
+    A regular expression that is only compiled when it's first used
+
+    ``compile`` is ``re.compile`` or ``regex.compile``. Attributes of the
+    compiled pattern (``match``, ``groupindex``, etc.) are proxied, and
+    cached on the instance after their first lookup.
+    """
+    def __init__(self, compile, pattern, flags=0):
+        self._compile = compile
+        self._pattern = pattern
+        self._flags = flags
+        self._compiled = None
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        if self._compiled is None:
+            self._compiled = self._compile(self._pattern, self._flags)
+        value = getattr(self._compiled, name)
+        setattr(self, name, value)
+        return value
+
+
+def lazy_compile(module, pattern, flags=0):
+    return LazyRegex(module.compile, pattern, flags)
+
+
+def chunked(iterable, size):
+    """
+    Lists of up to ``size`` items of ``iterable``
+    """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def urlopen_with_progress(url, progress=True):
+    from tqdm import tqdm
 
-def urlopen_with_progress(url):
     def my_hook(t):
         """
         Wraps tqdm instance. Don't forget to close() or __exit__() the tqdm instance
@@ -31,7 +72,7 @@ def urlopen_with_progress(url):
             last_b[0] = b
         return inner
 
-    with tqdm(unit='B', unit_scale=True, miniters=1,
+    with tqdm(unit='B', unit_scale=True, miniters=1, disable=not progress,
               desc="Downloading languages file...") as t:
         filename, _ = urlretrieve(url, reporthook=my_hook(t))
 
@@ -0,0 +1,30 @@
+import uuid
+
+from django.core.cache import cache
+
+
+DATA_VERSION_KEY = 'world_languages:data_version'
+
+
+def data_version():
+    """
+    An opaque stamp that changes whenever the language data is reimported
+
+    If the cache has been cleared a new stamp is created, which only costs
+    downstream caches one extra miss.
+    """
+    version = cache.get(DATA_VERSION_KEY)
+    if version is None:
+        cache.add(DATA_VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(DATA_VERSION_KEY)
+    return version
+
+
+def bump_data_version(version=None):
+    """
+    Replace the stamp, invalidating everything derived from the old one
+    """
+    if version is None:
+        version = uuid.uuid4().hex
+    cache.set(DATA_VERSION_KEY, version, None)
+    return version
@@ -1,3 +1,242 @@
-from django.shortcuts import render
+import hashlib
+from collections import defaultdict
+from functools import wraps
 
-# Create your views here.
+from django.db.models import Q
+from django.http import JsonResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition, require_safe
+
+from .conf import settings
+from .models import AlternativeName, Family, Language, UsedIn
+from .utils import chunked
+from .version import data_version
+
+
+# Lookup order for "any ISO code", most specific standard first
+ISO_FIELDS = ['iso639_3', 'iso639_1', 'iso639_2t', 'iso639_2b', 'iso639_5']
+
+# Public field name -> values() lookup
+LANGUAGE_FIELDS = {
+    'id': 'id',
+    'name': 'name',
+    'name_gl': 'name_gl',
+    'slug': 'slug',
+    'iso639_1': 'iso639_1',
+    'iso639_2t': 'iso639_2t',
+    'iso639_2b': 'iso639_2b',
+    'iso639_3': 'iso639_3',
+    'iso639_5': 'iso639_5',
+    'glottolog_id': 'glottolog_id',
+    'type': 'iso639_2_type',
+    'scope': 'iso639_2_scope',
+    'development_status': 'development_status',
+    'population': 'population',
+    'family': 'family__slug',
+    'macrolanguage': 'macrolanguage__iso639_3',
+    'macroarea': 'macroarea__name',
+}
+LANGUAGE_LIST_FIELDS = ['name', 'slug', 'iso639_1', 'iso639_3', 'glottolog_id']
+
+NAME_FIELDS = {
+    'name': 'name',
+    'slug': 'slug',
+    'type': 'type',
+    'preferred': 'preferred',
+    'colloquial': 'colloquial',
+    'language': 'language__iso639_3',
+    'language_slug': 'language__slug',
+}
+NAME_LIST_FIELDS = ['name', 'type', 'preferred', 'language']
+
+FAMILY_FIELDS = {
+    'name': 'name',
+    'slug': 'slug',
+    'glottolog_id': 'glottolog_id',
+}
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def api_etag(request, *args, **kwargs):
+    # Responses only change when the data is reimported
+    key = '{}:{}'.format(data_version(), request.get_full_path())
+    return hashlib.md5(key.encode('utf-8')).hexdigest()
+
+
+def api_view(view):
+    """
+    Read-only, conditional (ETag) JSON view that HTTP caches may store
+    """
+    conditional_view = condition(etag_func=api_etag)(view)
+
+    @require_safe
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            response = conditional_view(request, *args, **kwargs)
+        except ApiError as e:
+            return JsonResponse({'error': e.message}, status=e.status)
+        patch_cache_control(response, public=True, max_age=settings.api_cache_max_age)
+        return response
+    return wrapper
+
+
+def get_fields(request, available, default):
+    """
+    The fields requested with ``?fields=a,b,c``, or ``default``
+    """
+    if not request.GET.get('fields'):
+        return default
+
+    fields = [f.strip() for f in request.GET['fields'].split(',') if f.strip()]
+    unknown = [f for f in fields if f not in available]
+    if unknown:
+        raise ApiError(400, "Unknown fields: {}. Available fields are: {}".format(
+            ', '.join(unknown), ', '.join(sorted(available))))
+    return fields
+
+
+def serialize(row, fields, available):
+    return {field: row[available[field]] for field in fields}
+
+
+def paginate(request, queryset, key, fields, available):
+    """
+    Cursor pagination: rows are ordered by the unique ``key`` and the next
+    page starts ``?after=`` the last key of this one, so deep pages cost the
+    same as the first
+    """
+    try:
+        limit = int(request.GET.get('limit', settings.api_page_size))
+    except ValueError:
+        raise ApiError(400, "limit must be an integer")
+    limit = max(1, min(limit, settings.api_page_size))
+
+    queryset = queryset.order_by(key)
+    if request.GET.get('after'):
+        queryset = queryset.filter(**{'{}__gt'.format(key): request.GET['after']})
+
+    lookups = set(available[f] for f in fields) | {key}
+    rows = list(queryset.values(*lookups)[:limit + 1])
+
+    next_url = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        params = request.GET.copy()
+        params['after'] = rows[-1][key]
+        next_url = '{}?{}'.format(request.path, params.urlencode())
+
+    return {
+        'results': [serialize(row, fields, available) for row in rows],
+        'next': next_url,
+    }
+
+
+def find_language(code, *lookups):
+    """
+    The values() of the language with the ISO 639 ``code``, preferring
+    ISO 639-3 codes over ISO 639-1 codes over ISO 639-2 codes, etc.
+    """
+    code = code.lower()
+
+    query = Q()
+    for field in ISO_FIELDS:
+        query |= Q(**{field: code})
+
+    rows = list(Language.objects.filter(query).values('pk', *(set(ISO_FIELDS) | set(lookups))))
+    for field in ISO_FIELDS:
+        for row in rows:
+            if row[field] == code:
+                return row
+
+    raise ApiError(404, "No language with the ISO 639 code '{}'".format(code))
+
+
+@api_view
+def language_list(request):
+    fields = get_fields(request, LANGUAGE_FIELDS, LANGUAGE_LIST_FIELDS)
+    return JsonResponse(paginate(request, Language.objects.all(), 'slug', fields, LANGUAGE_FIELDS))
+
+
+@api_view
+def language_detail(request, code):
+    fields = get_fields(request, LANGUAGE_FIELDS, sorted(LANGUAGE_FIELDS))
+    row = find_language(code, *(LANGUAGE_FIELDS[f] for f in fields))
+    return JsonResponse(serialize(row, fields, LANGUAGE_FIELDS))
+
+
+@api_view
+def language_names(request, code):
+    """
+    Alternative names of languages, written in the language with ``code``
+    """
+    fields = get_fields(request, NAME_FIELDS, NAME_LIST_FIELDS)
+    language = find_language(code)
+    names = AlternativeName.objects.filter(in_language_id=language['pk'])
+    return JsonResponse(paginate(request, names, 'slug', fields, NAME_FIELDS))
+
+
+@api_view
+def language_countries(request, code):
+    language = find_language(code)
+    return JsonResponse({'results': [
+        {'country': country, 'population': population, 'development_status': status}
+        for country, population, status in UsedIn.objects.countries_of(language['pk'])
+    ]})
+
+
+@api_view
+def family_list(request):
+    """
+    Top level language families
+    """
+    fields = get_fields(request, FAMILY_FIELDS, sorted(FAMILY_FIELDS))
+    families = Family.objects.filter(parent__isnull=True)
+    return JsonResponse(paginate(request, families, 'slug', fields, FAMILY_FIELDS))
+
+
+@api_view
+def family_tree(request, slug):
+    """
+    A family with all of its subfamilies and languages, nested
+    """
+    root = Family.objects.filter(slug=slug).values('pk', 'name', 'slug', 'glottolog_id').first()
+    if root is None:
+        raise ApiError(404, "No language family with the slug '{}'".format(slug))
+
+    # Only the families under this one, a query per level of the tree (and
+    # per 500 families of a level, which keeps under SQLite's variable limit)
+    root_pk = root.pop('pk')
+    families = {root_pk: root}
+    children = defaultdict(list)
+    level = [root_pk]
+    while level:
+        parents, level = level, []
+        for chunk in chunked(parents, 500):
+            for pk, parent_id, name, family_slug, glottolog_id in Family.objects.filter(
+                    parent_id__in=chunk).order_by('name').values_list(
+                    'pk', 'parent_id', 'name', 'slug', 'glottolog_id'):
+                families[pk] = {'name': name, 'slug': family_slug, 'glottolog_id': glottolog_id}
+                children[parent_id].append(pk)
+                level.append(pk)
+
+    languages = defaultdict(list)
+    for chunk in chunked(families, 500):
+        for family_id, name, language_slug, iso639_3, glottolog_id in Language.objects.filter(
+                family_id__in=chunk).order_by('name').values_list(
+                'family_id', 'name', 'slug', 'iso639_3', 'glottolog_id'):
+            languages[family_id].append({
+                'name': name, 'slug': language_slug, 'iso639_3': iso639_3, 'glottolog_id': glottolog_id})
+
+    def subtree(pk):
+        return dict(families[pk],
+                    languages=languages[pk],
+                    children=[subtree(child) for child in children[pk]])
+
+    return JsonResponse(subtree(root_pk))